@@ -1,17 +1,10 @@
 import http.server
 import socketserver
-import sys
 import threading
-from unittest.mock import MagicMock
 
 import nest_asyncio
 import pytest
 
-# Mock browser-specific modules before any other imports
-sys.modules["js"] = MagicMock()
-sys.modules["pyodide"] = MagicMock()
-sys.modules["pyodide.ffi"] = MagicMock()
-
 def pytest_configure():
     nest_asyncio.apply()
 
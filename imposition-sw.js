@@ -0,0 +1,62 @@
+// Service Worker that serves EPUB resources from the Python ResourceServer.
+//
+// The page registers itself with a {type: "imposition:register", prefix}
+// message, and releases the prefix with "imposition:unregister". Requests
+// under a registered prefix are forwarded to that page over a
+// MessageChannel and answered with {status, headers, body}.
+
+const REGISTER_MESSAGE = "imposition:register";
+const UNREGISTER_MESSAGE = "imposition:unregister";
+const RESOURCE_MESSAGE = "imposition:resource";
+
+// Registered URL path prefixes, mapped to the id of the serving page
+const servers = new Map();
+
+self.addEventListener("install", () => self.skipWaiting());
+self.addEventListener("activate", (event) => event.waitUntil(self.clients.claim()));
+
+self.addEventListener("message", (event) => {
+  const data = event.data || {};
+  if (data.type === REGISTER_MESSAGE && event.source) {
+    servers.set(data.prefix, event.source.id);
+  } else if (data.type === UNREGISTER_MESSAGE && event.source) {
+    if (servers.get(data.prefix) === event.source.id) {
+      servers.delete(data.prefix);
+    }
+  }
+});
+
+self.addEventListener("fetch", (event) => {
+  const url = new URL(event.request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+  for (const [prefix, clientId] of servers) {
+    if (url.pathname.startsWith(prefix)) {
+      event.respondWith(forward(clientId, event.request, url));
+      return;
+    }
+  }
+});
+
+async function forward(clientId, request, url) {
+  const client = await self.clients.get(clientId);
+  if (!client) {
+    return new Response("The page serving this book was closed.", {status: 503});
+  }
+  const channel = new MessageChannel();
+  const reply = new Promise((resolve) => {
+    channel.port1.onmessage = (event) => resolve(event.data);
+  });
+  client.postMessage(
+    {
+      type: RESOURCE_MESSAGE,
+      // The query selects variants, e.g. downscaled images (?w=)
+      url: url.pathname + url.search,
+      etag: request.headers.get("If-None-Match"),
+    },
+    [channel.port2],
+  );
+  const {status, headers, body} = await reply;
+  return new Response(status === 304 ? null : body, {status, headers});
+}
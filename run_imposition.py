@@ -9,12 +9,13 @@ async def main() -> None:
     epub_bytes_proxy: JsProxy = await response.bytes()
     epub_bytes: bytes = epub_bytes_proxy.to_py()
 
-    book: Book = Book(epub_bytes)
+    book: Book = await Book.open(epub_bytes)
     dom_adapter = PyodideDOMAdapter()
-    rendition: Rendition = Rendition(book, dom_adapter, "viewer")
+    served: bool = "served" in str(js.location.search)
+    rendition: Rendition = Rendition(book, dom_adapter, "viewer", served=served)
 
     js.window.rendition = rendition
 
-    rendition.display_toc()
+    await rendition.display_toc_async()
     rendition.setup_controls("prev", "next")
-    rendition.display(book.spine[0])
+    await rendition.display_async(book.spine[0])
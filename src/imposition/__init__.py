@@ -1,11 +1,79 @@
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
 from .book import Book
-from .rendition import Rendition
+from .annotations import Annotation, AnnotationStore
+from .css import Stylesheet, StylesheetCache
 from .exceptions import ImpositionError, InvalidEpubError, MissingContainerError
+from .images import ImageCache, ImageVariant
+from .mathml import MathCache
+from .metadata import BookMetadata, MetadataCache, read_metadata, read_thumbnail
+from .speech import SpeechIndex, Utterance
+from .validation import ValidationIssue, ValidationReport, validate_epub
+
+if TYPE_CHECKING:
+    from .analysis import ChapterStatistics, ConcordanceLine, Corpus
+    from .rendition import Rendition
+    from .scan import ScanResult, scan_library
+    from .server import Resource, ResourceServer, serve_http
+
+# Names imported from their module on first access, so that importing the
+# package only loads the parsing core: the rendering and serving code, the
+# thread pool used for scanning and NumPy are not needed by every user.
+_LAZY_ATTRIBUTES = {
+    "ChapterStatistics": ".analysis",
+    "ConcordanceLine": ".analysis",
+    "Corpus": ".analysis",
+    "Rendition": ".rendition",
+    "ScanResult": ".scan",
+    "scan_library": ".scan",
+    "Resource": ".server",
+    "ResourceServer": ".server",
+    "serve_http": ".server",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
 
 __all__ = [
     "Book",
     "Rendition",
+    "Annotation",
+    "AnnotationStore",
+    "Stylesheet",
+    "StylesheetCache",
+    "ChapterStatistics",
+    "ConcordanceLine",
+    "Corpus",
     "ImpositionError",
     "InvalidEpubError",
     "MissingContainerError",
+    "ImageCache",
+    "ImageVariant",
+    "MathCache",
+    "BookMetadata",
+    "MetadataCache",
+    "read_metadata",
+    "read_thumbnail",
+    "ScanResult",
+    "scan_library",
+    "Resource",
+    "ResourceServer",
+    "serve_http",
+    "SpeechIndex",
+    "Utterance",
+    "ValidationIssue",
+    "ValidationReport",
+    "validate_epub",
 ]
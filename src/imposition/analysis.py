@@ -0,0 +1,277 @@
+from __future__ import annotations
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Tuple
+
+from .exceptions import ImpositionError
+from .text import WORD_PATTERN
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from .book import Book
+
+
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImpositionError("Corpus analysis requires NumPy.") from e
+    return numpy
+
+
+@dataclass
+class ChapterStatistics:
+    """
+    Per-chapter statistics of a corpus, one array entry per chapter.
+
+    :ivar tokens: The number of word tokens.
+    :ivar types: The number of distinct terms.
+    :ivar mean_word_length: The mean length of the tokens in characters,
+        0 for chapters without words.
+    """
+
+    tokens: np.ndarray
+    types: np.ndarray
+    mean_word_length: np.ndarray
+
+
+@dataclass(frozen=True)
+class ConcordanceLine:
+    """
+    An occurrence of a term with the words around it.
+
+    :ivar book: The position of the book in the corpus.
+    :ivar href: The path of the chapter in the EPUB archive.
+    :ivar position: The index of the token within its chapter.
+    :ivar offset: The character offset of the token in the normalized
+        chapter text, as used by annotations and speech.
+    :ivar left: The tokens before the occurrence, within the chapter.
+    :ivar keyword: The term.
+    :ivar right: The tokens after the occurrence, within the chapter.
+    """
+
+    book: int
+    href: str
+    position: int
+    offset: int
+    left: Tuple[str, ...]
+    keyword: str
+    right: Tuple[str, ...]
+
+
+class Corpus:
+    """
+    The word tokens of one or more books as NumPy arrays.
+
+    Every token is stored as an integer id into :attr:`vocabulary`, in
+    reading order across all chapters of all books, with the boundaries of
+    chapters and books kept as offsets into that array. Frequencies,
+    per-chapter statistics and concordances are then computed with
+    vectorized operations over the whole corpus instead of per-token Python
+    loops, so a shelf of books is analyzed as cheaply as one.
+
+    Tokens are lowercase words as produced by
+    :func:`imposition.text.tokenize`.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty corpus. Use :meth:`from_books` to build one.
+
+        :raises ImpositionError: If NumPy is not installed.
+        """
+        numpy = _numpy()
+        self.vocabulary: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+        # The term id of every token
+        self.tokens: np.ndarray = numpy.zeros(0, dtype=numpy.int32)
+        # The character offset of every token in its chapter's text
+        self.offsets: np.ndarray = numpy.zeros(0, dtype=numpy.int32)
+        # (book position, chapter href) of every chapter
+        self.chapters: List[Tuple[int, str]] = []
+        # Index of the first token of every chapter, plus the total
+        self.chapter_starts: np.ndarray = numpy.zeros(1, dtype=numpy.int64)
+        # Index of the first chapter of every book, plus the total
+        self.book_starts: np.ndarray = numpy.zeros(1, dtype=numpy.int64)
+        # The chapter of every token
+        self.chapter_ids: np.ndarray = numpy.zeros(0, dtype=numpy.int64)
+
+    @classmethod
+    def from_books(cls, books: Iterable[Book]) -> Corpus:
+        """
+        Tokenizes books into a corpus.
+
+        Chapters are read one at a time and only their token ids and offsets
+        are kept, so memory grows with the number of tokens rather than the
+        size of the text.
+
+        :param books: The books, in the order they are indexed.
+        :type books: Iterable[Book]
+        :return: The corpus.
+        :rtype: Corpus
+        :raises ImpositionError: If NumPy is not installed.
+        :raises InvalidEpubError: If a chapter is missing or malformed.
+        """
+        numpy = _numpy()
+        corpus = cls()
+        term_ids = corpus.term_ids
+        tokens = array("i")
+        offsets = array("i")
+        chapter_starts = [0]
+        book_starts = [0]
+        for book_position, book in enumerate(books):
+            for chapter_href, text in book.iter_text():
+                for match in WORD_PATTERN.finditer(text):
+                    term = match.group().lower()
+                    term_id = term_ids.get(term)
+                    if term_id is None:
+                        term_id = term_ids[term] = len(corpus.vocabulary)
+                        corpus.vocabulary.append(term)
+                    tokens.append(term_id)
+                    offsets.append(match.start())
+                corpus.chapters.append((book_position, chapter_href))
+                chapter_starts.append(len(tokens))
+            book_starts.append(len(corpus.chapters))
+
+        if tokens:
+            corpus.tokens = numpy.frombuffer(tokens, dtype=numpy.int32)
+            corpus.offsets = numpy.frombuffer(offsets, dtype=numpy.int32)
+        corpus.chapter_starts = numpy.array(chapter_starts, dtype=numpy.int64)
+        corpus.book_starts = numpy.array(book_starts, dtype=numpy.int64)
+        corpus.chapter_ids = numpy.repeat(
+            numpy.arange(len(corpus.chapters)), numpy.diff(corpus.chapter_starts)
+        )
+        return corpus
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def term_id(self, term: str) -> int:
+        """
+        Returns the id of a term.
+
+        :param term: The term, in any case.
+        :type term: str
+        :return: The index of the term in :attr:`vocabulary`, or -1 if it
+            does not occur in the corpus.
+        :rtype: int
+        """
+        return self.term_ids.get(term.lower(), -1)
+
+    def frequencies(self) -> np.ndarray:
+        """
+        Returns the number of occurrences of every term.
+
+        :return: The counts, indexed by term id.
+        :rtype: numpy.ndarray
+        """
+        return _numpy().bincount(self.tokens, minlength=len(self.vocabulary))
+
+    def most_common(self, count: int = 10) -> List[Tuple[str, int]]:
+        """
+        Returns the most frequent terms.
+
+        :param count: The number of terms to return.
+        :type count: int
+        :return: ``(term, occurrences)`` tuples, most frequent first; terms
+            occurring equally often are in order of first appearance.
+        :rtype: List[Tuple[str, int]]
+        """
+        numpy = _numpy()
+        frequencies = self.frequencies()
+        ranked = numpy.argsort(-frequencies, kind="stable")[:count]
+        return [(self.vocabulary[i], int(frequencies[i])) for i in ranked]
+
+    def term_counts(self, term: str, by: str = "chapter") -> np.ndarray:
+        """
+        Returns the number of occurrences of a term per chapter or book.
+
+        :param term: The term, in any case.
+        :type term: str
+        :param by: ``"chapter"`` or ``"book"``.
+        :type by: str
+        :return: The counts, indexed like :attr:`chapters` or by book
+            position.
+        :rtype: numpy.ndarray
+        :raises ValueError: If ``by`` is not a known grouping.
+        """
+        numpy = _numpy()
+        chapters = self.chapter_ids[self.tokens == self.term_id(term)]
+        if by == "chapter":
+            return numpy.bincount(chapters, minlength=len(self.chapters))
+        if by == "book":
+            books = numpy.searchsorted(self.book_starts, chapters, side="right") - 1
+            return numpy.bincount(books, minlength=len(self.book_starts) - 1)
+        raise ValueError(f"Unknown grouping: {by}")
+
+    def chapter_statistics(self) -> ChapterStatistics:
+        """
+        Computes token counts, vocabulary sizes and mean word lengths for
+        every chapter.
+
+        :rtype: ChapterStatistics
+        """
+        numpy = _numpy()
+        chapter_count = len(self.chapters)
+        tokens = numpy.diff(self.chapter_starts)
+        # Each distinct (chapter, term) pair counts once towards the types
+        # of its chapter.
+        pairs = numpy.unique(self.chapter_ids * len(self.vocabulary) + self.tokens)
+        types = numpy.bincount(
+            pairs // max(len(self.vocabulary), 1), minlength=chapter_count
+        )
+        term_lengths = numpy.fromiter(
+            (len(term) for term in self.vocabulary),
+            dtype=numpy.int64,
+            count=len(self.vocabulary),
+        )
+        lengths = numpy.bincount(
+            self.chapter_ids, weights=term_lengths[self.tokens], minlength=chapter_count
+        )
+        mean_word_length = numpy.divide(
+            lengths, tokens, out=numpy.zeros(chapter_count), where=tokens > 0
+        )
+        return ChapterStatistics(tokens, types, mean_word_length)
+
+    def concordance(self, term: str, width: int = 5) -> List[ConcordanceLine]:
+        """
+        Finds every occurrence of a term with its surrounding words.
+
+        :param term: The term, in any case.
+        :type term: str
+        :param width: The number of tokens shown on either side. Context
+            never extends into a neighbouring chapter.
+        :type width: int
+        :return: The occurrences in reading order.
+        :rtype: List[ConcordanceLine]
+        """
+        numpy = _numpy()
+        term_id = self.term_id(term)
+        if term_id < 0:
+            return []
+        hits = numpy.flatnonzero(self.tokens == term_id)
+        chapters = self.chapter_ids[hits]
+        starts = self.chapter_starts[chapters]
+        ends = self.chapter_starts[chapters + 1]
+        windows = hits[:, None] + numpy.arange(-width, width + 1)
+        inside = (windows >= starts[:, None]) & (windows < ends[:, None])
+        window_ids = self.tokens[numpy.clip(windows, 0, max(len(self.tokens) - 1, 0))]
+
+        lines: List[ConcordanceLine] = []
+        for row, hit in enumerate(hits):
+            book, href = self.chapters[chapters[row]]
+            words = [
+                self.vocabulary[i] if keep else None
+                for i, keep in zip(window_ids[row], inside[row])
+            ]
+            lines.append(ConcordanceLine(
+                book=book,
+                href=href,
+                position=int(hit - starts[row]),
+                offset=int(self.offsets[hit]),
+                left=tuple(word for word in words[:width] if word is not None),
+                keyword=self.vocabulary[term_id],
+                right=tuple(word for word in words[width + 1:] if word is not None),
+            ))
+        return lines
@@ -0,0 +1,487 @@
+from __future__ import annotations
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .text import XHTML_NAMESPACE, is_block
+
+HIGHLIGHT_CLASS = "imposition-highlight"
+ANNOTATION_IDS_ATTRIBUTE = "data-annotation-ids"
+ANNOTATION_COLOR_ATTRIBUTE = "data-annotation-color"
+
+TEXT_RUN_PATTERN = re.compile(r"\s+|\S+")
+# Colors that can be written into a style rule as they are: names, hex
+# values and functional notations such as rgb(...)
+COLOR_PATTERN = re.compile(r"#?[\w.%, ()-]+")
+
+
+@dataclass(frozen=True)
+class Annotation:
+    """
+    A highlight or note attached to a range of a chapter's text.
+
+    Offsets count characters of the whitespace-normalized chapter text
+    returned by :func:`imposition.text.chapter_text`, so they do not depend on
+    markup or on how the chapter is rendered.
+
+    :ivar id: A unique identifier.
+    :ivar href: The path of the spine item in the EPUB archive.
+    :ivar start: The offset of the first annotated character.
+    :ivar end: The offset just after the last annotated character.
+    :ivar note: The text of the note, if any.
+    :ivar color: A CSS color for the highlight, if not the default one.
+    """
+
+    id: str
+    href: str
+    start: int
+    end: int
+    note: Optional[str] = None
+    color: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.start < 0 or self.end < self.start:
+            raise ValueError(f"Invalid annotation range: {self.start}-{self.end}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the annotation as a JSON-serializable dictionary.
+
+        :rtype: Dict[str, Any]
+        """
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> Annotation:
+        """
+        Creates an annotation from a dictionary made by :meth:`to_dict`.
+
+        :param record: The dictionary. Unknown keys are ignored.
+        :type record: Dict[str, Any]
+        :rtype: Annotation
+        :raises ValueError: If a required key is missing or the range is
+            invalid.
+        """
+        try:
+            return cls(
+                id=str(record["id"]),
+                href=str(record["href"]),
+                start=int(record["start"]),
+                end=int(record["end"]),
+                note=record.get("note"),
+                color=record.get("color"),
+            )
+        except KeyError as e:
+            raise ValueError(f"Annotation record is missing {e}") from e
+
+
+class IntervalIndex:
+    """
+    A static index of intervals answering overlap queries in O(log n + k).
+
+    This is an implicit augmented interval tree as used by cgranges: the
+    intervals are sorted by start in a flat array that is read as a binary
+    search tree, where the element at index ``i`` sits at the level given
+    by the number of trailing 1 bits of ``i``. Each element additionally
+    records the largest end in its subtree, which lets queries skip whole
+    subtrees. Building takes O(n log n) and no pointers are stored.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, Annotation]]) -> None:
+        """
+        Builds the index.
+
+        :param intervals: ``(start, end, item)`` tuples with half-open
+            ranges.
+        :type intervals: Iterable[Tuple[int, int, Annotation]]
+        """
+        ordered = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.starts: List[int] = [interval[0] for interval in ordered]
+        self.ends: List[int] = [interval[1] for interval in ordered]
+        self.items: List[Annotation] = [interval[2] for interval in ordered]
+        self.max_ends: List[int] = list(self.ends)
+        self.root_level: int = self._augment()
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _augment(self) -> int:
+        n = len(self.starts)
+        if n == 0:
+            return -1
+        max_ends = self.max_ends
+        last_i = 0
+        last = 0
+        for i in range(0, n, 2):
+            last_i, last = i, max_ends[i]
+        level = 1
+        while 1 << level <= n:
+            half = 1 << (level - 1)
+            for i in range((half << 1) - 1, n, half << 2):
+                left = max_ends[i - half]
+                right = max_ends[i + half] if i + half < n else last
+                max_ends[i] = max(self.ends[i], left, right)
+            # Track the subtree maximum of the rightmost node at this level,
+            # which stands in for children beyond the end of the array.
+            last_i = last_i - half if last_i >> level & 1 else last_i + half
+            if last_i < n and max_ends[last_i] > last:
+                last = max_ends[last_i]
+            level += 1
+        return level - 1
+
+    def overlapping(self, start: int, end: int) -> List[Annotation]:
+        """
+        Returns the items whose intervals overlap ``[start, end)``.
+
+        :param start: The start of the query range.
+        :type start: int
+        :param end: The end of the query range.
+        :type end: int
+        :return: The overlapping items, ordered by start.
+        :rtype: List[Annotation]
+        """
+        n = len(self.starts)
+        found: List[Annotation] = []
+        if n == 0:
+            return found
+        starts, ends, max_ends = self.starts, self.ends, self.max_ends
+        # (node, level, whether the left subtree was visited)
+        root = (1 << self.root_level) - 1
+        stack: List[Tuple[int, int, bool]] = [(root, self.root_level, False)]
+        while stack:
+            node, level, left_done = stack.pop()
+            if level <= 3:
+                # Small subtree: scan it linearly.
+                i = node >> level << level
+                last = min(i + (1 << (level + 1)) - 1, n)
+                while i < last and starts[i] < end:
+                    if start < ends[i]:
+                        found.append(self.items[i])
+                    i += 1
+            elif not left_done:
+                left = node - (1 << (level - 1))
+                stack.append((node, level, True))
+                if left >= n or max_ends[left] > start:
+                    stack.append((left, level - 1, False))
+            elif node < n and starts[node] < end:
+                if start < ends[node]:
+                    found.append(self.items[node])
+                stack.append((node + (1 << (level - 1)), level - 1, False))
+        return found
+
+
+class AnnotationStore:
+    """
+    Holds the annotations of a book, indexed per spine item.
+
+    The interval index of a spine item is rebuilt lazily, on the first
+    query after its annotations changed, so bulk imports index each
+    chapter once.
+    """
+
+    def __init__(self, annotations: Iterable[Annotation] = ()) -> None:
+        """
+        Initializes the store.
+
+        :param annotations: Initial annotations.
+        :type annotations: Iterable[Annotation]
+        """
+        self._annotations: Dict[str, Annotation] = {}
+        self._hrefs: Dict[str, Set[str]] = {}
+        self._indexes: Dict[str, IntervalIndex] = {}
+        self.update(annotations)
+
+    def __len__(self) -> int:
+        return len(self._annotations)
+
+    def __iter__(self) -> Iterator[Annotation]:
+        return iter(self._annotations.values())
+
+    def __contains__(self, annotation_id: object) -> bool:
+        return annotation_id in self._annotations
+
+    def get(self, annotation_id: str) -> Optional[Annotation]:
+        """
+        Returns the annotation with the given id, if any.
+
+        :param annotation_id: The id of the annotation.
+        :type annotation_id: str
+        :rtype: Optional[Annotation]
+        """
+        return self._annotations.get(annotation_id)
+
+    def add(self, annotation: Annotation) -> None:
+        """
+        Adds an annotation, replacing any annotation with the same id.
+
+        :param annotation: The annotation to add.
+        :type annotation: Annotation
+        """
+        self.remove(annotation.id)
+        self._annotations[annotation.id] = annotation
+        self._hrefs.setdefault(annotation.href, set()).add(annotation.id)
+        self._indexes.pop(annotation.href, None)
+
+    def update(self, annotations: Iterable[Annotation]) -> None:
+        """
+        Adds several annotations.
+
+        :param annotations: The annotations to add.
+        :type annotations: Iterable[Annotation]
+        """
+        for annotation in annotations:
+            self.add(annotation)
+
+    def remove(self, annotation_id: str) -> Optional[Annotation]:
+        """
+        Removes an annotation.
+
+        :param annotation_id: The id of the annotation.
+        :type annotation_id: str
+        :return: The removed annotation, or None if there was none.
+        :rtype: Optional[Annotation]
+        """
+        annotation = self._annotations.pop(annotation_id, None)
+        if annotation is not None:
+            self._hrefs[annotation.href].discard(annotation_id)
+            self._indexes.pop(annotation.href, None)
+        return annotation
+
+    def for_chapter(self, href: str) -> List[Annotation]:
+        """
+        Returns the annotations of a spine item, ordered by start.
+
+        :param href: The path of the spine item in the EPUB archive.
+        :type href: str
+        :rtype: List[Annotation]
+        """
+        return list(self._index(href).items)
+
+    def overlapping(self, href: str, start: int, end: int) -> List[Annotation]:
+        """
+        Returns the annotations of a spine item overlapping a text range.
+
+        :param href: The path of the spine item in the EPUB archive.
+        :type href: str
+        :param start: The start offset of the range.
+        :type start: int
+        :param end: The end offset of the range.
+        :type end: int
+        :return: The overlapping annotations, ordered by start.
+        :rtype: List[Annotation]
+        """
+        return self._index(href).overlapping(start, end)
+
+    def import_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Adds annotations from dictionaries made by :meth:`export_records`.
+
+        :param records: The annotation records.
+        :type records: Iterable[Dict[str, Any]]
+        :return: The number of annotations imported.
+        :rtype: int
+        :raises ValueError: If a record is invalid. Records before it are
+            imported.
+        """
+        count = 0
+        for record in records:
+            self.add(Annotation.from_dict(record))
+            count += 1
+        return count
+
+    def export_records(self) -> List[Dict[str, Any]]:
+        """
+        Returns all annotations as JSON-serializable dictionaries.
+
+        :rtype: List[Dict[str, Any]]
+        """
+        return [annotation.to_dict() for annotation in self._annotations.values()]
+
+    def _index(self, href: str) -> IntervalIndex:
+        index = self._indexes.get(href)
+        if index is None:
+            annotations = (self._annotations[i] for i in self._hrefs.get(href, ()))
+            index = IntervalIndex(
+                (annotation.start, annotation.end, annotation)
+                for annotation in annotations
+            )
+            self._indexes[href] = index
+        return index
+
+
+def apply_highlights(root: ET.Element, annotations: List[Annotation]) -> None:
+    """
+    Wraps the annotated text ranges of a chapter in ``<mark>`` elements.
+
+    All annotations are applied in one walk over the text of the chapter.
+    Overlapping annotations are split into ranges covered by the same set
+    of annotations, so marks never nest; each mark lists the ids of its
+    annotations in a ``data-annotation-ids`` attribute, and its color, if
+    any, in ``data-annotation-color`` (see :func:`highlight_css`).
+
+    :param root: The root element of the chapter. It is modified in place.
+    :type root: ET.Element
+    :param annotations: The annotations of the chapter.
+    :type annotations: List[Annotation]
+    """
+    if not annotations:
+        return
+    body = root.find(f".//{{{XHTML_NAMESPACE}}}body")
+    container = body if body is not None else root
+
+    # Text segments in the order of itertext(), as (owner, is_tail, raw
+    # start, raw end). The raw text also holds the spaces that separate
+    # block elements in element_text(), which belong to no segment.
+    segments: List[Tuple[ET.Element, bool, int, int]] = []
+    pieces: List[str] = []
+    length = 0
+
+    def add(
+        piece: str, owner: Optional[ET.Element] = None, is_tail: bool = False
+    ) -> None:
+        nonlocal length
+        if owner is not None:
+            segments.append((owner, is_tail, length, length + len(piece)))
+        pieces.append(piece)
+        length += len(piece)
+
+    def collect(element: ET.Element) -> None:
+        if not isinstance(element.tag, str) and element.tag is not None:
+            return  # Comments and processing instructions have no text
+        block = is_block(element)
+        if block:
+            add(" ")
+        if element.text:
+            add(element.text, element)
+        for child in element:
+            collect(child)
+            if child.tail:
+                add(child.tail, child, True)
+        if block:
+            add(" ")
+
+    collect(container)
+    raw = "".join(pieces)
+    # Raw position of each character of the normalized text
+    positions: List[int] = []
+    leading = len(raw) - len(raw.lstrip())
+    for match in TEXT_RUN_PATTERN.finditer(raw, leading, len(raw.rstrip())):
+        if match.group()[0].isspace():
+            positions.append(match.start())
+        else:
+            positions.extend(range(match.start(), match.end()))
+
+    # Raw boundaries at which the set of covering annotations changes
+    boundaries: Dict[int, List[Tuple[bool, Annotation]]] = {}
+    for annotation in annotations:
+        start = min(annotation.start, len(positions))
+        end = min(annotation.end, len(positions))
+        if start >= end:
+            continue
+        boundaries.setdefault(positions[start], []).append((True, annotation))
+        boundaries.setdefault(positions[end - 1] + 1, []).append((False, annotation))
+    if not boundaries:
+        return
+
+    # Ranges with a constant, non-empty set of annotations
+    ranges: List[Tuple[int, int, List[Annotation]]] = []
+    active: Dict[str, Annotation] = {}
+    points = sorted(boundaries)
+    for point, next_point in zip(points, points[1:]):
+        for opening, annotation in boundaries[point]:
+            if opening:
+                active[annotation.id] = annotation
+            else:
+                active.pop(annotation.id, None)
+        if active:
+            covering = sorted(active.values(), key=lambda a: a.start)
+            ranges.append((point, next_point, covering))
+
+    # Split the ranges over the segments they fall into, then rewrite each
+    # affected segment once.
+    parents = {child: parent for parent in container.iter() for child in parent}
+    range_index = 0
+    for owner, is_tail, segment_start, segment_end in segments:
+        cuts: List[Tuple[int, int, List[Annotation]]] = []
+        while range_index < len(ranges) and ranges[range_index][0] < segment_end:
+            start, end, covering = ranges[range_index]
+            if end > segment_start:
+                cuts.append((
+                    max(start, segment_start) - segment_start,
+                    min(end, segment_end) - segment_start,
+                    covering,
+                ))
+            if end > segment_end:
+                break  # Continues in the next segment
+            range_index += 1
+        if cuts:
+            _wrap_segment(parents, owner, is_tail, cuts)
+
+
+def highlight_css(annotations: Iterable[Annotation]) -> str:
+    """
+    Returns the style rules coloring the highlights of annotations.
+
+    Marks carry their color in a ``data-annotation-color`` attribute rather
+    than an inline style, so that the color survives the removal of
+    publisher styles.
+
+    :param annotations: The annotations of a chapter.
+    :type annotations: Iterable[Annotation]
+    :return: One rule per distinct color. Colors that are not plain CSS
+        color values are ignored.
+    :rtype: str
+    """
+    colors = sorted({
+        annotation.color for annotation in annotations
+        if annotation.color and COLOR_PATTERN.fullmatch(annotation.color)
+    })
+    return "".join(
+        f'mark.{HIGHLIGHT_CLASS}[{ANNOTATION_COLOR_ATTRIBUTE}="{color}"]'
+        f" {{ background-color: {color}; }}"
+        for color in colors
+    )
+
+
+def _wrap_segment(
+    parents: Dict[ET.Element, ET.Element],
+    owner: ET.Element,
+    is_tail: bool,
+    cuts: List[Tuple[int, int, List[Annotation]]],
+) -> None:
+    text = (owner.tail if is_tail else owner.text) or ""
+    # Whitespace-only pieces, such as line breaks between paragraphs, are
+    # left unwrapped.
+    cuts = [cut for cut in cuts if text[cut[0]:cut[1]].strip()]
+    if not cuts:
+        return
+    marks: List[ET.Element] = []
+    for position, (start, end, covering) in enumerate(cuts):
+        mark = ET.Element(f"{{{XHTML_NAMESPACE}}}mark")
+        mark.set("class", HIGHLIGHT_CLASS)
+        mark.set(
+            ANNOTATION_IDS_ATTRIBUTE,
+            " ".join(annotation.id for annotation in covering),
+        )
+        color = next(
+            (annotation.color for annotation in covering if annotation.color), None
+        )
+        if color:
+            mark.set(ANNOTATION_COLOR_ATTRIBUTE, color)
+        mark.text = text[start:end]
+        following = cuts[position + 1][0] if position + 1 < len(cuts) else len(text)
+        mark.tail = text[end:following] or None
+        marks.append(mark)
+
+    if is_tail:
+        owner.tail = text[:cuts[0][0]] or None
+        parent = parents[owner]
+        index = list(parent).index(owner) + 1
+    else:
+        owner.text = text[:cuts[0][0]] or None
+        parent = owner
+        index = 0
+    for offset, mark in enumerate(marks):
+        parent.insert(index + offset, mark)
+
@@ -1,10 +1,86 @@
+from __future__ import annotations
 import zipfile
 import xml.etree.ElementTree as ET
-import io
 import posixpath
-from typing import List, Dict, Optional
+from types import TracebackType
+from typing import TYPE_CHECKING, Iterator, List, Dict, Optional, Tuple, Type
 
-from .exceptions import InvalidEpubError, MissingContainerError
+from .container import open_epub, read_opf
+from .exceptions import InvalidEpubError
+from .metadata import BookMetadata, parse_metadata
+
+if TYPE_CHECKING:
+    from .analysis import Corpus
+    from .css import Stylesheet
+    from .images import ImageCache
+    from .validation import ValidationReport
+
+OPF_NAMESPACES: Dict[str, str] = {"opf": "http://www.idpf.org/2007/opf"}
+NCX_NAMESPACES: Dict[str, str] = {"ncx": "http://www.daisy.org/z3986/2005/ncx/"}
+
+
+def parse_manifest(opf_root: ET.Element, opf_dir: str) -> Dict[str, Dict[str, str]]:
+    """
+    Parses the manifest of an OPF file.
+
+    :param opf_root: The root element of the OPF file.
+    :type opf_root: ET.Element
+    :param opf_dir: The directory of the OPF file in the archive.
+    :type opf_dir: str
+    :return: A dictionary mapping item ids to dictionaries with the 'url'
+        (the normalized path in the archive), 'media_type' and 'properties'
+        of each item.
+    :rtype: Dict[str, Dict[str, str]]
+    :raises InvalidEpubError: If the OPF file has no manifest element.
+    """
+    manifest: Dict[str, Dict[str, str]] = {}
+    manifest_element = opf_root.find("opf:manifest", OPF_NAMESPACES)
+    if manifest_element is None:
+        raise InvalidEpubError("Could not find manifest element in OPF file.")
+
+    for item in manifest_element.findall("opf:item", OPF_NAMESPACES):
+        item_id = item.get("id")
+        href = item.get("href")
+        if not item_id or not href:
+            continue  # Skip manifest items without id or href
+        # The href is relative to the .opf file, so create the full path
+        full_path: str = posixpath.join(opf_dir, href)
+        # Normalize the path to handle things like '..'
+        normalized_path: str = posixpath.normpath(full_path)
+        manifest[item_id] = {
+            'url': normalized_path,
+            'media_type': item.get("media-type", ""),
+            'properties': item.get("properties", ""),
+        }
+    return manifest
+
+
+def parse_ncx(toc_root: ET.Element, toc_path: str) -> List[Dict[str, str]]:
+    """
+    Extracts the navigation points of a parsed toc.ncx file.
+
+    :param toc_root: The root element of the NCX document.
+    :type toc_root: ET.Element
+    :param toc_path: The path of the NCX document in the archive.
+    :type toc_path: str
+    :return: A list of dictionaries with 'title' and 'url' keys.
+    :rtype: List[Dict[str, str]]
+    """
+    toc: List[Dict[str, str]] = []
+    for nav_point in toc_root.findall('.//ncx:navPoint', NCX_NAMESPACES):
+        title_element = nav_point.find('ncx:navLabel/ncx:text', NCX_NAMESPACES)
+        content_element = nav_point.find('ncx:content', NCX_NAMESPACES)
+        if title_element is None or not title_element.text or content_element is None:
+            continue
+        src = content_element.get('src')
+        if src:
+            title = title_element.text
+            # The src is relative to the toc.ncx file, so create the full path
+            full_path: str = posixpath.normpath(
+                posixpath.join(posixpath.dirname(toc_path), src)
+            )
+            toc.append({'title': title, 'url': full_path})
+    return toc
 
 
 class Book:
@@ -27,59 +103,169 @@ class Book:
         :raises MissingContainerError: If the META-INF/container.xml file is
             not found.
         """
-        epub_file = io.BytesIO(epub_bytes)
-        try:
-            self.zip_file: zipfile.ZipFile = zipfile.ZipFile(epub_file, "r")
-        except zipfile.BadZipFile as e:
-            raise InvalidEpubError("The file is not a valid ZIP archive.") from e
+        for _ in self._load(epub_bytes):
+            pass
 
-        # Validate mimetype file
-        try:
-            mimetype_content: bytes = self.zip_file.read("mimetype")
-            if mimetype_content.strip() != b"application/epub+zip":
-                raise InvalidEpubError(
-                    f"Invalid mimetype: {mimetype_content.decode('utf-8', errors='replace')}"
-                )
-        except KeyError as e:
-            raise InvalidEpubError("mimetype file not found in the EPUB file.") from e
+    @classmethod
+    async def open(cls, epub_bytes: bytes) -> Book:
+        """
+        Creates a Book, handing control back to the event loop between the
+        parsing stages.
 
-        # Find the .opf file from container.xml
-        try:
-            container_xml: bytes = self.zip_file.read("META-INF/container.xml")
-        except KeyError as e:
-            raise MissingContainerError(
-                "META-INF/container.xml not found in the EPUB file."
-            ) from e
+        In Pyodide this lets the page repaint and respond to input while a
+        large book is being opened.
 
-        try:
-            root: ET.Element = ET.fromstring(container_xml)
-        except ET.ParseError as e:
-            raise InvalidEpubError("Could not parse META-INF/container.xml.") from e
+        :param epub_bytes: The binary content of the EPUB file.
+        :type epub_bytes: bytes
+        :return: The parsed book.
+        :rtype: Book
+        :raises InvalidEpubError: If the file is not a valid ZIP archive or if
+            the EPUB structure is invalid.
+        :raises MissingContainerError: If the META-INF/container.xml file is
+            not found.
+        """
+        import asyncio
 
-        ns: Dict[str, str] = {"c": "urn:oasis:names:tc:opendocument:xmlns:container"}
-        rootfile_element: Optional[ET.Element] = root.find("c:rootfiles/c:rootfile", ns)
-        if rootfile_element is None:
-            raise InvalidEpubError("Could not find rootfile element in container.xml.")
+        book = cls.__new__(cls)
+        for _ in book._load(epub_bytes):
+            await asyncio.sleep(0)
+        return book
 
-        opf_path: Optional[str] = rootfile_element.get("full-path")
-        if not opf_path:
-            raise InvalidEpubError("Rootfile element in container.xml is missing the 'full-path' attribute.")
+    def close(self) -> None:
+        """
+        Closes the EPUB archive and discards cached stylesheets and images.
+
+        The book cannot be read from afterwards. Closing twice is harmless.
+        """
+        self.zip_file.close()
+        self._stylesheets.clear()
+        if self._images is not None:
+            self._images.clear()
+
+    def __enter__(self) -> Book:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def _load(self, epub_bytes: bytes) -> Iterator[None]:
+        """
+        Parses the book, yielding between stages.
+        """
+        self._metadata: Optional[BookMetadata] = None
+        self._stylesheets: Dict[str, Optional[Stylesheet]] = {}
+        self._images: Optional[ImageCache] = None
+
+        self.zip_file: zipfile.ZipFile = open_epub(epub_bytes)
+        yield
+        opf_path, opf_root = read_opf(self.zip_file)
 
         self.opf_path: str = opf_path
         self.opf_dir: str = posixpath.dirname(self.opf_path)
+        self.opf_root: ET.Element = opf_root
+        yield
 
-        try:
-            opf_xml: bytes = self.zip_file.read(self.opf_path)
-        except KeyError as e:
-            raise InvalidEpubError(f"OPF file not found: {self.opf_path}") from e
-        try:
-            self.opf_root: ET.Element = ET.fromstring(opf_xml)
-        except ET.ParseError as e:
-            raise InvalidEpubError(f"Could not parse OPF file: {self.opf_path}") from e
-
+        self.manifest: Dict[str, Dict[str, str]] = parse_manifest(
+            self.opf_root, self.opf_dir
+        )
         self.spine: List[str] = self._parse_spine()
+        # Maps each spine href to its first position, for constant-time lookups
+        self.spine_index: Dict[str, int] = {}
+        for position, href in enumerate(self.spine):
+            self.spine_index.setdefault(href, position)
+        yield
         self.toc: List[Dict[str, str]] = self._parse_toc()
 
+    @property
+    def metadata(self) -> BookMetadata:
+        """
+        The publication metadata declared in the OPF file.
+
+        :return: The title, creators, language, identifier and cover of the
+            book.
+        :rtype: BookMetadata
+        """
+        if self._metadata is None:
+            self._metadata = parse_metadata(self.opf_root, self.opf_dir)
+        return self._metadata
+
+    @property
+    def images(self) -> ImageCache:
+        """
+        The downscaled image variants of the book, shared by all renditions.
+
+        :rtype: ImageCache
+        :raises ImpositionError: If Pillow is not installed.
+        """
+        if self._images is None:
+            from .images import ImageCache
+
+            self._images = ImageCache(self)
+        return self._images
+
+    def stylesheet(self, path: str) -> Stylesheet:
+        """
+        Returns a stylesheet of the book with its references resolved.
+
+        Each stylesheet is read and parsed once, however many chapters link
+        to it.
+
+        :param path: The path of the stylesheet in the EPUB archive.
+        :type path: str
+        :return: The parsed stylesheet.
+        :rtype: Stylesheet
+        :raises InvalidEpubError: If the stylesheet does not exist.
+        """
+        from .css import load_stylesheet
+
+        return load_stylesheet(self, path, self._stylesheets)
+
+    def validate(self) -> ValidationReport:
+        """
+        Cross-checks the manifest, spine, TOC and chapter references.
+
+        Problems that the constructor tolerates, such as missing assets or
+        TOC entries pointing to unknown anchors, are collected into a report
+        instead of being raised.
+
+        :return: The validation report.
+        :rtype: ValidationReport
+        """
+        from .validation import validate_book
+
+        return validate_book(self)
+
+    def iter_text(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yields the whitespace-normalized text of each spine item in reading
+        order, reading one chapter at a time.
+
+        :return: An iterator of ``(chapter_href, text)`` tuples.
+        :rtype: Iterator[Tuple[str, str]]
+        :raises InvalidEpubError: If a chapter is missing or malformed.
+        """
+        from .text import iter_spine_text
+
+        return iter_spine_text(self)
+
+    def corpus(self) -> Corpus:
+        """
+        Tokenizes the book for analysis.
+
+        :return: The word tokens of the book as NumPy arrays.
+        :rtype: Corpus
+        :raises ImpositionError: If NumPy is not installed.
+        :raises InvalidEpubError: If a chapter is missing or malformed.
+        """
+        from .analysis import Corpus
+
+        return Corpus.from_books([self])
+
     def get_toc(self) -> List[Dict[str, str]]:
         """
         Returns the table of contents.
@@ -126,21 +312,7 @@ class Book:
         except ET.ParseError as e:
             raise InvalidEpubError(f"Could not parse TOC file: {toc_path}") from e
 
-        ns_ncx: Dict[str, str] = {"ncx": "http://www.daisy.org/z3986/2005/ncx/"}
-
-        toc: List[Dict[str, str]] = []
-        for nav_point in toc_root.findall('.//ncx:navPoint', ns_ncx):
-            title_element = nav_point.find('ncx:navLabel/ncx:text', ns_ncx)
-            content_element = nav_point.find('ncx:content', ns_ncx)
-            if title_element is not None and title_element.text and content_element is not None:
-                src = content_element.get('src')
-                if src:
-                    title = title_element.text
-                    # The src is relative to the toc.ncx file, so create the full path
-                    full_path: str = posixpath.normpath(posixpath.join(posixpath.dirname(toc_path), src))
-                    toc.append({'title': title, 'url': full_path})
-
-        return toc
+        return parse_ncx(toc_root, toc_path)
 
     def _parse_spine(self) -> List[str]:
         """
@@ -148,22 +320,6 @@ class Book:
         """
         ns: Dict[str, str] = {"opf": "http://www.idpf.org/2007/opf"}
 
-        manifest: Dict[str, str] = {}
-        manifest_element = self.opf_root.find("opf:manifest", ns)
-        if manifest_element is None:
-            raise InvalidEpubError("Could not find manifest element in OPF file.")
-
-        for item in manifest_element.findall("opf:item", ns):
-            item_id = item.get("id")
-            href = item.get("href")
-            if not item_id or not href:
-                continue  # Skip manifest items without id or href
-            # The href is relative to the .opf file, so create the full path
-            full_path: str = posixpath.join(self.opf_dir, href)
-            # Normalize the path to handle things like '..'
-            normalized_path: str = posixpath.normpath(full_path)
-            manifest[item_id] = normalized_path
-
         spine_element = self.opf_root.find("opf:spine", ns)
         if spine_element is None:
             raise InvalidEpubError("Could not find spine element in OPF file.")
@@ -172,7 +328,7 @@ class Book:
         spine_ids: List[str] = [idref for idref in spine_ids_raw if idref is not None]
 
         try:
-            spine_paths: List[str] = [manifest[id] for id in spine_ids]
+            spine_paths: List[str] = [self.manifest[id]['url'] for id in spine_ids]
         except KeyError as e:
             raise InvalidEpubError(f"Item in spine not found in manifest: {e}") from e
 
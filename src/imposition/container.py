@@ -0,0 +1,123 @@
+import io
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from .exceptions import InvalidEpubError, MissingContainerError
+
+CONTAINER_PATH = "META-INF/container.xml"
+
+
+def open_epub(epub_bytes: bytes) -> zipfile.ZipFile:
+    """
+    Opens the ZIP archive of an EPUB file and validates its mimetype.
+
+    Only the central directory and the ``mimetype`` member are read.
+
+    :param epub_bytes: The binary content of the EPUB file.
+    :type epub_bytes: bytes
+    :return: The opened archive.
+    :rtype: zipfile.ZipFile
+    :raises InvalidEpubError: If the file is not a valid ZIP archive or has
+        a missing or wrong mimetype.
+    """
+    try:
+        zip_file = zipfile.ZipFile(io.BytesIO(epub_bytes), "r")
+    except zipfile.BadZipFile as e:
+        raise InvalidEpubError("The file is not a valid ZIP archive.") from e
+
+    try:
+        mimetype_content: bytes = zip_file.read("mimetype")
+        if mimetype_content.strip() != b"application/epub+zip":
+            mimetype = mimetype_content.decode('utf-8', errors='replace')
+            raise InvalidEpubError(f"Invalid mimetype: {mimetype}")
+    except KeyError as e:
+        raise InvalidEpubError("mimetype file not found in the EPUB file.") from e
+
+    return zip_file
+
+
+def read_opf_path(zip_file: zipfile.ZipFile) -> str:
+    """
+    Finds the path of the OPF package document from container.xml.
+
+    :param zip_file: The opened EPUB archive.
+    :type zip_file: zipfile.ZipFile
+    :return: The path of the OPF file in the archive.
+    :rtype: str
+    :raises MissingContainerError: If META-INF/container.xml is not found.
+    :raises InvalidEpubError: If container.xml is malformed.
+    """
+    try:
+        container_xml: bytes = zip_file.read(CONTAINER_PATH)
+    except KeyError as e:
+        raise MissingContainerError(
+            "META-INF/container.xml not found in the EPUB file."
+        ) from e
+
+    try:
+        root: ET.Element = ET.fromstring(container_xml)
+    except ET.ParseError as e:
+        raise InvalidEpubError("Could not parse META-INF/container.xml.") from e
+
+    ns: Dict[str, str] = {"c": "urn:oasis:names:tc:opendocument:xmlns:container"}
+    rootfile_element: Optional[ET.Element] = root.find("c:rootfiles/c:rootfile", ns)
+    if rootfile_element is None:
+        raise InvalidEpubError("Could not find rootfile element in container.xml.")
+
+    opf_path: Optional[str] = rootfile_element.get("full-path")
+    if not opf_path:
+        raise InvalidEpubError(
+            "Rootfile element in container.xml is missing the 'full-path' attribute."
+        )
+    return opf_path
+
+
+def read_opf(zip_file: zipfile.ZipFile) -> Tuple[str, ET.Element]:
+    """
+    Locates and parses the OPF package document of an EPUB archive.
+
+    :param zip_file: The opened EPUB archive.
+    :type zip_file: zipfile.ZipFile
+    :return: The path of the OPF file and its parsed root element.
+    :rtype: Tuple[str, ET.Element]
+    :raises MissingContainerError: If META-INF/container.xml is not found.
+    :raises InvalidEpubError: If container.xml or the OPF file is missing
+        or malformed.
+    """
+    opf_path = read_opf_path(zip_file)
+    try:
+        opf_xml: bytes = zip_file.read(opf_path)
+    except KeyError as e:
+        raise InvalidEpubError(f"OPF file not found: {opf_path}") from e
+    try:
+        opf_root: ET.Element = ET.fromstring(opf_xml)
+    except ET.ParseError as e:
+        raise InvalidEpubError(f"Could not parse OPF file: {opf_path}") from e
+    return opf_path, opf_root
+
+
+def resolve_reference(document_path: str, reference: str) -> Optional[Tuple[str, str]]:
+    """
+    Resolves a reference found in a document to an archive path.
+
+    :param document_path: The archive path of the document containing the
+        reference.
+    :type document_path: str
+    :param reference: The value of a ``src`` or ``href`` attribute.
+    :type reference: str
+    :return: The normalized archive path and the (possibly empty) fragment,
+        or None for external and ``data:`` URIs.
+    :rtype: Optional[Tuple[str, str]]
+    """
+    parts = urlsplit(reference)
+    if parts.scheme or parts.netloc:
+        return None
+    if not parts.path:
+        return document_path, unquote(parts.fragment)
+    path = posixpath.normpath(
+        posixpath.join(posixpath.dirname(document_path), unquote(parts.path))
+    )
+    return path, unquote(parts.fragment)
@@ -0,0 +1,390 @@
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .container import resolve_reference
+from .exceptions import InvalidEpubError
+
+if TYPE_CHECKING:
+    from .book import Book
+
+COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+CHARSET_PATTERN = re.compile(r"@charset\s+[^;]*;", re.IGNORECASE)
+URL_PATTERN = re.compile(r"""url\(\s*(["']?)(.*?)\1\s*\)""", re.IGNORECASE | re.DOTALL)
+IMPORT_PATTERN = re.compile(
+    r"""@import\s+(?:url\(\s*(["']?)(.*?)\1\s*\)|(["'])(.*?)\3)\s*([^;]*);""",
+    re.IGNORECASE | re.DOTALL,
+)
+ROOT_SELECTOR_PATTERN = re.compile(r"^(?::root|html|body)\b", re.IGNORECASE)
+
+# At-rules whose blocks contain ordinary style rules
+GROUPING_AT_RULES = ("@media", "@supports", "@layer", "@container", "@document")
+
+
+@dataclass(frozen=True)
+class Stylesheet:
+    """
+    A stylesheet of a book, with its references resolved.
+
+    :ivar path: The path of the stylesheet in the EPUB archive.
+    :ivar text: The CSS text. Comments and ``@charset`` rules are removed,
+        ``@import`` rules are replaced by the imported rules, and every
+        relative ``url()`` refers to an archive path.
+    :ivar references: The archive paths referenced through ``url()``.
+    """
+
+    path: str
+    text: str
+    references: FrozenSet[str]
+
+
+def parse_stylesheet(
+    path: str,
+    css_text: str,
+    load_import: Optional[Callable[[str], Optional[Stylesheet]]] = None,
+) -> Stylesheet:
+    """
+    Resolves the references of a stylesheet against its location.
+
+    :param path: The archive path the CSS was read from, or of the document
+        containing it.
+    :type path: str
+    :param css_text: The CSS text.
+    :type css_text: str
+    :param load_import: Returns the stylesheet at an archive path, for
+        ``@import`` rules. Imports are dropped if it is not given or returns
+        None.
+    :type load_import: Optional[Callable[[str], Optional[Stylesheet]]]
+    :return: The parsed stylesheet.
+    :rtype: Stylesheet
+    """
+    references: Set[str] = set()
+
+    def inline_import(match: "re.Match[str]") -> str:
+        target = resolve_reference(path, match.group(2) or match.group(4) or "")
+        imported = load_import(target[0]) if target and load_import else None
+        if imported is None:
+            return ""
+        references.update(imported.references)
+        media = match.group(5).strip()
+        return f"@media {media} {{{imported.text}}}" if media else imported.text
+
+    def resolve_url(match: "re.Match[str]") -> str:
+        target = resolve_reference(path, match.group(2).strip())
+        if target is None or not target[0]:
+            return match.group(0)
+        target_path, fragment = target
+        references.add(target_path)
+        if fragment:
+            return f'url("{target_path}#{fragment}")'
+        return f'url("{target_path}")'
+
+    css_text = COMMENT_PATTERN.sub("", css_text)
+    css_text = CHARSET_PATTERN.sub("", css_text)
+    # Imported text already refers to archive paths, so only the text of
+    # this stylesheet has its url() references resolved.
+    parts: List[str] = []
+    position = 0
+    for match in IMPORT_PATTERN.finditer(css_text):
+        parts.append(URL_PATTERN.sub(resolve_url, css_text[position:match.start()]))
+        parts.append(inline_import(match))
+        position = match.end()
+    parts.append(URL_PATTERN.sub(resolve_url, css_text[position:]))
+    return Stylesheet(path, "".join(parts).strip(), frozenset(references))
+
+
+def load_stylesheet(
+    book: Book, path: str, cache: Dict[str, Optional[Stylesheet]]
+) -> Stylesheet:
+    """
+    Reads and parses a stylesheet of a book, memoizing the result.
+
+    :param book: The book containing the stylesheet.
+    :type book: Book
+    :param path: The path of the stylesheet in the EPUB archive.
+    :type path: str
+    :param cache: Stylesheets parsed so far, keyed by path. An entry is None
+        while the stylesheet is being parsed, which breaks import cycles.
+    :type cache: Dict[str, Optional[Stylesheet]]
+    :rtype: Stylesheet
+    :raises InvalidEpubError: If the stylesheet does not exist.
+    """
+    stylesheet = cache.get(path)
+    if stylesheet is not None:
+        return stylesheet
+    try:
+        css_bytes = book.zip_file.read(path)
+    except KeyError as e:
+        raise InvalidEpubError(f"Stylesheet not found: {path}") from e
+
+    def load_import(import_path: str) -> Optional[Stylesheet]:
+        if import_path in cache:
+            return cache[import_path]
+        try:
+            return load_stylesheet(book, import_path, cache)
+        except InvalidEpubError:
+            return None
+
+    cache[path] = None
+    css_text = css_bytes.decode("utf-8-sig", errors="replace")
+    stylesheet = parse_stylesheet(path, css_text, load_import)
+    cache[path] = stylesheet
+    return stylesheet
+
+
+def process_css(
+    css_text: str, scope: Optional[str] = None, exclude: Iterable[str] = ()
+) -> str:
+    """
+    Scopes the selectors and filters the declarations of a stylesheet.
+
+    :param css_text: The CSS text, without comments.
+    :type css_text: str
+    :param scope: A selector every style rule is nested under, e.g.
+        ``.chapter``. Rules for ``html``, ``body`` and ``:root`` apply to the
+        scope element itself.
+    :type scope: Optional[str]
+    :param exclude: Names of properties whose declarations are dropped.
+    :type exclude: Iterable[str]
+    :rtype: str
+    """
+    excluded = frozenset(name.lower() for name in exclude)
+    if not scope and not excluded:
+        return css_text
+    return _process_rules(css_text, scope, excluded)
+
+
+def filter_declarations(declarations: str, exclude: Iterable[str]) -> str:
+    """
+    Drops declarations of the given properties, e.g. from a ``style``
+    attribute.
+
+    :param declarations: A declaration list such as ``color: red; margin: 0``.
+    :type declarations: str
+    :param exclude: Names of properties whose declarations are dropped.
+    :type exclude: Iterable[str]
+    :rtype: str
+    """
+    excluded = frozenset(name.lower() for name in exclude)
+    if not excluded:
+        return declarations
+    kept = [
+        declaration.strip()
+        for declaration in _split(declarations, ";")
+        if declaration.strip()
+        and declaration.split(":", 1)[0].strip().lower() not in excluded
+    ]
+    return "; ".join(kept)
+
+
+def _process_rules(
+    css_text: str, scope: Optional[str], excluded: FrozenSet[str]
+) -> str:
+    output: List[str] = []
+    position = 0
+    while position < len(css_text):
+        brace = css_text.find("{", position)
+        semicolon = css_text.find(";", position)
+        if brace == -1:
+            if css_text[position:].strip():
+                output.append(css_text[position:])
+            break
+        if (
+            semicolon != -1
+            and semicolon < brace
+            and css_text[position:semicolon].strip().startswith("@")
+        ):
+            # A statement at-rule such as @namespace
+            output.append(css_text[position:semicolon + 1])
+            position = semicolon + 1
+            continue
+        end = _block_end(css_text, brace)
+        prelude = css_text[position:brace].strip()
+        body = css_text[brace + 1:end]
+        lowered = prelude.lower()
+        if lowered.startswith(GROUPING_AT_RULES):
+            output.append(f"{prelude} {{\n{_process_rules(body, scope, excluded)}}}\n")
+        elif prelude.startswith("@"):
+            # Other at-rules (@font-face, @page, @keyframes) are kept as is
+            output.append(f"{prelude} {{{body}}}\n")
+        else:
+            if scope:
+                prelude = _scope_selectors(prelude, scope)
+            if excluded:
+                body = filter_declarations(body, excluded)
+            body = body.strip()
+            output.append(f"{prelude} {{ {body} }}\n" if body else f"{prelude} {{}}\n")
+        position = end + 1
+    return "".join(output)
+
+
+def _scope_selectors(selectors: str, scope: str) -> str:
+    scoped: List[str] = []
+    for selector in _split(selectors, ","):
+        selector = selector.strip()
+        if not selector:
+            continue
+        if ROOT_SELECTOR_PATTERN.match(selector):
+            scoped.append(ROOT_SELECTOR_PATTERN.sub(scope, selector, count=1))
+        else:
+            scoped.append(f"{scope} {selector}")
+    return ", ".join(scoped)
+
+
+def _block_end(css_text: str, brace: int) -> int:
+    """Returns the position of the brace closing the block opened at ``brace``."""
+    depth = 0
+    for position in range(brace, len(css_text)):
+        if css_text[position] == "{":
+            depth += 1
+        elif css_text[position] == "}":
+            depth -= 1
+            if depth == 0:
+                return position
+    return len(css_text)
+
+
+def _split(text: str, separator: str) -> List[str]:
+    """Splits on a separator outside of parentheses and quotes."""
+    parts: List[str] = []
+    depth = 0
+    quote: Optional[str] = None
+    start = 0
+    for position, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:position])
+            start = position + 1
+    parts.append(text[start:])
+    return parts
+
+
+class StylesheetCache:
+    """
+    Publisher stylesheets prepared for display, processed once each.
+
+    Parsing is shared by all users of a book through :meth:`Book.stylesheet`;
+    this cache holds the result of scoping, filtering and mapping the
+    ``url()`` references of each stylesheet for one rendition.
+    """
+
+    def __init__(
+        self,
+        book: Book,
+        resolve_url: Callable[[str], Optional[str]],
+        scope: Optional[str] = None,
+        exclude: Iterable[str] = (),
+    ) -> None:
+        """
+        Initializes the cache.
+
+        :param book: The book whose stylesheets are processed.
+        :type book: Book
+        :param resolve_url: Maps an archive path referenced through
+            ``url()`` to the URL it is loaded from, or None to leave the
+            reference unchanged.
+        :type resolve_url: Callable[[str], Optional[str]]
+        :param scope: See :func:`process_css`.
+        :type scope: Optional[str]
+        :param exclude: See :func:`process_css`.
+        :type exclude: Iterable[str]
+        """
+        self.book: Book = book
+        self.resolve_url = resolve_url
+        self.scope: Optional[str] = None
+        self.exclude: Tuple[str, ...] = ()
+        self._texts: Dict[str, str] = {}
+        self.configure(scope, exclude)
+
+    def configure(
+        self, scope: Optional[str] = None, exclude: Iterable[str] = ()
+    ) -> None:
+        """
+        Changes the scope and excluded properties, discarding cached results.
+
+        :param scope: See :func:`process_css`.
+        :type scope: Optional[str]
+        :param exclude: See :func:`process_css`.
+        :type exclude: Iterable[str]
+        """
+        self.scope = scope
+        self.exclude = tuple(exclude)
+        self._texts.clear()
+
+    def text(self, path: str) -> str:
+        """
+        Returns the processed text of a stylesheet of the book.
+
+        :param path: The path of the stylesheet in the EPUB archive.
+        :type path: str
+        :rtype: str
+        :raises InvalidEpubError: If the stylesheet does not exist.
+        """
+        if path not in self._texts:
+            self._texts[path] = self._render(self.book.stylesheet(path))
+        return self._texts[path]
+
+    def process(self, css_text: str, document_path: str) -> str:
+        """
+        Processes CSS embedded in a document, e.g. a ``<style>`` element.
+
+        :param css_text: The CSS text.
+        :type css_text: str
+        :param document_path: The archive path of the document.
+        :type document_path: str
+        :rtype: str
+        """
+        stylesheet = parse_stylesheet(document_path, css_text, self._load_import)
+        return self._render(stylesheet)
+
+    def filter(self, declarations: str) -> str:
+        """
+        Applies the excluded properties to a ``style`` attribute.
+
+        :param declarations: The attribute value.
+        :type declarations: str
+        :rtype: str
+        """
+        return filter_declarations(declarations, self.exclude)
+
+    def clear(self) -> None:
+        """Discards all processed stylesheets."""
+        self._texts.clear()
+
+    def _load_import(self, path: str) -> Optional[Stylesheet]:
+        try:
+            return self.book.stylesheet(path)
+        except InvalidEpubError:
+            return None
+
+    def _render(self, stylesheet: Stylesheet) -> str:
+        def map_url(match: "re.Match[str]") -> str:
+            path, _, fragment = match.group(2).partition("#")
+            if path not in stylesheet.references:
+                return match.group(0)
+            url = self.resolve_url(path)
+            if url is None:
+                return match.group(0)
+            return f'url("{url}#{fragment}")' if fragment else f'url("{url}")'
+
+        css_text = process_css(stylesheet.text, self.scope, self.exclude)
+        return URL_PATTERN.sub(map_url, css_text)
@@ -1,8 +1,24 @@
-from typing import Protocol, Any, Callable
+from __future__ import annotations
+from typing import TYPE_CHECKING, Protocol, Any, Callable, Dict, Optional, Tuple, Union
 
-from js import document
-from pyodide.ffi import create_proxy as pyodide_create_proxy
-from pyodide.ffi import JsProxy
+from .server import (
+    SERVICE_WORKER_REGISTER,
+    SERVICE_WORKER_REQUEST,
+    SERVICE_WORKER_UNREGISTER,
+)
+
+if TYPE_CHECKING:
+    from pyodide.ffi import JsProxy
+
+    from .server import Resource
+
+# The browser bindings (the ``js`` and ``pyodide`` modules) are imported by
+# the methods of PyodideDOMAdapter that use them, so that this module, and
+# everything importing it, loads without them outside of Pyodide.
+
+ResourceHandler = Callable[[str, Optional[str]], "Resource"]
+# Undoes a registration, releasing the proxies it created
+Disposer = Callable[[], None]
 
 class DOMElement(Protocol):
     """A protocol for DOM elements."""
@@ -10,9 +26,10 @@ class DOMElement(Protocol):
     innerHTML: str
     textContent: str
     href: str
-    onclick: Callable[[Any], None]
-    onload: str
+    onclick: Optional[Callable[[Any], None]]
+    onload: Union[str, Callable[[Any], None]]
     src: str
+    srcdoc: str
     disabled: bool
     className: str
 
@@ -36,13 +53,238 @@ class DOMAdapter(Protocol):
     def create_proxy(self, handler: Callable[..., Any]) -> Callable[..., Any]:
         ...
 
+    def destroy_proxy(self, proxy: Callable[..., Any]) -> None:
+        ...
+
+    def get_element_size(self, element: DOMElement) -> Tuple[int, int]:
+        ...
+
+    def get_device_pixel_ratio(self) -> float:
+        ...
+
+    def get_scroll_width(self, frame: DOMElement) -> int:
+        ...
+
+    def get_anchor_offset(self, frame: DOMElement, anchor: str) -> Optional[int]:
+        ...
+
+    def scroll_frame(self, frame: DOMElement, left: int, top: int) -> None:
+        ...
+
+    def scroll_to_anchor(self, frame: DOMElement, anchor: str) -> None:
+        ...
+
+    def add_message_listener(
+        self, frame: DOMElement, handler: Callable[[Any], None]
+    ) -> Disposer:
+        ...
+
+    def serve_resources(self, prefix: str, handler: ResourceHandler) -> Disposer:
+        ...
+
+    def create_object_url(self, data: bytes, mime_type: str) -> str:
+        ...
+
+    def revoke_object_url(self, url: str) -> None:
+        ...
+
+    def observe_lazy_images(
+        self, frame: DOMElement, attribute: str, resolve: Callable[[str], Optional[str]]
+    ) -> Disposer:
+        ...
+
 class PyodideDOMAdapter:
-    """An implementation of the DOMAdapter protocol using Pyodide."""
+    """
+    An implementation of the DOMAdapter protocol using Pyodide.
+
+    The ``js`` and ``pyodide`` modules are only imported when a method
+    needs them.
+    """
+    def __init__(self) -> None:
+        # Live proxies, keyed by id; a proxy keeps its Python callable alive
+        # until it is destroyed.
+        self.proxies: Dict[int, JsProxy] = {}
+
     def get_element_by_id(self, element_id: str) -> JsProxy:
+        from js import document
+
         return document.getElementById(element_id)
 
     def create_element(self, tag_name: str) -> JsProxy:
+        from js import document
+
         return document.createElement(tag_name)
 
     def create_proxy(self, handler: Callable[..., Any]) -> Callable[..., Any]:
-        return pyodide_create_proxy(handler)
+        from pyodide.ffi import create_proxy
+
+        proxy = create_proxy(handler)
+        self.proxies[id(proxy)] = proxy
+        return proxy
+
+    def destroy_proxy(self, proxy: Callable[..., Any]) -> None:
+        if self.proxies.pop(id(proxy), None) is not None:
+            proxy.destroy()  # type: ignore[attr-defined]
+
+    def get_element_size(self, element: JsProxy) -> Tuple[int, int]:
+        return int(element.clientWidth), int(element.clientHeight)
+
+    def get_device_pixel_ratio(self) -> float:
+        from js import window
+
+        return float(window.devicePixelRatio or 1)
+
+    def get_scroll_width(self, frame: JsProxy) -> int:
+        frame_document = frame.contentDocument
+        if frame_document is None:
+            return 0
+        return int(frame_document.documentElement.scrollWidth)
+
+    def get_anchor_offset(self, frame: JsProxy, anchor: str) -> Optional[int]:
+        frame_document = frame.contentDocument
+        if frame_document is None:
+            return None
+        target = frame_document.getElementById(anchor)
+        if target is None:
+            return None
+        return int(target.getBoundingClientRect().left + frame.contentWindow.scrollX)
+
+    def scroll_frame(self, frame: JsProxy, left: int, top: int) -> None:
+        frame.contentWindow.scrollTo(left, top)
+
+    def scroll_to_anchor(self, frame: JsProxy, anchor: str) -> None:
+        frame_document = frame.contentDocument
+        target = None
+        if frame_document is not None:
+            target = frame_document.getElementById(anchor)
+        if target is not None:
+            target.scrollIntoView()
+            return
+        # data: URI documents are cross-origin, so their DOM is out of reach.
+        # Changing only the fragment of the frame URL scrolls it without
+        # reloading the document. A srcdoc frame has no such URL: setting
+        # its src would replace the document, so a missing anchor is left
+        # alone.
+        src = str(frame.src)
+        if src.startswith(("data:", "http:", "https:")):
+            frame.src = src.split("#")[0] + "#" + anchor
+
+    def add_message_listener(
+        self, frame: JsProxy, handler: Callable[[Any], None]
+    ) -> Disposer:
+        from js import window
+
+        def listener(event: JsProxy) -> None:
+            # Ignore messages that were not posted by the frame's document.
+            if event.source != frame.contentWindow:
+                return
+            data = event.data
+            handler(data.to_py() if hasattr(data, "to_py") else data)
+
+        proxy = self.create_proxy(listener)
+        window.addEventListener("message", proxy)
+
+        def dispose() -> None:
+            window.removeEventListener("message", proxy)
+            self.destroy_proxy(proxy)
+
+        return dispose
+
+    def serve_resources(self, prefix: str, handler: ResourceHandler) -> Disposer:
+        from js import Object, navigator
+        from pyodide.ffi import to_js
+
+        # Requests for the prefix are intercepted by imposition-sw.js, which
+        # must already be registered by the page, and forwarded here.
+        container = navigator.serviceWorker
+
+        def on_message(event: JsProxy) -> None:
+            data = event.data
+            if data is None or getattr(data, "type", None) != SERVICE_WORKER_REQUEST:
+                return
+            if not str(data.url).startswith(prefix):
+                return
+            resource = handler(str(data.url), data.etag or None)
+            reply = {
+                "status": resource.status,
+                "headers": resource.headers,
+                "body": resource.body,
+            }
+            event.ports[0].postMessage(to_js(reply, dict_converter=Object.fromEntries))
+
+        def register(registration: JsProxy) -> None:
+            message = {"type": SERVICE_WORKER_REGISTER, "prefix": prefix}
+            registration.active.postMessage(
+                to_js(message, dict_converter=Object.fromEntries)
+            )
+
+        def unregister(registration: JsProxy) -> None:
+            message = {"type": SERVICE_WORKER_UNREGISTER, "prefix": prefix}
+            registration.active.postMessage(
+                to_js(message, dict_converter=Object.fromEntries)
+            )
+
+        listener = self.create_proxy(on_message)
+        container.addEventListener("message", listener)
+        container.startMessages()
+        # Pyodide destroys the proxies it makes for promise callbacks once
+        # they have been called.
+        container.ready.then(register)
+
+        def dispose() -> None:
+            container.removeEventListener("message", listener)
+            self.destroy_proxy(listener)
+            container.ready.then(unregister)
+
+        return dispose
+
+    def create_object_url(self, data: bytes, mime_type: str) -> str:
+        from js import URL, Blob, Object
+        from pyodide.ffi import to_js
+
+        options = to_js({"type": mime_type}, dict_converter=Object.fromEntries)
+        return str(URL.createObjectURL(Blob.new([to_js(data)], options)))
+
+    def revoke_object_url(self, url: str) -> None:
+        from js import URL
+
+        URL.revokeObjectURL(url)
+
+    def observe_lazy_images(
+        self, frame: JsProxy, attribute: str, resolve: Callable[[str], Optional[str]]
+    ) -> Disposer:
+        from js import Object
+        from pyodide.ffi import to_js
+
+        def on_intersect(entries: JsProxy, observer: JsProxy) -> None:
+            for entry in entries:
+                if not entry.isIntersecting:
+                    continue
+                image = entry.target
+                observer.unobserve(image)
+                url = resolve(str(image.getAttribute(attribute)))
+                image.removeAttribute(attribute)
+                if url:
+                    image.src = url
+
+        callback = self.create_proxy(on_intersect)
+
+        def on_load(event: JsProxy) -> None:
+            # Each chapter is a new document, observed from its own window.
+            frame_document = frame.contentDocument
+            if frame_document is None:
+                return
+            options = to_js({"rootMargin": "100%"}, dict_converter=Object.fromEntries)
+            observer = frame.contentWindow.IntersectionObserver.new(callback, options)
+            for image in frame_document.querySelectorAll(f"[{attribute}]"):
+                observer.observe(image)
+
+        listener = self.create_proxy(on_load)
+        frame.addEventListener("load", listener)
+
+        def dispose() -> None:
+            frame.removeEventListener("load", listener)
+            self.destroy_proxy(listener)
+            self.destroy_proxy(callback)
+
+        return dispose
@@ -0,0 +1,281 @@
+from __future__ import annotations
+import io
+import mimetypes
+import struct
+import zipfile
+from urllib.parse import quote
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from .exceptions import ImpositionError
+
+if TYPE_CHECKING:
+    from .book import Book
+
+# Widths, in CSS pixels, of the variants produced for large images
+SIZE_BUCKETS: Tuple[int, ...] = (320, 640, 960, 1280, 1920, 2560)
+
+# Formats that are decoded and downscaled; anything else (SVG, unknown
+# types) is always used as is.
+RASTER_MIME_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp")
+
+
+def bucket_for(width: int) -> int:
+    """
+    Returns the smallest size bucket at least as wide as the given width.
+
+    :param width: The width the image is displayed at, in pixels.
+    :type width: int
+    :return: A width from :data:`SIZE_BUCKETS`; the largest one if the
+        given width exceeds all of them.
+    :rtype: int
+    """
+    for bucket in SIZE_BUCKETS:
+        if bucket >= width:
+            return bucket
+    return SIZE_BUCKETS[-1]
+
+
+# Bytes read from the start of an image to find its dimensions
+HEADER_SIZE = 64 * 1024
+
+# JPEG start-of-frame markers, which carry the image dimensions
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def parse_image_size(header: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Reads the dimensions of a PNG, GIF, JPEG, WebP or BMP image from its
+    header.
+
+    This does not need Pillow and only looks at the first bytes of the file.
+
+    :param header: The start of the encoded image.
+    :type header: bytes
+    :return: The width and height, or None if the format is not recognized
+        or the dimensions are not within ``header``.
+    :rtype: Optional[Tuple[int, int]]
+    """
+    if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", header[16:24])
+        return width, height
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        width, height = struct.unpack("<HH", header[6:10])
+        return width, height
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        chunk = header[12:16]
+        if chunk == b"VP8X" and len(header) >= 30:
+            return (
+                1 + int.from_bytes(header[24:27], "little"),
+                1 + int.from_bytes(header[27:30], "little"),
+            )
+        if chunk == b"VP8 " and len(header) >= 30:
+            width, height = struct.unpack("<HH", header[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L" and len(header) >= 25:
+            bits = int.from_bytes(header[21:25], "little")
+            return 1 + (bits & 0x3FFF), 1 + ((bits >> 14) & 0x3FFF)
+        return None
+    if header[:2] == b"BM" and len(header) >= 26:
+        if header[14:18] == b"\x0c\x00\x00\x00":  # OS/2 1.x header
+            width, height = struct.unpack("<HH", header[18:22])
+            return width, height
+        width, height = struct.unpack("<ii", header[18:26])
+        return width, abs(height)  # Negative for top-down bitmaps
+    if header[:2] == b"\xff\xd8":
+        position = 2
+        while position + 9 <= len(header):
+            if header[position] != 0xFF:
+                return None
+            marker = header[position + 1]
+            if marker == 0xFF:
+                position += 1  # Fill byte
+                continue
+            if marker in JPEG_SOF_MARKERS:
+                height, width = struct.unpack(">HH", header[position + 5:position + 9])
+                return width, height
+            (length,) = struct.unpack(">H", header[position + 2:position + 4])
+            position += 2 + length
+    return None
+
+
+def read_image_size(zip_file: zipfile.ZipFile, path: str) -> Optional[Tuple[int, int]]:
+    """
+    Reads the dimensions of an image in an archive, decompressing only the
+    start of the member.
+
+    :param zip_file: The EPUB archive.
+    :type zip_file: zipfile.ZipFile
+    :param path: The path of the image in the archive.
+    :type path: str
+    :return: The width and height, or None if they cannot be determined.
+    :rtype: Optional[Tuple[int, int]]
+    """
+    try:
+        with zip_file.open(path) as member:
+            return parse_image_size(member.read(HEADER_SIZE))
+    except KeyError:
+        return None
+
+
+def placeholder_uri(size: Optional[Tuple[int, int]]) -> str:
+    """
+    Returns a transparent image with the given intrinsic size, so that
+    layout does not shift when the real image is loaded.
+
+    :param size: The width and height, if known.
+    :type size: Optional[Tuple[int, int]]
+    :return: An SVG data URI.
+    :rtype: str
+    """
+    dimensions = f" width='{size[0]}' height='{size[1]}'" if size else ""
+    svg = f"<svg xmlns='http://www.w3.org/2000/svg'{dimensions}/>"
+    return "data:image/svg+xml," + quote(svg, safe="/:='")
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    """
+    A downscaled copy of an image of a book.
+
+    :ivar path: The archive path of the source image.
+    :ivar width: The width of the variant in pixels.
+    :ivar height: The height of the variant in pixels.
+    :ivar media_type: The media type of :attr:`data`.
+    :ivar data: The encoded variant.
+    """
+
+    path: str
+    width: int
+    height: int
+    media_type: str
+    data: bytes
+
+
+class ImageCache:
+    """
+    Downscaled variants of the raster images of a book.
+
+    Each source image is decoded at most once while its variants are being
+    produced; a few decoded images are kept so that a chapter requesting
+    several sizes of the same image does not decode it again. Variants are
+    produced per size bucket, so viewports of similar widths share them, and
+    images no wider than a bucket are never re-encoded.
+    """
+
+    def __init__(self, book: Book, decoded_maxsize: int = 4) -> None:
+        """
+        Initializes the cache.
+
+        :param book: The book whose images are downscaled.
+        :type book: Book
+        :param decoded_maxsize: The number of decoded source images kept in
+            memory.
+        :type decoded_maxsize: int
+        :raises ImpositionError: If Pillow is not installed.
+        """
+        try:
+            from PIL import Image  # noqa: F401
+        except ImportError as e:
+            raise ImpositionError("Downscaling images requires Pillow.") from e
+        self.book: Book = book
+        self.decoded_maxsize: int = decoded_maxsize
+        self._variants: Dict[Tuple[str, int], Optional[ImageVariant]] = {}
+        self._sizes: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._decoded: "OrderedDict[str, Any]" = OrderedDict()
+
+    def size(self, path: str) -> Optional[Tuple[int, int]]:
+        """
+        Returns the dimensions of an image, read from its header.
+
+        Only the start of the archive member is decompressed; the image is
+        decoded later, if a variant is actually needed.
+
+        :param path: The path of the image in the EPUB archive.
+        :type path: str
+        :return: The width and height, or None if the image is missing, not
+            a raster image or cannot be read.
+        :rtype: Optional[Tuple[int, int]]
+        """
+        if path not in self._sizes:
+            size: Optional[Tuple[int, int]] = None
+            if mimetypes.guess_type(path)[0] in RASTER_MIME_TYPES:
+                size = read_image_size(self.book.zip_file, path)
+            self._sizes[path] = size
+        return self._sizes[path]
+
+    def variant(self, path: str, width: int) -> Optional[ImageVariant]:
+        """
+        Returns the smallest variant of an image adequate for a width.
+
+        :param path: The path of the image in the EPUB archive.
+        :type path: str
+        :param width: The width the image is displayed at, in pixels.
+        :type width: int
+        :return: The variant, or None if the original should be used: it is
+            no wider than the size bucket, is not a (still) raster image, or
+            cannot be decoded.
+        :rtype: Optional[ImageVariant]
+        """
+        bucket = bucket_for(width)
+        key = (path, bucket)
+        if key not in self._variants:
+            size = self.size(path)
+            if size is None or size[0] <= bucket:
+                self._variants[key] = None
+            else:
+                self._variants[key] = self._downscale(path, bucket)
+        return self._variants[key]
+
+    def clear(self) -> None:
+        """Discards all variants and decoded images."""
+        self._variants.clear()
+        self._sizes.clear()
+        self._decoded.clear()
+
+    def _open(self, path: str) -> Any:
+        """Returns the lazily decoded image at ``path``, or None."""
+        if path in self._decoded:
+            self._decoded.move_to_end(path)
+            return self._decoded[path]
+        if mimetypes.guess_type(path)[0] not in RASTER_MIME_TYPES:
+            return None
+        from PIL import Image
+
+        try:
+            image = Image.open(io.BytesIO(self.book.zip_file.read(path)))
+        except (KeyError, OSError, SyntaxError):
+            return None
+        if getattr(image, "n_frames", 1) > 1:
+            return None  # Animations would lose all but their first frame
+        self._decoded[path] = image
+        if len(self._decoded) > self.decoded_maxsize:
+            self._decoded.popitem(last=False)
+        return image
+
+    def _downscale(self, path: str, bucket: int) -> Optional[ImageVariant]:
+        source = self._open(path)
+        if source is None:
+            return None
+        try:
+            # The source stays decoded for the other buckets; thumbnail()
+            # works on a copy.
+            source.load()
+            image = source.copy()
+            image.thumbnail((bucket, image.height))
+        except (OSError, SyntaxError):
+            return None
+
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P") or "transparency" in image.info:
+            image.save(output, format="PNG", optimize=True)
+            media_type = "image/png"
+        else:
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(output, format="JPEG", quality=85)
+            media_type = "image/jpeg"
+        return ImageVariant(
+            path, image.width, image.height, media_type, output.getvalue()
+        )
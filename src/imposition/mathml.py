@@ -0,0 +1,291 @@
+from __future__ import annotations
+import hashlib
+import os
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+MATHML_NAMESPACE = "http://www.w3.org/1998/Math/MathML"
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+XHTML_NAMESPACE = "http://www.w3.org/1999/xhtml"
+XLINK_NAMESPACE = "http://www.w3.org/1999/xlink"
+
+# Namespaces of the foreign elements HTML parsers recognize without a
+# prefix
+FOREIGN_NAMESPACES = frozenset((MATHML_NAMESPACE, SVG_NAMESPACE))
+
+# Class of the elements that replace rendered formulas
+MATH_CLASS = "imposition-math"
+
+# Attributes that identify or describe a formula without affecting how it
+# is rendered
+IGNORED_ATTRIBUTES = frozenset(("id", "alttext"))
+
+# Renders a formula, given its canonical MathML source and whether it is a
+# display (block) formula, to an SVG or XHTML fragment. Returns None if the
+# formula cannot be rendered, in which case the MathML is kept.
+MathRenderer = Callable[[str, bool], Optional[str]]
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def is_math(element: ET.Element) -> bool:
+    """
+    Returns whether an element is the root of a MathML formula.
+
+    Formulas are recognized by the MathML namespace, whatever prefix (e.g.
+    ``m:math``) the chapter binds it to, and also when a ``<math>`` element
+    merely inherits the XHTML default namespace, as in HTML documents.
+
+    :param element: An element of a chapter.
+    :type element: ET.Element
+    :rtype: bool
+    """
+    tag = element.tag
+    if not isinstance(tag, str):
+        return False
+    return tag in (f"{{{MATHML_NAMESPACE}}}math", f"{{{XHTML_NAMESPACE}}}math", "math")
+
+
+def is_display(element: ET.Element) -> bool:
+    """
+    Returns whether a formula is displayed as a block.
+
+    :param element: A ``<math>`` element.
+    :type element: ET.Element
+    :rtype: bool
+    """
+    return element.get("display") == "block" or element.get("mode") == "display"
+
+
+def canonical_mathml(element: ET.Element) -> str:
+    """
+    Serializes a formula independently of how the chapter spells it.
+
+    The result is in the MathML default namespace, with attributes sorted,
+    ``id`` and ``alttext`` attributes dropped (they do not affect rendering)
+    and insignificant whitespace collapsed, so that the same formula yields
+    the same source in every chapter and book.
+
+    :param element: A ``<math>`` element.
+    :type element: ET.Element
+    :return: The MathML source of the formula.
+    :rtype: str
+    """
+    parts: List[str] = []
+    _serialize(element, parts, root=True)
+    return "".join(parts)
+
+
+def _serialize(element: ET.Element, parts: List[str], root: bool = False) -> None:
+    name = _local_name(element.tag)
+    if not name:
+        return  # Comments and processing instructions
+    parts.append(f"<{name}")
+    if root:
+        parts.append(f' xmlns="{MATHML_NAMESPACE}"')
+    for key, value in sorted(element.attrib.items()):
+        if _local_name(key) not in IGNORED_ATTRIBUTES:
+            parts.append(f" {_local_name(key)}={quoteattr(value)}")
+    parts.append(">")
+    parts.append(escape(" ".join((element.text or "").split())))
+    for child in element:
+        _serialize(child, parts)
+        parts.append(escape(" ".join((child.tail or "").split())))
+    parts.append(f"</{name}>")
+
+
+def unqualify_foreign(element: ET.Element) -> None:
+    """
+    Rewrites the SVG and MathML descendants of an element for HTML output.
+
+    ElementTree serializes namespaced elements with generated prefixes,
+    such as ``<ns1:svg>``, which HTML parsers take for unknown elements.
+    Foreign elements are renamed to their local names instead, with an
+    ``xmlns`` attribute on the root of each foreign subtree, as in HTML
+    markup. XLink attributes keep their conventional ``xlink:`` prefix.
+
+    :param element: The element to rewrite in place, with its descendants.
+    :type element: ET.Element
+    """
+    _unqualify(element, XHTML_NAMESPACE)
+
+
+def _unqualify(element: ET.Element, parent_namespace: str) -> None:
+    namespace = parent_namespace
+    tag = element.tag
+    if isinstance(tag, str) and tag.startswith("{"):
+        namespace, name = tag[1:].split("}", 1)
+        if namespace in FOREIGN_NAMESPACES:
+            element.tag = name
+            if namespace != parent_namespace:
+                element.attrib = {"xmlns": namespace, **element.attrib}
+            for key in [key for key in element.attrib if key.startswith("{")]:
+                if key.startswith(f"{{{XLINK_NAMESPACE}}}"):
+                    element.set(f"xlink:{_local_name(key)}", element.attrib.pop(key))
+    for child in element:
+        _unqualify(child, namespace)
+
+
+class MathCache:
+    """
+    Rendered formulas, keyed by a hash of their canonical MathML.
+
+    Each distinct formula is rendered once: a formula repeated in other
+    chapters, or in other books sharing the cache, costs a lookup. Recently
+    used results are kept in memory; with a ``directory``, successful
+    renderings are also stored on disk (in the browser, e.g. on a persistent
+    IDBFS mount), so they survive across sessions.
+    """
+
+    def __init__(
+        self,
+        renderer: MathRenderer,
+        directory: Optional[str] = None,
+        maxsize: int = 1024,
+        version: str = "",
+    ) -> None:
+        """
+        Initializes the cache.
+
+        :param renderer: Renders formulas that are not cached yet.
+        :type renderer: MathRenderer
+        :param directory: A directory in which rendered formulas are
+            stored, or None to only keep them in memory.
+        :type directory: Optional[str]
+        :param maxsize: The number of formulas kept in memory. The least
+            recently used ones are discarded first.
+        :type maxsize: int
+        :param version: Identifies the renderer and its settings. It is part
+            of every key, so output of different renderers never mixes in a
+            shared directory.
+        :type version: str
+        """
+        self.renderer: MathRenderer = renderer
+        self.directory: Optional[str] = directory
+        self.maxsize: int = maxsize
+        self.version: str = version
+        self._rendered: "OrderedDict[str, Optional[str]]" = OrderedDict()
+
+    def key(self, source: str, display: bool) -> str:
+        """
+        Returns the cache key of a formula.
+
+        :param source: The canonical MathML of the formula.
+        :type source: str
+        :param display: Whether it is a display formula.
+        :type display: bool
+        :rtype: str
+        """
+        digest = hashlib.sha256(f"{self.version}\n{int(display)}\n".encode("utf-8"))
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def render(self, source: str, display: bool = False) -> Optional[str]:
+        """
+        Returns the rendering of a formula, rendering it on a cache miss.
+
+        :param source: The canonical MathML of the formula, as returned by
+            :func:`canonical_mathml`.
+        :type source: str
+        :param display: Whether it is a display formula.
+        :type display: bool
+        :return: The SVG or XHTML fragment, or None if the renderer could
+            not render the formula.
+        :rtype: Optional[str]
+        """
+        key = self.key(source, display)
+        if key in self._rendered:
+            self._rendered.move_to_end(key)
+            return self._rendered[key]
+
+        markup = self._load(key)
+        if markup is None:
+            markup = self.renderer(source, display)
+            if markup is not None:
+                self._save(key, markup)
+        self._rendered[key] = markup
+        if len(self._rendered) > self.maxsize:
+            self._rendered.popitem(last=False)
+        return markup
+
+    def clear(self) -> None:
+        """Discards the formulas kept in memory. Stored ones are kept."""
+        self._rendered.clear()
+
+    def _path(self, key: str) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, key[:2], f"{key}.html")
+
+    def _load(self, key: str) -> Optional[str]:
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as stored:
+                return stored.read()
+        except OSError:
+            return None
+
+    def _save(self, key: str, markup: str) -> None:
+        if self.directory is None:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name first, so that a concurrent
+            # reader never sees a partial file.
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as stored:
+                stored.write(markup)
+            os.replace(temporary, path)
+        except OSError as e:
+            print(f"Could not store rendered formula: {e}")
+
+
+def render_math(element: ET.Element, cache: MathCache) -> bool:
+    """
+    Replaces a formula with its cached rendering, in place.
+
+    The element becomes a ``<span>`` (or a ``<div>`` for display formulas)
+    of class :data:`MATH_CLASS` holding the rendered fragment. It keeps its
+    ``id`` and tail text, and its ``alttext``, if any, becomes its
+    accessible label. The fragment is written without namespace prefixes,
+    see :func:`unqualify_foreign`.
+
+    :param element: A ``<math>`` element.
+    :type element: ET.Element
+    :param cache: The cache used to render the formula.
+    :type cache: MathCache
+    :return: Whether the formula was replaced. It is left unchanged if it
+        could not be rendered or the rendering is not well-formed.
+    :rtype: bool
+    """
+    display = is_display(element)
+    markup = cache.render(canonical_mathml(element), display)
+    if markup is None:
+        return False
+    try:
+        fragment = ET.fromstring(f'<span xmlns="{XHTML_NAMESPACE}">{markup}</span>')
+    except ET.ParseError as e:
+        print(f"Could not parse rendered formula: {e}")
+        return False
+
+    element_id = element.get("id")
+    label = element.get("alttext")
+    tail = element.tail
+    element.clear()
+    element.tag = f"{{{XHTML_NAMESPACE}}}{'div' if display else 'span'}"
+    element.set("class", MATH_CLASS)
+    element.set("role", "math")
+    if element_id is not None:
+        element.set("id", element_id)
+    if label:
+        element.set("aria-label", label)
+    unqualify_foreign(fragment)
+    element.text = fragment.text
+    element.extend(fragment)
+    element.tail = tail
+    return True
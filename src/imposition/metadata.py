@@ -0,0 +1,280 @@
+import hashlib
+import io
+import posixpath
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, TypeVar
+
+from .container import open_epub, read_opf
+from .exceptions import ImpositionError, InvalidEpubError
+
+DC_NAMESPACE = "http://purl.org/dc/elements/1.1/"
+OPF_NAMESPACE = "http://www.idpf.org/2007/opf"
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+@dataclass(frozen=True)
+class BookMetadata:
+    """
+    Publication metadata of an EPUB file, as declared in its OPF file.
+
+    :ivar title: The first ``dc:title`` of the publication.
+    :ivar creators: The ``dc:creator`` entries, in document order.
+    :ivar language: The first ``dc:language`` of the publication.
+    :ivar identifier: The unique identifier of the publication.
+    :ivar cover_path: The path of the cover image in the archive, if any.
+    :ivar cover_media_type: The media type of the cover image, if any.
+    """
+
+    title: Optional[str] = None
+    creators: Tuple[str, ...] = ()
+    language: Optional[str] = None
+    identifier: Optional[str] = None
+    cover_path: Optional[str] = None
+    cover_media_type: Optional[str] = None
+
+    @property
+    def author(self) -> Optional[str]:
+        """The first creator of the publication, if any."""
+        return self.creators[0] if self.creators else None
+
+
+def parse_metadata(opf_root: ET.Element, opf_dir: str) -> BookMetadata:
+    """
+    Extracts the publication metadata from a parsed OPF file.
+
+    The cover image is located through the EPUB 3 ``cover-image`` manifest
+    property, falling back to the EPUB 2 ``<meta name="cover">`` element.
+
+    :param opf_root: The root element of the OPF file.
+    :type opf_root: ET.Element
+    :param opf_dir: The directory of the OPF file in the archive.
+    :type opf_dir: str
+    :return: The extracted metadata.
+    :rtype: BookMetadata
+    """
+    ns: Dict[str, str] = {"opf": OPF_NAMESPACE, "dc": DC_NAMESPACE}
+    metadata_element: Optional[ET.Element] = opf_root.find("opf:metadata", ns)
+    if metadata_element is None:
+        return BookMetadata()
+
+    def first_text(tag: str) -> Optional[str]:
+        element = metadata_element.find(f"dc:{tag}", ns)
+        if element is None or not element.text:
+            return None
+        return element.text.strip()
+
+    creators: List[str] = [
+        element.text.strip()
+        for element in metadata_element.findall("dc:creator", ns)
+        if element.text and element.text.strip()
+    ]
+
+    identifier: Optional[str] = None
+    unique_id: Optional[str] = opf_root.get("unique-identifier")
+    if unique_id:
+        for element in metadata_element.findall("dc:identifier", ns):
+            if element.get("id") == unique_id and element.text:
+                identifier = element.text.strip()
+                break
+    if identifier is None:
+        identifier = first_text("identifier")
+
+    cover_item: Optional[ET.Element] = None
+    for item in opf_root.findall("opf:manifest/opf:item", ns):
+        if "cover-image" in (item.get("properties") or "").split():
+            cover_item = item
+            break
+    if cover_item is None:
+        for meta in metadata_element.findall("opf:meta", ns):
+            if meta.get("name") == "cover" and meta.get("content"):
+                cover_item = opf_root.find(
+                    f"opf:manifest/opf:item[@id='{meta.get('content')}']", ns
+                )
+                break
+
+    cover_path: Optional[str] = None
+    cover_media_type: Optional[str] = None
+    if cover_item is not None and cover_item.get("href"):
+        cover_path = posixpath.normpath(
+            posixpath.join(opf_dir, str(cover_item.get("href")))
+        )
+        cover_media_type = cover_item.get("media-type")
+
+    return BookMetadata(
+        title=first_text("title"),
+        creators=tuple(creators),
+        language=first_text("language"),
+        identifier=identifier,
+        cover_path=cover_path,
+        cover_media_type=cover_media_type,
+    )
+
+
+def make_thumbnail(image_bytes: bytes, max_size: Tuple[int, int]) -> bytes:
+    """
+    Downscales an image to fit within ``max_size`` and encodes it as JPEG.
+
+    :param image_bytes: The encoded source image.
+    :type image_bytes: bytes
+    :param max_size: The maximum width and height of the thumbnail.
+    :type max_size: Tuple[int, int]
+    :return: The JPEG-encoded thumbnail.
+    :rtype: bytes
+    :raises ImpositionError: If Pillow is not installed.
+    :raises InvalidEpubError: If the image cannot be decoded.
+    """
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise ImpositionError("Creating thumbnails requires Pillow.") from e
+
+    try:
+        source = Image.open(io.BytesIO(image_bytes))
+        # Let JPEG decoding skip straight to a reduced scale where possible.
+        source.draft("RGB", max_size)
+        image: Image.Image = source
+        image.thumbnail(max_size)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+    except (OSError, SyntaxError) as e:
+        raise InvalidEpubError("Could not decode cover image.") from e
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+class MetadataCache:
+    """
+    Reads EPUB metadata without constructing a full :class:`Book`.
+
+    Only the ZIP central directory, the mimetype, container.xml and the OPF
+    file are read; the spine, table of contents and chapters are never
+    touched. Results are memoized by the SHA-256 hash of the EPUB content,
+    so the same file is only parsed once however often it is shown.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """
+        Initializes an empty cache.
+
+        :param maxsize: The maximum number of books whose metadata and
+            thumbnails are kept. The least recently used entries are
+            discarded first.
+        :type maxsize: int
+        """
+        self.maxsize: int = maxsize
+        self._metadata: "OrderedDict[str, BookMetadata]" = OrderedDict()
+        # Keyed by content digest and maximum size
+        self._thumbnails: "OrderedDict[Tuple[str, Tuple[int, int]], Optional[bytes]]"
+        self._thumbnails = OrderedDict()
+
+    def metadata(self, epub_bytes: bytes) -> BookMetadata:
+        """
+        Returns the metadata of an EPUB file.
+
+        :param epub_bytes: The binary content of the EPUB file.
+        :type epub_bytes: bytes
+        :return: The metadata of the book.
+        :rtype: BookMetadata
+        :raises InvalidEpubError: If the EPUB structure is invalid.
+        :raises MissingContainerError: If META-INF/container.xml is missing.
+        """
+        return self._metadata_for(self._digest(epub_bytes), epub_bytes)
+
+    def thumbnail(
+        self, epub_bytes: bytes, max_size: Tuple[int, int] = (200, 300)
+    ) -> Optional[bytes]:
+        """
+        Returns a downscaled JPEG of the cover of an EPUB file.
+
+        :param epub_bytes: The binary content of the EPUB file.
+        :type epub_bytes: bytes
+        :param max_size: The maximum width and height of the thumbnail.
+        :type max_size: Tuple[int, int]
+        :return: The JPEG-encoded thumbnail, or None if the book declares no
+            cover or the cover file is missing.
+        :rtype: Optional[bytes]
+        :raises ImpositionError: If Pillow is not installed.
+        :raises InvalidEpubError: If the EPUB structure is invalid or the
+            cover cannot be decoded.
+        """
+        digest = self._digest(epub_bytes)
+        key = (digest, max_size)
+        if key in self._thumbnails:
+            self._thumbnails.move_to_end(key)
+            return self._thumbnails[key]
+
+        thumbnail: Optional[bytes] = None
+        metadata = self._metadata_for(digest, epub_bytes)
+        if metadata.cover_path:
+            try:
+                cover_bytes = open_epub(epub_bytes).read(metadata.cover_path)
+            except KeyError:
+                cover_bytes = None
+            if cover_bytes is not None:
+                thumbnail = make_thumbnail(cover_bytes, max_size)
+
+        self._store(self._thumbnails, key, thumbnail)
+        return thumbnail
+
+    def clear(self) -> None:
+        """Discards all cached metadata and thumbnails."""
+        self._metadata.clear()
+        self._thumbnails.clear()
+
+    @staticmethod
+    def _digest(epub_bytes: bytes) -> str:
+        return hashlib.sha256(epub_bytes).hexdigest()
+
+    def _metadata_for(self, digest: str, epub_bytes: bytes) -> BookMetadata:
+        metadata = self._metadata.get(digest)
+        if metadata is not None:
+            self._metadata.move_to_end(digest)
+            return metadata
+        opf_path, opf_root = read_opf(open_epub(epub_bytes))
+        metadata = parse_metadata(opf_root, posixpath.dirname(opf_path))
+        self._store(self._metadata, digest, metadata)
+        return metadata
+
+    def _store(self, cache: "OrderedDict[K, V]", key: K, value: V) -> None:
+        cache[key] = value
+        if len(cache) > self.maxsize:
+            cache.popitem(last=False)
+
+
+_default_cache: MetadataCache = MetadataCache()
+
+
+def read_metadata(epub_bytes: bytes) -> BookMetadata:
+    """
+    Returns the metadata of an EPUB file using a shared, memoizing cache.
+
+    :param epub_bytes: The binary content of the EPUB file.
+    :type epub_bytes: bytes
+    :return: The metadata of the book.
+    :rtype: BookMetadata
+    :raises InvalidEpubError: If the EPUB structure is invalid.
+    :raises MissingContainerError: If META-INF/container.xml is missing.
+    """
+    return _default_cache.metadata(epub_bytes)
+
+
+def read_thumbnail(
+    epub_bytes: bytes, max_size: Tuple[int, int] = (200, 300)
+) -> Optional[bytes]:
+    """
+    Returns a cover thumbnail of an EPUB file using a shared, memoizing cache.
+
+    :param epub_bytes: The binary content of the EPUB file.
+    :type epub_bytes: bytes
+    :param max_size: The maximum width and height of the thumbnail.
+    :type max_size: Tuple[int, int]
+    :return: The JPEG-encoded thumbnail, or None if there is no cover.
+    :rtype: Optional[bytes]
+    """
+    return _default_cache.thumbnail(epub_bytes, max_size)
@@ -0,0 +1,114 @@
+import bisect
+from typing import Callable, Dict, List, Tuple
+
+# (chapter href, viewport width, viewport height, font size, spread)
+PageKey = Tuple[str, int, int, int, bool]
+
+
+class Paginator:
+    """
+    Computes and caches page breaks for paginated chapters.
+
+    A paginated chapter is laid out as a row of CSS columns, each exactly one
+    page wide, so a page break is simply a horizontal scroll offset. Breaks
+    only depend on the chapter and the layout parameters, so they are
+    measured once per viewport/font-size combination and reused afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._cache: Dict[PageKey, List[int]] = {}
+
+    @staticmethod
+    def page_width(width: int, spread: bool) -> int:
+        """
+        Returns the width of a single column for the given viewport width.
+
+        :param width: The width of the viewport in pixels.
+        :type width: int
+        :param spread: Whether two columns are shown side by side.
+        :type spread: bool
+        :return: The column width in pixels.
+        :rtype: int
+        """
+        return max(width // 2, 1) if spread else max(width, 1)
+
+    @classmethod
+    def layout_css(cls, width: int, height: int, font_size: int, spread: bool) -> str:
+        """
+        Returns the stylesheet that lays a chapter out as fixed-size columns.
+
+        :param width: The width of the viewport in pixels.
+        :type width: int
+        :param height: The height of the viewport in pixels.
+        :type height: int
+        :param font_size: The base font size in pixels.
+        :type font_size: int
+        :param spread: Whether two columns are shown side by side.
+        :type spread: bool
+        :return: The CSS text.
+        :rtype: str
+        """
+        column_width = cls.page_width(width, spread)
+        return (
+            f"html {{ height: {height}px; overflow: hidden; }} "
+            f"body {{ margin: 0; height: {height}px; font-size: {font_size}px; "
+            f"column-width: {column_width}px; column-gap: 0; column-fill: auto; }} "
+            "img, svg, video { max-width: 100%; max-height: 100%; }"
+        )
+
+    def page_breaks(
+        self,
+        chapter_href: str,
+        width: int,
+        height: int,
+        font_size: int,
+        spread: bool,
+        measure: Callable[[], int],
+    ) -> List[int]:
+        """
+        Returns the scroll offsets at which each page of a chapter starts.
+
+        ``measure`` is only called when the breaks for this combination of
+        chapter and layout parameters are not cached yet.
+
+        :param chapter_href: The path of the chapter in the EPUB archive.
+        :type chapter_href: str
+        :param width: The width of the viewport in pixels.
+        :type width: int
+        :param height: The height of the viewport in pixels.
+        :type height: int
+        :param font_size: The base font size in pixels.
+        :type font_size: int
+        :param spread: Whether two columns are shown side by side.
+        :type spread: bool
+        :param measure: A callable returning the laid-out content width.
+        :type measure: Callable[[], int]
+        :return: A list of horizontal offsets, one per page.
+        :rtype: List[int]
+        """
+        key: PageKey = (chapter_href, width, height, font_size, spread)
+        breaks = self._cache.get(key)
+        if breaks is None:
+            step = max(width, 1)
+            content_width = max(measure(), 1)
+            breaks = list(range(0, content_width, step))
+            self._cache[key] = breaks
+        return breaks
+
+    @staticmethod
+    def page_for_offset(breaks: List[int], offset: int) -> int:
+        """
+        Returns the index of the page containing a horizontal offset.
+
+        :param breaks: The page breaks of the chapter.
+        :type breaks: List[int]
+        :param offset: A horizontal offset in the laid-out chapter.
+        :type offset: int
+        :return: The page index.
+        :rtype: int
+        """
+        return max(bisect.bisect_right(breaks, offset) - 1, 0)
+
+    def clear(self) -> None:
+        """Discards all cached page breaks."""
+        self._cache.clear()
@@ -1,15 +1,58 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Any, Callable, Optional, List, Tuple
+from types import TracebackType
+from typing import (
+    TYPE_CHECKING, Any, Callable, Dict, Generator, Optional, List, Tuple, Type
+)
+
+import asyncio
 
 import xml.etree.ElementTree as ET
 import base64
+import math
 import posixpath
 import mimetypes
 
-from .dom import DOMAdapter, DOMElement
+from .css import StylesheetCache
+from .dom import DOMAdapter, DOMElement, Disposer
+from .container import resolve_reference
+from .exceptions import InvalidEpubError
+from .images import (
+    SIZE_BUCKETS,
+    ImageCache,
+    ImageVariant,
+    placeholder_uri,
+    read_image_size,
+)
+from .pagination import Paginator
+from .server import ResourceServer
+from .transforms import (
+    DEFAULT_CHUNK_SIZE,
+    LAZY_SOURCE_ATTRIBUTE,
+    NAVIGATION_MESSAGE,
+    AttachStylesheets,
+    DeferImages,
+    EmbedAssets,
+    HighlightAnnotations,
+    InjectStyle,
+    Pipeline,
+    RenderMath,
+    ResolveLinks,
+    ScaleImages,
+    StripInlineStyles,
+    StripScripts,
+    StripStylesheets,
+    TransformContext,
+)
 
 if TYPE_CHECKING:
+    from .annotations import AnnotationStore
     from .book import Book
+    from .mathml import MathCache
+
+DOCUMENT_MIME_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Table of contents entries created between pauses of display_toc_async()
+TOC_CHUNK_SIZE = 50
 
 
 class Rendition:
@@ -20,7 +63,20 @@ class Rendition:
     chapters, and provides navigation between them.
     """
 
-    def __init__(self, book: Book, dom_adapter: DOMAdapter, target_id: str) -> None:
+    def __init__(
+        self,
+        book: Book,
+        dom_adapter: DOMAdapter,
+        target_id: str,
+        paginated: bool = False,
+        spread: bool = False,
+        served: bool = False,
+        publisher_styles: bool = False,
+        downscale_images: bool = False,
+        lazy_images: bool = False,
+        annotations: Optional[AnnotationStore] = None,
+        math_cache: Optional[MathCache] = None,
+    ) -> None:
         """
         Initializes the Rendition object.
 
@@ -31,20 +87,227 @@ class Rendition:
         :param target_id: The ID of the HTML element where the EPUB content
             will be rendered.
         :type target_id: str
+        :param paginated: Whether chapters are split into pages instead of
+            being scrolled. Pages are laid out in a frame of the reader's
+            origin, so the scripts and event handlers of the book are
+            removed.
+        :type paginated: bool
+        :param spread: Whether two pages are shown side by side. Implies
+            ``paginated``.
+        :type spread: bool
+        :param served: Whether chapters are loaded from a
+            :class:`~imposition.server.ResourceServer` by URL, with their
+            original relative references, instead of being inlined with
+            their media as data URIs. Requires the ``imposition-sw.js``
+            Service Worker to be registered by the page. Served chapters
+            share the reader's origin, so the scripts and event handlers of
+            the book are removed.
+        :type served: bool
+        :param publisher_styles: Whether the stylesheets and inline styles
+            of the book are kept. Each stylesheet is processed once and
+            attached to chapters by reference; use
+            :meth:`configure_stylesheets` to scope or filter them. By
+            default all publisher styles are removed.
+        :type publisher_styles: bool
+        :param downscale_images: Whether large raster images are replaced
+            by a variant downscaled to the width of the viewport, in device
+            pixels. In served mode, larger variants are offered through
+            ``srcset`` for zooming and high-density screens. Images are
+            left as they are while the viewport has no width. Requires
+            Pillow.
+        :type downscale_images: bool
+        :param lazy_images: Whether images are only read from the book when
+            they approach the viewport. Until then they are shown as
+            transparent placeholders of the same size. In served mode the
+            browser's native lazy loading is used instead. Chapters are then
+            loaded into a frame of the reader's origin, so the scripts and
+            event handlers of the book are removed.
+        :type lazy_images: bool
+        :param annotations: Annotations to highlight in displayed chapters.
+            Changes to the store show up the next time a chapter is
+            displayed.
+        :type annotations: Optional[AnnotationStore]
+        :param math_cache: Renders the MathML formulas of displayed
+            chapters to SVG or HTML, once per distinct formula. Share one
+            cache between renditions to reuse formulas across books.
+        :type math_cache: Optional[MathCache]
+        :raises ImpositionError: If ``downscale_images`` is set and Pillow
+            is not installed.
         """
         self.book: Book = book
         self.dom_adapter: DOMAdapter = dom_adapter
         self.target_id: str = target_id
         self.target_element: DOMElement = self.dom_adapter.get_element_by_id(self.target_id)
         self.current_chapter_index: int = 0
+        # The spine item whose document is currently loaded in the iframe
+        self.loaded_chapter: Optional[str] = None
         self.iframe: DOMElement = self.dom_adapter.create_element('iframe')
         self.iframe.style.width = '100%'
         self.iframe.style.height = '100%'
         self.iframe.style.border = 'none'
         self.toc_links: List[Tuple[DOMElement, str]] = []
+        # Incremented by every navigation, so that asynchronous ones can
+        # tell when they have been superseded
+        self._navigation: int = 0
+        self._toc_generation: int = 0
+        # Proxies owned by this rendition, by what they are attached to
+        self._proxies: Dict[str, List[Callable[..., Any]]] = {}
+        # Registrations to undo when the rendition is closed
+        self._disposers: List[Disposer] = []
+        # Object URLs created for stylesheets, revoked when superseded
+        self._object_urls: List[str] = []
         self.prev_button: Optional[DOMElement] = None
         self.next_button: Optional[DOMElement] = None
 
+        self.paginated: bool = paginated or spread
+        self.spread: bool = spread
+        self.font_size: int = 16
+        self.paginator: Paginator = Paginator()
+        self.current_page: int = 0
+        self.page_breaks: List[int] = []
+        self._viewport: Tuple[int, int] = (0, 0)
+        # Device pixels per CSS pixel, for choosing image variants
+        self._pixel_ratio: float = 1.0
+        self._pending_anchor: Optional[str] = None
+        self._pending_page: int = 0
+        self._pending_progress: Optional[float] = None
+        if self.paginated:
+            self.iframe.onload = self._create_proxy('frame', self._on_frame_load)
+
+        # Passes applied to every chapter before it is displayed. Register
+        # additional ones with ``rendition.pipeline.add(...)``.
+        self.pipeline: Pipeline = Pipeline([
+            ResolveLinks(),
+            InjectStyle(self._chapter_css),
+        ])
+        if self.paginated or served or lazy_images:
+            # srcdoc frames and chapters served under the reader's origin
+            # share it with the page, so the book's scripts would reach
+            # the page and Pyodide.
+            self.pipeline.add(StripScripts(), before='resolve-links')
+        self._disposers.append(
+            self.dom_adapter.add_message_listener(self.iframe, self._on_frame_message)
+        )
+
+        self.resource_server: Optional[ResourceServer] = None
+        if served:
+            self.resource_server = ResourceServer(book)
+            self.resource_server.render_document = self._serve_chapter
+            self._disposers.append(self.dom_adapter.serve_resources(
+                self.resource_server.prefix, self.resource_server.resolve
+            ))
+        else:
+            self.pipeline.add(EmbedAssets(self._embed_asset), before='inject-style')
+
+        self.images: Optional[ImageCache] = None
+        if downscale_images:
+            self.images = book.images
+            if self.resource_server is not None:
+                self.resource_server.images = self.images
+            self.pipeline.add(
+                ScaleImages(self._scale_image),
+                before='inject-style' if served else 'embed-assets',
+            )
+
+        self.lazy_images: bool = lazy_images
+        if lazy_images:
+            # Images must be deferred before anything reads them.
+            first_reader: str = next(
+                name for name in ('scale-images', 'embed-assets', 'inject-style')
+                if self.pipeline.get(name) is not None
+            )
+            self.pipeline.add(DeferImages(self._defer_image), before=first_reader)
+            if not served:
+                self._disposers.append(self.dom_adapter.observe_lazy_images(
+                    self.iframe, LAZY_SOURCE_ATTRIBUTE, self._load_lazy_image
+                ))
+
+        self.stylesheets: Optional[StylesheetCache] = None
+        # URLs of the stylesheets attached so far, keyed by archive path
+        self._stylesheet_urls: Dict[str, Optional[str]] = {}
+        if publisher_styles:
+            self.stylesheets = StylesheetCache(book, self._stylesheet_asset_url)
+            if self.resource_server is not None:
+                self.resource_server.render_stylesheet = self._serve_stylesheet
+            self.pipeline.add(
+                AttachStylesheets(self.stylesheets, self._attach_stylesheet),
+                before='resolve-links',
+            )
+        else:
+            self.pipeline.add(StripStylesheets(), before='resolve-links')
+            self.pipeline.add(StripInlineStyles(), before='resolve-links')
+
+        self.annotations: Optional[AnnotationStore] = annotations
+        if annotations is not None:
+            self.pipeline.add(
+                HighlightAnnotations(annotations.for_chapter),
+                before=self.pipeline.transforms[0].name,
+            )
+
+        self.math_cache: Optional[MathCache] = math_cache
+        if math_cache is not None:
+            self.pipeline.add(RenderMath(math_cache), before='resolve-links')
+
+    def close(self) -> None:
+        """
+        Releases the browser resources held by the rendition.
+
+        Destroys the proxies of all event handlers, removes the listeners
+        registered with the DOM adapter, revokes object URLs and unloads the
+        frame. Navigations still in progress are cancelled. The book is left
+        open, since other renditions may share it. Closing twice is
+        harmless.
+        """
+        self._navigation += 1
+        self._toc_generation += 1
+        for dispose in self._disposers:
+            dispose()
+        self._disposers = []
+        for group in list(self._proxies):
+            self._destroy_proxies(group)
+        self._revoke_object_urls()
+        self._stylesheet_urls.clear()
+
+        self.iframe.onload = ''
+        self.iframe.src = 'about:blank'
+        self.iframe.srcdoc = ''
+        self.target_element.innerHTML = ''
+        if self.toc_links:
+            self.dom_adapter.get_element_by_id('toc').innerHTML = ''
+            self.toc_links = []
+        for button in (self.prev_button, self.next_button):
+            if button is not None:
+                button.onclick = None
+        self.prev_button = self.next_button = None
+        self.loaded_chapter = None
+
+    def __enter__(self) -> Rendition:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def _create_proxy(
+        self, group: str, handler: Callable[..., Any]
+    ) -> Callable[..., Any]:
+        proxy: Callable[..., Any] = self.dom_adapter.create_proxy(handler)
+        self._proxies.setdefault(group, []).append(proxy)
+        return proxy
+
+    def _destroy_proxies(self, group: str) -> None:
+        for proxy in self._proxies.pop(group, []):
+            self.dom_adapter.destroy_proxy(proxy)
+
+    def _revoke_object_urls(self) -> None:
+        for url in self._object_urls:
+            self.dom_adapter.revoke_object_url(url)
+        self._object_urls = []
+
     def setup_controls(self, prev_id: str, next_id: str) -> None:
         """
         Sets up the navigation controls by attaching event listeners.
@@ -57,8 +320,14 @@ class Rendition:
         self.prev_button = self.dom_adapter.get_element_by_id(prev_id)
         self.next_button = self.dom_adapter.get_element_by_id(next_id)
 
-        self.prev_button.onclick = self.dom_adapter.create_proxy(self.previous_chapter)
-        self.next_button.onclick = self.dom_adapter.create_proxy(self.next_chapter)
+        # Handlers from an earlier call are replaced.
+        self._destroy_proxies('controls')
+        if self.paginated:
+            previous, following = self.previous_page, self.next_page
+        else:
+            previous, following = self.previous_chapter, self.next_chapter
+        self.prev_button.onclick = self._create_proxy('controls', previous)
+        self.next_button.onclick = self._create_proxy('controls', following)
 
         self.update_controls()
 
@@ -66,65 +335,176 @@ class Rendition:
         """
         Renders the table of contents into the 'toc' element.
         """
-        toc_container: DOMElement = self.dom_adapter.get_element_by_id('toc')
-        # Preserve the <h3> header if it exists, otherwise clear
-        # Actually, in index.html I have <h3>Contents</h3>.
-        # rendition previously did: toc_container.innerHTML = ''
-        # Let's see if there's a specific container for the list.
-        # In my new index.html I didn't add a specific div for the list,
-        # but I can just append the ul to the toc div.
-        # To avoid clearing the <h3>, I could find the ul or just append.
-        # Let's just clear everything for now as it was before, or better,
-        # find where to inject.
-
-        # If I want to be safe, I'll look for a <ul> and replace it, or just clear.
-        # The previous implementation was:
-        toc_container.innerHTML = ''
-        # I'll add the <h3> back from Python if I clear it.
-        header: DOMElement = self.dom_adapter.create_element('h3')
-        header.textContent = "Contents"
-        toc_container.appendChild(header)
+        self._toc_generation += 1
+        for _ in self._build_toc(chunk_size=0):
+            pass
 
-        self.toc_links = []
-        ul: DOMElement = self.dom_adapter.create_element('ul')
+    async def display_toc_async(self, chunk_size: int = TOC_CHUNK_SIZE) -> bool:
+        """
+        Renders the table of contents, handing control back to the event
+        loop after every ``chunk_size`` entries.
 
-        for item in self.book.toc:
-            li: DOMElement = self.dom_adapter.create_element('li')
-            a: DOMElement = self.dom_adapter.create_element('a')
-            a.href = '#'
-            a.textContent = item['title']
+        The list is built off-document and swapped in at the end. A later
+        call to :meth:`display_toc` or :meth:`display_toc_async` cancels
+        this one.
+
+        :param chunk_size: The number of entries created between pauses.
+        :type chunk_size: int
+        :return: False if the call was superseded before it completed.
+        :rtype: bool
+        """
+        self._toc_generation += 1
+        generation: int = self._toc_generation
+        steps: Generator[None, None, None] = self._build_toc(chunk_size)
+        for _ in steps:
+            await asyncio.sleep(0)
+            if generation != self._toc_generation:
+                steps.close()
+                return False
+        return True
+
+    def _build_toc(self, chunk_size: int) -> Generator[None, None, None]:
+        """
+        Creates the table of contents, yielding after every ``chunk_size``
+        entries (never if 0) and before it is attached to the document.
 
-            # Define a handler function to be proxied
-            def create_handler(url: str) -> Callable[[DOMElement], None]:
-                def handler(event: DOMElement) -> None:
-                    event.preventDefault()
-                    self.display(url)
-                return handler
+        The handlers of the previous table of contents are destroyed once
+        the new one is attached; if the generator is closed before that,
+        its own handlers are destroyed instead.
+        """
+        toc_links: List[Tuple[DOMElement, str]] = []
+        proxies: List[Callable[..., Any]] = []
+        ul: DOMElement = self.dom_adapter.create_element('ul')
 
-            # Create a proxy for the onclick event handler
-            a.onclick = self.dom_adapter.create_proxy(create_handler(item['url']))
+        # Define a handler function to be proxied
+        def create_handler(url: str) -> Callable[[DOMElement], None]:
+            def handler(event: DOMElement) -> None:
+                event.preventDefault()
+                self.display(url)
+            return handler
 
-            self.toc_links.append((a, item['url']))
-            li.appendChild(a)
-            ul.appendChild(li)
+        try:
+            for position, item in enumerate(self.book.toc, 1):
+                li: DOMElement = self.dom_adapter.create_element('li')
+                a: DOMElement = self.dom_adapter.create_element('a')
+                a.href = '#'
+                a.textContent = item['title']
+
+                # Create a proxy for the onclick event handler
+                proxy: Callable[..., Any] = self.dom_adapter.create_proxy(
+                    create_handler(item['url'])
+                )
+                proxies.append(proxy)
+                a.onclick = proxy
+
+                toc_links.append((a, item['url']))
+                li.appendChild(a)
+                ul.appendChild(li)
+                if chunk_size and position % chunk_size == 0:
+                    yield
+            yield
+        except GeneratorExit:
+            for proxy in proxies:
+                self.dom_adapter.destroy_proxy(proxy)
+            raise
 
+        toc_container: DOMElement = self.dom_adapter.get_element_by_id('toc')
+        toc_container.innerHTML = ''
+        header: DOMElement = self.dom_adapter.create_element('h3')
+        header.textContent = "Contents"
+        toc_container.appendChild(header)
         toc_container.appendChild(ul)
+        self.toc_links = toc_links
+        self._destroy_proxies('toc')
+        self._proxies['toc'] = proxies
         self.update_controls()
 
-
     def display(self, chapter_url: Optional[str] = None) -> None:
         """
         Displays a specific chapter in the rendition iframe.
 
         If no chapter URL is provided, it displays the first chapter in the
-        spine. It also handles embedding of assets like images.
+        spine. It also handles embedding of assets like images. Moving to an
+        anchor in the chapter that is already loaded only scrolls the frame.
+        Any :meth:`display_async` call still in progress is cancelled.
 
         :param chapter_url: The URL of the chapter to display. Can include an
             anchor.
         :type chapter_url: Optional[str]
         """
-        if not self.book.spine:
+        self._navigation += 1
+        target: Optional[Tuple[str, Optional[str]]] = self._navigate(chapter_url)
+        if target is None:
+            return
+        chapter_href, anchor = target
+        if self.resource_server is not None:
+            # The chapter is rendered when the frame requests it.
+            self._show_chapter(chapter_href, anchor, None)
             return
+        chapter_content: bytes = self.book.zip_file.read(chapter_href)
+        self._show_chapter(
+            chapter_href, anchor, self._render_chapter(chapter_href, chapter_content)
+        )
+
+    async def display_async(
+        self, chapter_url: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> bool:
+        """
+        Displays a chapter like :meth:`display`, handing control back to
+        the event loop while the chapter is read and transformed.
+
+        Navigating again, synchronously or not, before the chapter is
+        ready cancels this call, so a slow chapter never replaces the one
+        that was asked for later.
+
+        :param chapter_url: The URL of the chapter to display. Can include an
+            anchor.
+        :type chapter_url: Optional[str]
+        :param chunk_size: The number of elements transformed between
+            pauses.
+        :type chunk_size: int
+        :return: False if the call was superseded before the chapter was
+            shown.
+        :rtype: bool
+        """
+        self._navigation += 1
+        navigation: int = self._navigation
+        target: Optional[Tuple[str, Optional[str]]] = self._navigate(chapter_url)
+        if target is None:
+            return True
+        chapter_href, anchor = target
+        if self.resource_server is not None:
+            self._show_chapter(chapter_href, anchor, None)
+            return True
+
+        await asyncio.sleep(0)
+        if navigation != self._navigation:
+            return False
+        chapter_content: bytes = self.book.zip_file.read(chapter_href)
+        root: Optional[ET.Element] = self._parse_chapter(chapter_content)
+        if root is None:
+            self._show_chapter(chapter_href, anchor, None)
+            return True
+        context = TransformContext(self.book, chapter_href)
+        for _ in self.pipeline.iter_run(root, context, chunk_size):
+            await asyncio.sleep(0)
+            if navigation != self._navigation:
+                return False
+        self._show_chapter(chapter_href, anchor, self._serialize_chapter(root))
+        return True
+
+    def _navigate(
+        self, chapter_url: Optional[str]
+    ) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        Starts a navigation to a chapter URL.
+
+        :return: The chapter path and anchor, or None if there is nothing
+            left to load: the book is empty or the anchor was in the chapter
+            already loaded.
+        """
+        if not self.book.spine:
+            return None
         anchor: Optional[str] = None
         chapter_href: str
         if chapter_url and '#' in chapter_url:
@@ -135,80 +515,442 @@ class Rendition:
         else:
             chapter_href = self.book.spine[0]
 
-        if chapter_href in self.book.spine:
-            self.current_chapter_index = self.book.spine.index(chapter_href)
+        if chapter_href in self.book.spine_index:
+            self.current_chapter_index = self.book.spine_index[chapter_href]
 
-        chapter_content: bytes = self.book.zip_file.read(chapter_href)
+        if anchor and chapter_href == self.loaded_chapter:
+            self.scroll_to_anchor(anchor)
+            return None
 
-        try:
-            ET.register_namespace("", "http://www.w3.org/1999/xhtml")
-            root: ET.Element = ET.fromstring(chapter_content)
-        except ET.ParseError as e:
-            print(f"Error parsing chapter content: {e}")
-            self.target_element.textContent = "Error loading chapter: Could not parse XML."
+        if self.paginated or self.images is not None:
+            self._viewport = self.dom_adapter.get_element_size(self.target_element)
+        if self.images is not None:
+            self._pixel_ratio = self.dom_adapter.get_device_pixel_ratio()
+        return chapter_href, anchor
+
+    def _show_chapter(
+        self, chapter_href: str, anchor: Optional[str], final_html: Optional[str]
+    ) -> None:
+        """
+        Loads a chapter into the frame.
+
+        :param final_html: The transformed chapter. In served mode it is
+            None and the frame loads the chapter from the resource server;
+            otherwise None means the chapter could not be rendered.
+        """
+        if self.resource_server is None and final_html is None:
+            self.loaded_chapter = None
             return
+        if self.paginated:
+            self.page_breaks = []
+            self.current_page = 0
+            self._pending_anchor = anchor
+
+        if self.resource_server is not None:
+            url: str = self.resource_server.url_for(chapter_href)
+            if anchor and not self.paginated:
+                url = f"{url}#{anchor}"
+            self.iframe.src = url
+        elif final_html is not None:
+            navigate = f"this.contentWindow.location.hash = '#{anchor}'"
+            if self.paginated or self.lazy_images:
+                # The paginator has to measure the laid-out document, and lazy
+                # images have to be observed in it, which is only possible
+                # for a same-origin srcdoc frame, not a data: URI.
+                self.iframe.srcdoc = final_html
+                if anchor and not self.paginated:
+                    self.iframe.onload = navigate
+            else:
+                encoded_html: str = base64.b64encode(
+                    final_html.encode('utf-8')
+                ).decode('utf-8')
+                self.iframe.src = f"data:text/html;base64,{encoded_html}"
 
-        head: Optional[ET.Element] = root.find(".//{http://www.w3.org/1999/xhtml}head")
-        if head is not None:
-            for link in head.findall(".//{http://www.w3.org/1999/xhtml}link[@rel='stylesheet']"):
-                head.remove(link)
-            for style in head.findall(".//{http://www.w3.org/1999/xhtml}style"):
-                head.remove(style)
-            style_element: ET.Element = ET.Element('style')
-            style_element.text = 'body { margin: 0; }'
-            head.append(style_element)
-
-        for element in root.iter():
-            if 'style' in element.attrib:
-                del element.attrib['style']
-
-        for element in root.findall(".//*[@src]"):
-            self._embed_asset(element, 'src', chapter_href)
-        for element in root.findall(".//*[@href]"):
-            if not element.get('href', '').endswith('.css'):
-                 self._embed_asset(element, 'href', chapter_href)
-
-        final_html: str = "<!DOCTYPE html>" + ET.tostring(root, method='html').decode('utf-8')
-        encoded_html: str = base64.b64encode(final_html.encode('utf-8')).decode('utf-8')
-        self.iframe.src = f"data:text/html;base64,{encoded_html}"
-
-        if anchor:
-            self.iframe.onload = f"this.contentWindow.location.hash = '#{anchor}'"
+                if anchor:
+                    self.iframe.onload = navigate
 
         self.target_element.innerHTML = ''
         self.target_element.appendChild(self.iframe)
+        self.loaded_chapter = chapter_href
+        self.update_controls()
+
+    def _render_chapter(
+        self, chapter_href: str, chapter_content: bytes
+    ) -> Optional[str]:
+        """
+        Applies the pipeline to a chapter and serializes it as HTML.
+
+        :return: The HTML document, or None if the chapter could not be
+            parsed.
+        """
+        root: Optional[ET.Element] = self._parse_chapter(chapter_content)
+        if root is None:
+            return None
+        self.pipeline.run(root, TransformContext(self.book, chapter_href))
+        return self._serialize_chapter(root)
+
+    def _parse_chapter(self, chapter_content: bytes) -> Optional[ET.Element]:
+        try:
+            ET.register_namespace("", "http://www.w3.org/1999/xhtml")
+            return ET.fromstring(chapter_content)
+        except ET.ParseError as e:
+            print(f"Error parsing chapter content: {e}")
+            self.target_element.textContent = (
+                "Error loading chapter: Could not parse XML."
+            )
+            return None
+
+    @staticmethod
+    def _serialize_chapter(root: ET.Element) -> str:
+        return "<!DOCTYPE html>" + ET.tostring(root, method='html').decode('utf-8')
+
+    def _serve_chapter(
+        self, chapter_href: str, chapter_content: bytes
+    ) -> Optional[bytes]:
+        final_html: Optional[str] = self._render_chapter(chapter_href, chapter_content)
+        return final_html.encode('utf-8') if final_html is not None else None
+
+    def scroll_to_anchor(self, anchor: str) -> None:
+        """
+        Moves to an anchor in the chapter that is already displayed.
+
+        :param anchor: The id of the target element.
+        :type anchor: str
+        """
+        if not self.paginated:
+            self.dom_adapter.scroll_to_anchor(self.iframe, anchor)
+        elif not self.page_breaks:
+            # Still loading; the anchor is resolved once layout is known.
+            self._pending_anchor = anchor
+        else:
+            offset = self.dom_adapter.get_anchor_offset(self.iframe, anchor)
+            if offset is not None:
+                self.show_page(Paginator.page_for_offset(self.page_breaks, offset))
         self.update_controls()
 
+    def _on_frame_message(self, data: Any) -> None:
+        """
+        Follows links clicked inside the displayed chapter.
+        """
+        if isinstance(data, dict) and data.get('type') == NAVIGATION_MESSAGE:
+            self.display(data.get('href'))
+
+    def configure_stylesheets(
+        self, scope: Optional[str] = None, exclude: Tuple[str, ...] = ()
+    ) -> None:
+        """
+        Scopes or filters the publisher styles kept with ``publisher_styles``.
+
+        Takes effect from the next chapter displayed.
+
+        :param scope: A selector every publisher style rule is nested under.
+        :type scope: Optional[str]
+        :param exclude: Names of CSS properties to drop from publisher styles,
+            e.g. ``('font-family', 'color')`` to let reader settings win.
+        :type exclude: Tuple[str, ...]
+        :raises ValueError: If publisher styles are not enabled.
+        """
+        if self.stylesheets is None:
+            raise ValueError("Publisher styles are not enabled for this rendition.")
+        self.stylesheets.configure(scope, exclude)
+        self._stylesheet_urls.clear()
+        self._revoke_object_urls()
+
+    def _chapter_css(self) -> str:
+        if self.paginated:
+            width, height = self._viewport
+            return Paginator.layout_css(width, height, self.font_size, self.spread)
+        return 'body { margin: 0; }'
+
     def _embed_asset(self, element: ET.Element, attribute: str, chapter_path: str) -> None:
         asset_path: Optional[str] = element.get(attribute)
-        if not asset_path or asset_path.startswith(('data:', 'http:', 'https:')):
+        if not asset_path or asset_path.startswith(
+            ('data:', 'blob:', 'http:', 'https:', '#')
+        ):
             return
 
+        asset_path = asset_path.split('#')[0]
         if asset_path.endswith('.css'):
             return
 
         full_asset_path: str = posixpath.normpath(posixpath.join(posixpath.dirname(chapter_path), asset_path))
+        data_uri: Optional[str] = self._asset_data_uri(full_asset_path)
+        if data_uri:
+            element.set(attribute, data_uri)
+
+    def _asset_data_uri(self, full_asset_path: str) -> Optional[str]:
+        mime_type: Optional[str]
+        mime_type, _ = mimetypes.guess_type(full_asset_path)
+        # Only media is inlined; documents are linked through ResolveLinks.
+        if not mime_type or mime_type in DOCUMENT_MIME_TYPES:
+            return None
 
         try:
             asset_content: bytes = self.book.zip_file.read(full_asset_path)
-            mime_type: Optional[str]
-            mime_type, _ = mimetypes.guess_type(full_asset_path)
-            if mime_type:
-                encoded_asset: str = base64.b64encode(asset_content).decode('utf-8')
-                data_uri: str = f"data:{mime_type};base64,{encoded_asset}"
-                element.set(attribute, data_uri)
         except KeyError:
             print(f"Asset not found: {full_asset_path}")
-            pass
+            return None
+        encoded_asset: str = base64.b64encode(asset_content).decode('utf-8')
+        return f"data:{mime_type};base64,{encoded_asset}"
+
+    def _defer_image(self, element: ET.Element, chapter_path: str) -> None:
+        """
+        Replaces an image with a placeholder of the same size, to be loaded
+        by :meth:`_load_lazy_image` when it approaches the viewport.
+        """
+        if self.resource_server is not None:
+            element.set('loading', 'lazy')
+            return
+        target = resolve_reference(chapter_path, element.get('src', ''))
+        if target is None:
+            return
+        path: str = target[0]
+        try:
+            self.book.zip_file.getinfo(path)
+        except KeyError:
+            return  # Left to EmbedAssets, which reports it
+        element.set(LAZY_SOURCE_ATTRIBUTE, path)
+        element.set('src', placeholder_uri(read_image_size(self.book.zip_file, path)))
+
+    def _load_lazy_image(self, path: str) -> Optional[str]:
+        """
+        Returns the URL of a deferred image once it approaches the viewport.
+        """
+        return self._variant_data_uri(path) or self._asset_data_uri(path)
+
+    def _image_width(self) -> Optional[int]:
+        """
+        Returns the width images are displayed at, in CSS pixels, or None
+        if the viewport has not been measured.
+        """
+        if self._viewport[0] <= 0:
+            return None
+        return Paginator.page_width(self._viewport[0], self.spread)
+
+    def _variant_data_uri(self, path: str) -> Optional[str]:
+        """
+        Returns the smallest downscaled variant of an image adequate for the
+        viewport, if image downscaling is enabled and the image is large.
+        """
+        width: Optional[int] = self._image_width()
+        if self.images is None or width is None:
+            return None
+        variant: Optional[ImageVariant] = self.images.variant(
+            path, math.ceil(width * self._pixel_ratio)
+        )
+        if variant is None:
+            return None
+        encoded_image: str = base64.b64encode(variant.data).decode('utf-8')
+        return f"data:{variant.media_type};base64,{encoded_image}"
+
+    def _scale_image(self, element: ET.Element, chapter_path: str) -> None:
+        """
+        Points an image at the smallest variant adequate for the viewport.
+        """
+        assert self.images is not None
+        width: Optional[int] = self._image_width()
+        if width is None:
+            return  # The original is kept until the viewport is known
+        target = resolve_reference(chapter_path, element.get('src', ''))
+        if target is None:
+            return
+        path: str = target[0]
+        size: Optional[Tuple[int, int]] = self.images.size(path)
+        if size is None:
+            return
+        pixels: int = math.ceil(width * self._pixel_ratio)
+
+        if self.resource_server is not None:
+            url: str = self.resource_server.url_for(path)
+            candidates: List[Tuple[int, str]] = [
+                (bucket, f"{url}?w={bucket}")
+                for bucket in SIZE_BUCKETS
+                if bucket < size[0]
+            ]
+            candidates.append((size[0], url))
+            element.set('src', next(
+                (c_url for c_width, c_url in candidates if c_width >= pixels), url
+            ))
+            element.set('srcset', ', '.join(
+                f"{c_url} {c_width}w" for c_width, c_url in candidates
+            ))
+            element.set('sizes', f"(max-width: {width}px) 100vw, {width}px")
+            return
+
+        data_uri: Optional[str] = self._variant_data_uri(path)
+        if data_uri is not None:
+            element.set('src', data_uri)
+
+    def _stylesheet_asset_url(self, path: str) -> Optional[str]:
+        """
+        Returns the URL a font or image referenced by a stylesheet is loaded
+        from.
+        """
+        if self.resource_server is not None:
+            return self.resource_server.url_for(path)
+        return self._asset_data_uri(path)
+
+    def _attach_stylesheet(self, path: str) -> Optional[str]:
+        """
+        Returns the URL chapters load a stylesheet from, preparing it on
+        first use.
+        """
+        if path in self._stylesheet_urls:
+            return self._stylesheet_urls[path]
+        assert self.stylesheets is not None
+        url: Optional[str] = None
+        if self.resource_server is not None:
+            url = self.resource_server.url_for(path)
+        else:
+            try:
+                css_bytes: bytes = self.stylesheets.text(path).encode('utf-8')
+            except InvalidEpubError as e:
+                print(e)
+            else:
+                if self.paginated:
+                    # srcdoc documents share the origin of the page, so they
+                    # can load its object URLs.
+                    url = self.dom_adapter.create_object_url(css_bytes, 'text/css')
+                    self._object_urls.append(url)
+                else:
+                    encoded_css: str = base64.b64encode(css_bytes).decode('utf-8')
+                    url = f"data:text/css;base64,{encoded_css}"
+        self._stylesheet_urls[path] = url
+        return url
+
+    def _serve_stylesheet(self, path: str) -> Optional[bytes]:
+        assert self.stylesheets is not None
+        try:
+            return self.stylesheets.text(path).encode('utf-8')
+        except InvalidEpubError:
+            return None
+
+    def _on_frame_load(self, event: Optional[Any] = None) -> None:
+        """
+        Computes the page breaks of a freshly loaded paginated chapter and
+        shows the requested page.
+
+        The breaks belong to the chapter last loaded into the frame, which
+        is not the current spine position while a newer navigation is
+        still being prepared. Load events when no chapter is loaded are
+        ignored.
+        """
+        chapter_href: Optional[str] = self.loaded_chapter
+        if chapter_href is None:
+            return
+        width, height = self._viewport
+        self.page_breaks = self.paginator.page_breaks(
+            chapter_href,
+            width,
+            height,
+            self.font_size,
+            self.spread,
+            lambda: self.dom_adapter.get_scroll_width(self.iframe),
+        )
+
+        page: int = self._pending_page
+        if self._pending_anchor:
+            offset = self.dom_adapter.get_anchor_offset(
+                self.iframe, self._pending_anchor
+            )
+            if offset is not None:
+                page = Paginator.page_for_offset(self.page_breaks, offset)
+        elif self._pending_progress is not None:
+            page = int(self._pending_progress * len(self.page_breaks))
+        elif page < 0:
+            page = len(self.page_breaks) - 1
+        self._pending_anchor = None
+        self._pending_progress = None
+        self._pending_page = 0
+        self.show_page(page)
+
+    def show_page(self, page: int) -> None:
+        """
+        Scrolls the current paginated chapter to the given page.
+
+        :param page: The index of the page within the current chapter.
+        :type page: int
+        """
+        if not self.page_breaks:
+            return
+        self.current_page = min(max(page, 0), len(self.page_breaks) - 1)
+        self.dom_adapter.scroll_frame(
+            self.iframe, self.page_breaks[self.current_page], 0
+        )
+        self.update_controls()
+
+    def set_font_size(self, font_size: int) -> None:
+        """
+        Changes the base font size and re-lays out the current chapter.
+
+        In paginated mode the reader stays on the page covering the same
+        relative position within the chapter.
+
+        :param font_size: The new base font size in pixels.
+        :type font_size: int
+        """
+        if font_size == self.font_size:
+            return
+        progress: float = 0.0
+        if self.page_breaks:
+            progress = self.current_page / len(self.page_breaks)
+        self.font_size = font_size
+        self.relayout(progress)
+
+    def relayout(self, progress: float = 0.0) -> None:
+        """
+        Re-renders the current chapter, e.g. after the viewport was resized.
+
+        :param progress: The relative position within the chapter, between
+            0 and 1, of the page to show once the chapter is laid out again.
+        :type progress: float
+        """
+        if not self.book.spine:
+            return
+        if self.paginated and progress > 0:
+            self._pending_progress = progress
+        self.display(self.book.spine[self.current_chapter_index])
+
+    def next_page(self, event: Optional[Any] = None) -> None:
+        """
+        Turns to the next page, continuing with the next chapter at the end
+        of the current one.
+
+        :param event: An optional event object (e.g., from a button click).
+        :type event: Optional[Any]
+        """
+        if self.current_page < len(self.page_breaks) - 1:
+            self.show_page(self.current_page + 1)
+        else:
+            self.next_chapter()
+
+    def previous_page(self, event: Optional[Any] = None) -> None:
+        """
+        Turns to the previous page, continuing with the last page of the
+        previous chapter at the start of the current one.
+
+        :param event: An optional event object (e.g., from a button click).
+        :type event: Optional[Any]
+        """
+        if self.current_page > 0:
+            self.show_page(self.current_page - 1)
+        elif self.current_chapter_index > 0:
+            self._pending_page = -1
+            self.previous_chapter()
 
     def update_controls(self) -> None:
         """
         Updates the state of navigation buttons and TOC highlighting.
         """
+        at_start: bool = self.current_chapter_index == 0
+        at_end: bool = self.current_chapter_index >= len(self.book.spine) - 1
+        if self.paginated:
+            at_start = at_start and self.current_page == 0
+            at_end = at_end and self.current_page >= len(self.page_breaks) - 1
         if self.prev_button:
-            self.prev_button.disabled = (self.current_chapter_index == 0)
+            self.prev_button.disabled = at_start
         if self.next_button:
-            self.next_button.disabled = (self.current_chapter_index >= len(self.book.spine) - 1)
+            self.next_button.disabled = at_end
 
         current_href = self.book.spine[self.current_chapter_index]
         for a, url in self.toc_links:
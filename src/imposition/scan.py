@@ -0,0 +1,147 @@
+import concurrent.futures
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Union
+
+from .book import Book
+from .exceptions import ImpositionError
+from .metadata import BookMetadata
+from .text import build_term_index
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+
+@dataclass
+class ScanResult:
+    """
+    The outcome of scanning a single EPUB file.
+
+    :ivar path: The path of the scanned file.
+    :ivar metadata: The publication metadata, if the file is valid.
+    :ivar spine: The paths of the spine items in reading order.
+    :ivar toc: The table of contents, as returned by :meth:`Book.get_toc`.
+    :ivar index: A mapping of lowercase terms to the spine positions that
+        contain them. Empty unless indexing was requested.
+    :ivar error: The error that made the file fail validation, if any.
+    """
+
+    path: str
+    metadata: Optional[BookMetadata] = None
+    spine: List[str] = field(default_factory=list)
+    toc: List[Dict[str, str]] = field(default_factory=list)
+    index: Dict[str, List[int]] = field(default_factory=dict)
+    error: Optional[ImpositionError] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the file was scanned without errors."""
+        return self.error is None
+
+
+def scan_file(path: PathLike, build_index: bool = True) -> ScanResult:
+    """
+    Validates a single EPUB file and extracts its metadata, TOC and index.
+
+    Validation covers everything :class:`Book` checks on construction: the
+    ZIP structure, mimetype, container.xml, OPF file and spine. Errors are
+    reported on the result instead of being raised.
+
+    :param path: The path of the EPUB file.
+    :type path: PathLike
+    :param build_index: Whether to extract chapter text and build a term
+        index.
+    :type build_index: bool
+    :return: The scan result.
+    :rtype: ScanResult
+    """
+    path_str = os.fspath(path)
+    try:
+        with open(path_str, "rb") as f:
+            epub_bytes = f.read()
+    except OSError as e:
+        return ScanResult(path_str, error=ImpositionError(f"Could not read file: {e}"))
+
+    try:
+        book = Book(epub_bytes)
+        return ScanResult(
+            path_str,
+            metadata=book.metadata,
+            spine=list(book.spine),
+            toc=book.get_toc(),
+            index=build_term_index(book) if build_index else {},
+        )
+    except ImpositionError as e:
+        return ScanResult(path_str, error=e)
+    except Exception as e:
+        # Corrupt archive members fail outside the exception hierarchy,
+        # e.g. with zipfile.BadZipFile for a bad CRC or zlib.error.
+        return ScanResult(path_str, error=_unexpected_error(e))
+
+
+def _unexpected_error(error: Exception) -> ImpositionError:
+    # Equivalent to ``raise ImpositionError(...) from error``, for errors
+    # that are reported rather than raised.
+    wrapped = ImpositionError(f"Unexpected error scanning file: {error}")
+    wrapped.__cause__ = error
+    return wrapped
+
+
+def scan_library(
+    paths: Iterable[PathLike],
+    max_workers: Optional[int] = None,
+    build_index: bool = True,
+) -> Iterator[ScanResult]:
+    """
+    Scans many EPUB files in parallel, yielding results as they complete.
+
+    Files are distributed over a process pool. Only a bounded number of
+    files is in flight at any time, so ``paths`` may be a lazy iterable over
+    a very large collection. A file that fails validation produces a result
+    with ``error`` set and does not stop the batch.
+
+    :param paths: The paths of the EPUB files.
+    :type paths: Iterable[PathLike]
+    :param max_workers: The number of worker processes. Defaults to the
+        number of CPUs. Pass 0 to scan sequentially in the current process,
+        e.g. under Pyodide where subprocesses are not available.
+    :type max_workers: Optional[int]
+    :param build_index: Whether to build a term index for every book.
+    :type build_index: bool
+    :return: An iterator of scan results, in completion order.
+    :rtype: Iterator[ScanResult]
+    """
+    if max_workers == 0:
+        for path in paths:
+            yield scan_file(path, build_index)
+        return
+
+    window: int = (max_workers or os.cpu_count() or 1) * 4
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending: Dict[concurrent.futures.Future, str] = {}
+        path_iter = iter(paths)
+        exhausted = False
+
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                try:
+                    path = next(path_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                future = executor.submit(scan_file, path, build_index)
+                pending[future] = os.fspath(path)
+            if not pending:
+                break
+
+            done: Set[concurrent.futures.Future]
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                path_str = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # A crashed worker must not abort the rest of the batch.
+                    result = ScanResult(path_str, error=_unexpected_error(e))
+                yield result
@@ -0,0 +1,207 @@
+from __future__ import annotations
+import hashlib
+import mimetypes
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+if TYPE_CHECKING:
+    import http.server
+
+    from .book import Book
+    from .images import ImageCache
+
+RESOURCE_PREFIX = "/imposition/"
+
+# Messages exchanged with imposition-sw.js
+SERVICE_WORKER_REGISTER = "imposition:register"
+SERVICE_WORKER_REQUEST = "imposition:resource"
+SERVICE_WORKER_UNREGISTER = "imposition:unregister"
+
+# Archive members never change for a given book, and every book is served
+# under its own prefix, so anything but rendered chapters can be cached
+# for good.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Rendered chapters and processed stylesheets depend on the settings of the
+# rendition.
+DOCUMENT_CACHE_CONTROL = "no-store"
+
+
+@dataclass
+class Resource:
+    """
+    The response to a request for a book resource.
+
+    :ivar status: The HTTP status code.
+    :ivar body: The response body.
+    :ivar headers: The response headers.
+    """
+
+    status: int
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class ResourceServer:
+    """
+    Serves the members of an EPUB archive under a virtual URL prefix.
+
+    The server is transport-agnostic: :meth:`resolve` maps a request path to
+    a :class:`Resource`. In the browser, a Service Worker forwards requests
+    for the prefix to it through the DOM adapter; in headless environments
+    :func:`serve_http` exposes it over a local HTTP server. Either way,
+    chapters keep their original relative references and only the resources
+    that are actually displayed are read from the archive.
+    """
+
+    def __init__(self, book: Book, prefix: Optional[str] = None) -> None:
+        """
+        Initializes the server.
+
+        :param book: The book whose resources are served.
+        :type book: Book
+        :param prefix: The URL path under which the resources are served.
+            Defaults to a path unique to the contents of the book, so that
+            cached responses of different books never collide.
+        :type prefix: Optional[str]
+        """
+        self.book: Book = book
+        self.prefix: str = prefix or f"{RESOURCE_PREFIX}{book_key(book)}/"
+        # Renders a document before it is served, given its archive path and
+        # content. Set by the rendition serving the book.
+        self.render_document: Optional[Callable[[str, bytes], Optional[bytes]]] = None
+        # Processes a stylesheet before it is served, given its archive path.
+        self.render_stylesheet: Optional[Callable[[str], Optional[bytes]]] = None
+        # Provides downscaled images, requested with a ``w`` (width) query
+        # parameter.
+        self.images: Optional[ImageCache] = None
+
+    def url_for(self, path: str) -> str:
+        """
+        Returns the URL of an archive member.
+
+        :param path: The path of the member in the EPUB archive.
+        :type path: str
+        :rtype: str
+        """
+        return self.prefix + quote(path)
+
+    def resolve(self, url: str, if_none_match: Optional[str] = None) -> Resource:
+        """
+        Answers a request for a book resource.
+
+        :param url: The requested URL or URL path. Fragments are ignored,
+            and so are query strings except for the ``w`` parameter, which
+            requests an image downscaled for that width.
+        :type url: str
+        :param if_none_match: The value of the request's ``If-None-Match``
+            header, if any.
+        :type if_none_match: Optional[str]
+        :return: The response. Missing members yield a 404 response and
+            documents that could not be rendered a 500 response.
+        :rtype: Resource
+        """
+        url_parts = urlsplit(url)
+        url_path = url_parts.path
+        if not url_path.startswith(self.prefix):
+            return Resource(404)
+        path = unquote(url_path[len(self.prefix):])
+        try:
+            info = self.book.zip_file.getinfo(path)
+        except KeyError:
+            return Resource(404)
+
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if self.render_document is not None and path in self.book.spine_index:
+            rendered = self.render_document(path, self.book.zip_file.read(info))
+            if rendered is None:
+                return Resource(500)
+            return Resource(200, rendered, {
+                "Content-Type": "text/html; charset=utf-8",
+                "Cache-Control": DOCUMENT_CACHE_CONTROL,
+            })
+
+        if self.render_stylesheet is not None and media_type == "text/css":
+            processed = self.render_stylesheet(path)
+            if processed is None:
+                return Resource(500)
+            return Resource(200, processed, {
+                "Content-Type": "text/css; charset=utf-8",
+                "Cache-Control": DOCUMENT_CACHE_CONTROL,
+            })
+
+        width = parse_qs(url_parts.query).get("w", [""])[0]
+        # The CRC is read from the central directory, so revalidation never
+        # decompresses the member.
+        etag = f'"{info.CRC:08x}-{info.file_size:x}"'
+        if self.images is not None and width.isdigit():
+            etag = f'"{info.CRC:08x}-{info.file_size:x}-w{width}"'
+        headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Resource(304, b"", headers)
+
+        if self.images is not None and width.isdigit():
+            variant = self.images.variant(path, int(width))
+            if variant is not None:
+                headers["Content-Type"] = variant.media_type
+                return Resource(200, variant.data, headers)
+        headers["Content-Type"] = media_type
+        return Resource(200, self.book.zip_file.read(info), headers)
+
+
+def book_key(book: Book) -> str:
+    """
+    Returns a short key identifying the contents of a book.
+
+    The key is derived from the names and checksums in the ZIP central
+    directory, so computing it does not decompress anything.
+
+    :param book: The book.
+    :type book: Book
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+    for info in book.zip_file.infolist():
+        digest.update(f"{info.filename}:{info.CRC:08x}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def serve_http(
+    server: ResourceServer, host: str = "127.0.0.1", port: int = 0
+) -> http.server.ThreadingHTTPServer:
+    """
+    Serves book resources over HTTP from a background thread.
+
+    This stands in for the Service Worker outside the browser, e.g. in
+    tests. Call ``shutdown()`` and ``server_close()`` on the returned
+    server when done.
+
+    :param server: The resource server to expose.
+    :type server: ResourceServer
+    :param host: The interface to listen on.
+    :type host: str
+    :param port: The port to listen on. 0 picks a free port, available
+        afterwards as ``server_address[1]``.
+    :type port: int
+    :rtype: http.server.ThreadingHTTPServer
+    """
+    import http.server
+    import threading
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            resource = server.resolve(self.path, self.headers.get("If-None-Match"))
+            self.send_response(resource.status)
+            for name, value in resource.headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(resource.body)))
+            self.end_headers()
+            self.wfile.write(resource.body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    return httpd
@@ -0,0 +1,391 @@
+from __future__ import annotations
+import bisect
+import re
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple, cast
+
+from .exceptions import InvalidEpubError
+from .text import BLOCK_ELEMENTS
+
+if TYPE_CHECKING:
+    from .book import Book
+
+# Bytes of the chapter read and parsed between utterances
+DEFAULT_CHUNK_SIZE = 16 * 1024
+
+# Elements whose text is never spoken
+SILENT_ELEMENTS = frozenset({"script", "style"})
+
+SENTENCE_END_PATTERN = re.compile(r"[.!?…]+[\"'”’»)\]]*(?=\s|$)")
+TEXT_RUN_PATTERN = re.compile(r"\s+|\S+")
+LEADING_PUNCTUATION = "\"'“‘«(["
+
+# Words that end with a period without ending the sentence
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "st", "jr", "sr", "prof", "rev", "gen", "col",
+    "capt", "lt", "mt", "no", "vs", "etc", "e.g", "i.e", "cf", "vol", "ch", "fig",
+})
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """
+    Splits whitespace-normalized text into sentences.
+
+    A sentence ends at ``.``, ``!``, ``?`` or ``…`` (with any closing quotes
+    or brackets) followed by a space and a word that does not start in
+    lowercase. Periods after common abbreviations and initials do not end
+    a sentence.
+
+    :param text: The text, with single spaces between words.
+    :type text: str
+    :return: The ``(start, end)`` offsets of each sentence, without the
+        spaces between them.
+    :rtype: List[Tuple[int, int]]
+    """
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    for match in SENTENCE_END_PATTERN.finditer(text):
+        end = match.end()
+        following = text[end + 1:end + 2]
+        if following.islower():
+            continue
+        if match.group() == ".":
+            words = text[start:match.start()].rsplit(None, 1)
+            word = words[-1].lstrip(LEADING_PUNCTUATION).lower() if words else ""
+            if word in ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+                continue
+        spans.append((start, end))
+        start = end + 1
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+@dataclass(frozen=True)
+class Utterance:
+    """
+    A sentence of a chapter, in the order it is spoken.
+
+    Offsets count characters of the whitespace-normalized chapter text
+    returned by :func:`imposition.text.chapter_text`, the same offsets as
+    :class:`~imposition.annotations.Annotation`, so an utterance can be
+    highlighted while it is spoken.
+
+    :ivar href: The path of the spine item in the EPUB archive.
+    :ivar index: The position of the utterance in the chapter.
+    :ivar text: The text to speak.
+    :ivar start: The offset of the first character.
+    :ivar end: The offset just after the last character.
+    :ivar path: The indices of the block element containing the utterance
+        among the child elements of its ancestors, from ``<body>`` down.
+    :ivar anchor: The id of that element or its closest ancestor with one,
+        for :meth:`~imposition.rendition.Rendition.display`.
+    """
+
+    href: str
+    index: int
+    text: str
+    start: int
+    end: int
+    path: Tuple[int, ...] = ()
+    anchor: Optional[str] = None
+
+
+@dataclass
+class _OpenElement:
+    element: ET.Element
+    index: int
+    children: int = 0
+    # The last child element whose tail has not been read yet
+    previous: Optional[ET.Element] = None
+
+
+class _Segmenter:
+    """
+    Turns pull parser events into utterances, in document order.
+
+    Text is read in the order of ``itertext()``: an element's text once its
+    first child starts or it ends, and a child's tail once its next sibling
+    starts or its parent ends. Elements are detached from the tree once
+    their tail has been read, so memory stays bounded by the nesting depth.
+    """
+
+    def __init__(self, chapter_href: str) -> None:
+        self.chapter_href = chapter_href
+        self.stack: List[_OpenElement] = []
+        self.body_depth: Optional[int] = None
+        self.silent = 0
+        self.count = 0
+        # Length of the normalized chapter text so far
+        self.length = 0
+        self.pending_space = False
+        self.block: List[str] = []
+        self.block_start = 0
+
+    def handle(self, event: str, element: ET.Element) -> Iterator[Utterance]:
+        tag = element.tag.rsplit("}", 1)[-1] if isinstance(element.tag, str) else ""
+        if event == "start":
+            if self.stack:
+                parent = self.stack[-1]
+                self._read_before_child(parent)
+                if tag in BLOCK_ELEMENTS:
+                    self._separate()
+                if tag in BLOCK_ELEMENTS or tag in SILENT_ELEMENTS:
+                    yield from self._flush()
+                self.stack.append(_OpenElement(element, parent.children))
+                parent.children += 1
+            else:
+                self.stack.append(_OpenElement(element, 0))
+            if tag == "body" and self.body_depth is None:
+                self.body_depth = len(self.stack)
+            if tag in SILENT_ELEMENTS:
+                self.silent += 1
+        else:
+            entry = self.stack[-1]
+            self._read_before_child(entry)
+            if tag in BLOCK_ELEMENTS:
+                self._separate()
+            if tag in BLOCK_ELEMENTS or tag in SILENT_ELEMENTS:
+                yield from self._flush()
+            if tag in SILENT_ELEMENTS:
+                self.silent -= 1
+            if len(self.stack) == self.body_depth:
+                self.body_depth = -1  # Text after the body is not counted
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1].previous = element
+
+    def _read_before_child(self, entry: _OpenElement) -> None:
+        """Reads the text that ends where a child starts or ``entry`` ends."""
+        if entry.previous is None:
+            self._read(entry.element.text)
+        else:
+            self._read(entry.previous.tail)
+            entry.element.remove(entry.previous)
+            entry.previous = None
+
+    def _separate(self) -> None:
+        """Counts a block boundary like whitespace, as chapter_text() does."""
+        if self.body_depth is not None and self.body_depth > 0:
+            self.pending_space = self.length > 0
+
+    def _read(self, raw: Optional[str]) -> None:
+        if not raw or self.body_depth is None or self.body_depth < 0:
+            return
+        speak = not self.silent
+        for match in TEXT_RUN_PATTERN.finditer(raw):
+            run = match.group()
+            if run[0].isspace():
+                # Whitespace only counts between words, as a single space.
+                self.pending_space = self.length > 0
+                continue
+            if self.pending_space:
+                self.length += 1
+                self.pending_space = False
+                if self.block:
+                    self.block.append(" ")
+            if speak:
+                if not self.block:
+                    self.block_start = self.length
+                self.block.append(run)
+            self.length += len(run)
+
+    def _flush(self) -> Iterator[Utterance]:
+        text = "".join(self.block)
+        self.block = []
+        if not text:
+            return
+        assert self.body_depth is not None
+        inner = self.stack[self.body_depth:] if self.body_depth > 0 else []
+        path = tuple(entry.index for entry in inner)
+        anchor = next(
+            (
+                entry.element.get("id")
+                for entry in reversed(inner)
+                if entry.element.get("id")
+            ),
+            None,
+        )
+        for start, end in split_sentences(text):
+            yield Utterance(
+                self.chapter_href,
+                self.count,
+                text[start:end],
+                self.block_start + start,
+                self.block_start + end,
+                path,
+                anchor,
+            )
+            self.count += 1
+
+
+def iter_utterances(
+    book: Book, chapter_href: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Utterance]:
+    """
+    Streams the utterances of a chapter as it is read.
+
+    The chapter is decompressed and parsed ``chunk_size`` bytes at a time,
+    and each utterance is yielded as soon as the block element containing
+    it is complete, so speech can start after the first paragraph rather
+    than after the whole chapter.
+
+    :param book: The book containing the chapter.
+    :type book: Book
+    :param chapter_href: The path of the chapter in the EPUB archive.
+    :type chapter_href: str
+    :param chunk_size: The number of bytes parsed at a time.
+    :type chunk_size: int
+    :return: An iterator of utterances in reading order.
+    :rtype: Iterator[Utterance]
+    :raises InvalidEpubError: If the chapter is missing or is not well-formed
+        XML. Utterances before the error have already been yielded.
+    """
+    try:
+        member = book.zip_file.open(chapter_href)
+    except KeyError as e:
+        raise InvalidEpubError(f"Chapter file not found: {chapter_href}") from e
+    segmenter = _Segmenter(chapter_href)
+    parser: "ET.XMLPullParser[ET.Element]" = ET.XMLPullParser(events=("start", "end"))
+    with member:
+        while True:
+            data = member.read(chunk_size)
+            try:
+                if data:
+                    parser.feed(data)
+                else:
+                    parser.close()
+            except ET.ParseError as e:
+                raise InvalidEpubError(
+                    f"Could not parse chapter: {chapter_href}"
+                ) from e
+            # Only start and end events, which carry elements, are read.
+            events = cast(Iterator[Tuple[str, ET.Element]], parser.read_events())
+            for event, element in events:
+                yield from segmenter.handle(event, element)
+            if not data:
+                break
+
+
+@dataclass
+class _ChapterStream:
+    source: Optional[Iterator[Utterance]]
+    utterances: List[Utterance] = field(default_factory=list)
+    starts: List[int] = field(default_factory=list)
+
+    def extend(self) -> bool:
+        """Reads the next utterance, returning False at the end."""
+        if self.source is None:
+            return False
+        utterance = next(self.source, None)
+        if utterance is None:
+            self.source = None
+            return False
+        self.utterances.append(utterance)
+        self.starts.append(utterance.start)
+        return True
+
+
+class SpeechIndex:
+    """
+    The utterances of the chapters of a book, segmented on demand.
+
+    Each chapter is segmented incrementally, only as far as playback or a
+    lookup has needed, and the utterances found so far are kept, so
+    replaying or resuming never parses a chapter again.
+    """
+
+    def __init__(
+        self, book: Book, maxsize: int = 8, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> None:
+        """
+        Initializes the index.
+
+        :param book: The book to speak.
+        :type book: Book
+        :param maxsize: The number of chapters kept. The least recently used
+            ones are discarded first.
+        :type maxsize: int
+        :param chunk_size: The number of bytes parsed at a time.
+        :type chunk_size: int
+        """
+        self.book: Book = book
+        self.maxsize: int = maxsize
+        self.chunk_size: int = chunk_size
+        self._chapters: "OrderedDict[str, _ChapterStream]" = OrderedDict()
+
+    def utterances(self, chapter_href: str, start: int = 0) -> Iterator[Utterance]:
+        """
+        Yields the utterances of a chapter, segmenting it as they are
+        consumed.
+
+        :param chapter_href: The path of the chapter in the EPUB archive.
+        :type chapter_href: str
+        :param start: The index of the first utterance to yield.
+        :type start: int
+        :rtype: Iterator[Utterance]
+        :raises InvalidEpubError: If the chapter is missing or malformed.
+        """
+        stream = self._stream(chapter_href)
+        position = start
+        while position < len(stream.utterances) or stream.extend():
+            yield stream.utterances[position]
+            position += 1
+
+    def utterance_at(self, chapter_href: str, offset: int) -> Optional[Utterance]:
+        """
+        Finds the utterance to resume speaking from at a text offset.
+
+        :param chapter_href: The path of the chapter in the EPUB archive.
+        :type chapter_href: str
+        :param offset: An offset in the normalized chapter text, e.g. the
+            start of the last utterance spoken or of the visible page.
+        :type offset: int
+        :return: The utterance containing the offset, the one before it if
+            the offset falls between utterances, or the first one before the
+            start of the text. None if the chapter has no text.
+        :rtype: Optional[Utterance]
+        :raises InvalidEpubError: If the chapter is missing or malformed.
+        """
+        stream = self._stream(chapter_href)
+        while not stream.utterances or stream.utterances[-1].end <= offset:
+            if not stream.extend():
+                break
+        if not stream.utterances:
+            return None
+        position = max(bisect.bisect_right(stream.starts, offset) - 1, 0)
+        return stream.utterances[position]
+
+    def resume(self, chapter_href: str, offset: int) -> Iterator[Utterance]:
+        """
+        Yields the utterances of a chapter from the one at a text offset.
+
+        :param chapter_href: The path of the chapter in the EPUB archive.
+        :type chapter_href: str
+        :param offset: An offset in the normalized chapter text.
+        :type offset: int
+        :rtype: Iterator[Utterance]
+        :raises InvalidEpubError: If the chapter is missing or malformed.
+        """
+        utterance = self.utterance_at(chapter_href, offset)
+        if utterance is not None:
+            yield from self.utterances(chapter_href, utterance.index)
+
+    def clear(self) -> None:
+        """Discards all segmented chapters."""
+        self._chapters.clear()
+
+    def _stream(self, chapter_href: str) -> _ChapterStream:
+        stream = self._chapters.get(chapter_href)
+        if stream is None:
+            stream = _ChapterStream(
+                iter_utterances(self.book, chapter_href, self.chunk_size)
+            )
+            self._chapters[chapter_href] = stream
+            if len(self._chapters) > self.maxsize:
+                self._chapters.popitem(last=False)
+        else:
+            self._chapters.move_to_end(chapter_href)
+        return stream
@@ -0,0 +1,154 @@
+from __future__ import annotations
+import re
+import xml.etree.ElementTree as ET
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from .exceptions import InvalidEpubError
+
+if TYPE_CHECKING:
+    from .book import Book
+
+XHTML_NAMESPACE = "http://www.w3.org/1999/xhtml"
+
+WORD_PATTERN = re.compile(r"\w+(?:['’]\w+)*")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Elements whose boundaries separate words even without whitespace in the
+# markup, e.g. ``<p>one</p><p>two</p>``
+BLOCK_ELEMENTS = frozenset({
+    "address", "article", "aside", "blockquote", "body", "br", "caption", "dd",
+    "div", "dl", "dt", "figcaption", "figure", "footer", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "li", "nav", "ol", "p", "pre", "section",
+    "table", "td", "th", "tr", "ul",
+})
+
+
+def parse_chapter(book: Book, chapter_href: str) -> ET.Element:
+    """
+    Reads and parses a chapter of a book.
+
+    :param book: The book containing the chapter.
+    :type book: Book
+    :param chapter_href: The path of the chapter in the EPUB archive.
+    :type chapter_href: str
+    :return: The root element of the chapter document.
+    :rtype: ET.Element
+    :raises InvalidEpubError: If the chapter is missing or is not well-formed
+        XML.
+    """
+    try:
+        chapter_content: bytes = book.zip_file.read(chapter_href)
+    except KeyError as e:
+        raise InvalidEpubError(f"Chapter file not found: {chapter_href}") from e
+    try:
+        return ET.fromstring(chapter_content)
+    except ET.ParseError as e:
+        raise InvalidEpubError(f"Could not parse chapter: {chapter_href}") from e
+
+
+def element_text(root: ET.Element) -> str:
+    """
+    Returns the whitespace-normalized text content of a chapter.
+
+    Only the ``<body>`` is considered when the document has one, so titles
+    and other head content are left out. Block elements (see
+    :data:`BLOCK_ELEMENTS`) are separated by a space, so the words of
+    adjacent paragraphs never run together.
+
+    :param root: The root element of the chapter document.
+    :type root: ET.Element
+    :return: The text of the chapter.
+    :rtype: str
+    """
+    body: Optional[ET.Element] = root.find(f".//{{{XHTML_NAMESPACE}}}body")
+    container: ET.Element = body if body is not None else root
+    pieces: List[str] = []
+    _collect_text(container, pieces)
+    return WHITESPACE_PATTERN.sub(" ", "".join(pieces)).strip()
+
+
+def is_block(element: ET.Element) -> bool:
+    """
+    Returns whether an element separates the text around it.
+
+    :param element: An element of a chapter.
+    :type element: ET.Element
+    :rtype: bool
+    """
+    tag = element.tag
+    return isinstance(tag, str) and tag.rsplit("}", 1)[-1] in BLOCK_ELEMENTS
+
+
+def _collect_text(element: ET.Element, pieces: List[str]) -> None:
+    # Visits the text in the order of itertext().
+    if not isinstance(element.tag, str) and element.tag is not None:
+        return  # Comments and processing instructions have no text
+    block = is_block(element)
+    if block:
+        pieces.append(" ")
+    if element.text:
+        pieces.append(element.text)
+    for child in element:
+        _collect_text(child, pieces)
+        if child.tail:
+            pieces.append(child.tail)
+    if block:
+        pieces.append(" ")
+
+
+def chapter_text(book: Book, chapter_href: str) -> str:
+    """
+    Returns the whitespace-normalized text content of a chapter.
+
+    :param book: The book containing the chapter.
+    :type book: Book
+    :param chapter_href: The path of the chapter in the EPUB archive.
+    :type chapter_href: str
+    :return: The text of the chapter.
+    :rtype: str
+    :raises InvalidEpubError: If the chapter is missing or malformed.
+    """
+    return element_text(parse_chapter(book, chapter_href))
+
+
+def iter_spine_text(book: Book) -> Iterator[Tuple[str, str]]:
+    """
+    Yields the text of each spine item in reading order.
+
+    :param book: The book to read.
+    :type book: Book
+    :return: An iterator of ``(chapter_href, text)`` tuples.
+    :rtype: Iterator[Tuple[str, str]]
+    :raises InvalidEpubError: If a chapter is missing or malformed.
+    """
+    for chapter_href in book.spine:
+        yield chapter_href, chapter_text(book, chapter_href)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase word tokens.
+
+    :param text: The text to split.
+    :type text: str
+    :return: The tokens in order of appearance.
+    :rtype: List[str]
+    """
+    return [match.group().lower() for match in WORD_PATTERN.finditer(text)]
+
+
+def build_term_index(book: Book) -> Dict[str, List[int]]:
+    """
+    Builds an inverted index from terms to the spine items containing them.
+
+    :param book: The book to index.
+    :type book: Book
+    :return: A mapping of lowercase terms to sorted spine positions.
+    :rtype: Dict[str, List[int]]
+    :raises InvalidEpubError: If a chapter is missing or malformed.
+    """
+    index: Dict[str, List[int]] = {}
+    for position, (_, text) in enumerate(iter_spine_text(book)):
+        for term in set(tokenize(text)):
+            index.setdefault(term, []).append(position)
+    return index
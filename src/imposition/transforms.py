@@ -0,0 +1,606 @@
+from __future__ import annotations
+import time
+from string import Template
+import xml.etree.ElementTree as ET
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .annotations import Annotation, apply_highlights, highlight_css
+from .container import resolve_reference
+from .mathml import is_math, render_math, unqualify_foreign
+
+if TYPE_CHECKING:
+    from .book import Book
+    from .css import StylesheetCache
+    from .mathml import MathCache
+
+XHTML_NAMESPACE = "http://www.w3.org/1999/xhtml"
+XHTML = f"{{{XHTML_NAMESPACE}}}"
+
+# Elements visited between pauses of Pipeline.iter_run()
+DEFAULT_CHUNK_SIZE = 200
+
+
+def local_name(tag: str) -> str:
+    """
+    Returns the tag name of an element without its namespace.
+
+    :param tag: An ElementTree tag, e.g. ``{http://www.w3.org/1999/xhtml}p``.
+    :type tag: str
+    :return: The local name, e.g. ``p``.
+    :rtype: str
+    """
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def is_stylesheet_link(element: ET.Element) -> bool:
+    """
+    Returns whether an element links a stylesheet.
+
+    :param element: An element of a chapter.
+    :type element: ET.Element
+    :rtype: bool
+    """
+    return (
+        element.tag == f"{XHTML}link"
+        and "stylesheet" in element.get("rel", "").split()
+    )
+
+
+class TransformContext:
+    """
+    State shared by the passes of a single chapter transformation.
+    """
+
+    def __init__(self, book: Book, chapter_href: str) -> None:
+        """
+        Initializes the context.
+
+        :param book: The book the chapter belongs to.
+        :type book: Book
+        :param chapter_href: The path of the chapter in the EPUB archive.
+        :type chapter_href: str
+        """
+        self.book: Book = book
+        self.chapter_href: str = chapter_href
+        self.head: Optional[ET.Element] = None
+        # Seconds spent in each pass during this transformation
+        self.timings: Dict[str, float] = {}
+        # Scratch space for passes that need to carry state from visit() to
+        # finish(), keyed by pass name.
+        self.state: Dict[str, Any] = {}
+
+
+class Transform:
+    """
+    Base class for a chapter transformation pass.
+
+    A pipeline walks the chapter tree once and hands every element to each of
+    its passes in turn, so a pass only implements what it does to a single
+    element. Passes that need to inspect or modify the whole document before
+    or after the walk override :meth:`start` or :meth:`finish`.
+    """
+
+    name: str = "transform"
+
+    def start(self, root: ET.Element, context: TransformContext) -> None:
+        """
+        Called once before the tree is walked.
+
+        :param root: The root element of the chapter.
+        :type root: ET.Element
+        :param context: The state of the current transformation.
+        :type context: TransformContext
+        """
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        """
+        Called for every element of the chapter, in document order.
+
+        :param element: The element being visited.
+        :type element: ET.Element
+        :param context: The state of the current transformation.
+        :type context: TransformContext
+        :return: False to remove the element and its subtree from the
+            chapter. Later passes then do not see it.
+        :rtype: Optional[bool]
+        """
+        return None
+
+    def finish(self, root: ET.Element, context: TransformContext) -> None:
+        """
+        Called once after the tree has been walked.
+
+        :param root: The root element of the chapter.
+        :type root: ET.Element
+        :param context: The state of the current transformation.
+        :type context: TransformContext
+        """
+
+
+class Pipeline:
+    """
+    An ordered set of transformation passes fused into one tree traversal.
+    """
+
+    def __init__(self, transforms: Optional[Iterable[Transform]] = None) -> None:
+        """
+        Initializes the pipeline.
+
+        :param transforms: The initial passes, in the order they run.
+        :type transforms: Optional[Iterable[Transform]]
+        """
+        self.transforms: List[Transform] = []
+        self.timings: Dict[str, float] = {}
+        for transform in transforms or ():
+            self.add(transform)
+
+    def add(self, transform: Transform, before: Optional[str] = None) -> None:
+        """
+        Registers a pass.
+
+        :param transform: The pass to register.
+        :type transform: Transform
+        :param before: The name of an existing pass this one must run
+            before. By default it runs after all existing passes.
+        :type before: Optional[str]
+        :raises ValueError: If a pass with the same name is already
+            registered, or if ``before`` does not name a registered pass.
+        """
+        if any(existing.name == transform.name for existing in self.transforms):
+            raise ValueError(
+                f"A transform named '{transform.name}' is already registered."
+            )
+        if before is None:
+            self.transforms.append(transform)
+        else:
+            self.transforms.insert(self._index(before), transform)
+
+    def remove(self, name: str) -> Transform:
+        """
+        Unregisters a pass.
+
+        :param name: The name of the pass.
+        :type name: str
+        :return: The removed pass.
+        :rtype: Transform
+        :raises ValueError: If no pass with that name is registered.
+        """
+        return self.transforms.pop(self._index(name))
+
+    def get(self, name: str) -> Optional[Transform]:
+        """
+        Returns the registered pass with the given name, if any.
+
+        :param name: The name of the pass.
+        :type name: str
+        :rtype: Optional[Transform]
+        """
+        for transform in self.transforms:
+            if transform.name == name:
+                return transform
+        return None
+
+    def _index(self, name: str) -> int:
+        for index, transform in enumerate(self.transforms):
+            if transform.name == name:
+                return index
+        raise ValueError(f"No transform named '{name}' is registered.")
+
+    def run(self, root: ET.Element, context: TransformContext) -> None:
+        """
+        Applies all passes to a chapter in a single traversal.
+
+        The time spent in each pass, including its :meth:`Transform.start`
+        and :meth:`Transform.finish` hooks, is recorded in :attr:`timings`
+        in seconds.
+
+        :param root: The root element of the chapter. It is modified in
+            place.
+        :type root: ET.Element
+        :param context: The state of the current transformation.
+        :type context: TransformContext
+        """
+        for _ in self.iter_run(root, context, chunk_size=0):
+            pass
+
+    def iter_run(
+        self,
+        root: ET.Element,
+        context: TransformContext,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[None]:
+        """
+        Applies all passes to a chapter, pausing between chunks of work.
+
+        The generator yields after the :meth:`Transform.start` hooks, after
+        every ``chunk_size`` elements of the walk and before the
+        :meth:`Transform.finish` hooks, so that a caller can hand control
+        back to an event loop. All state of the run is kept on ``context``,
+        so runs on different chapters can be interleaved; :attr:`timings`
+        is only updated once a run completes.
+
+        :param root: The root element of the chapter. It is modified in
+            place.
+        :type root: ET.Element
+        :param context: The state of the current transformation.
+        :type context: TransformContext
+        :param chunk_size: The number of elements visited between pauses,
+            or 0 to only pause around the walk.
+        :type chunk_size: int
+        :rtype: Iterator[None]
+        """
+        transforms = list(self.transforms)
+        timings: Dict[str, float] = {transform.name: 0.0 for transform in transforms}
+        context.timings = timings
+        clock = time.perf_counter
+
+        context.head = root.find(f".//{XHTML}head")
+        for transform in transforms:
+            started = clock()
+            transform.start(root, context)
+            timings[transform.name] += clock() - started
+        yield
+
+        stack: List[Tuple[Optional[ET.Element], ET.Element]] = [(None, root)]
+        visited = 0
+        while stack:
+            parent, element = stack.pop()
+            keep = True
+            for transform in transforms:
+                started = clock()
+                keep = transform.visit(element, context) is not False
+                timings[transform.name] += clock() - started
+                if not keep:
+                    break
+            if not keep and parent is not None:
+                _remove_element(parent, element)
+            else:
+                stack.extend((element, child) for child in reversed(element))
+            visited += 1
+            if chunk_size and visited % chunk_size == 0:
+                yield
+
+        yield
+        for transform in transforms:
+            started = clock()
+            transform.finish(root, context)
+            timings[transform.name] += clock() - started
+        self.timings = timings
+
+
+def _remove_element(parent: ET.Element, element: ET.Element) -> None:
+    """Removes an element, keeping the text that follows it."""
+    if element.tail and element.tail.strip():
+        index = list(parent).index(element)
+        if index > 0:
+            previous = parent[index - 1]
+            previous.tail = (previous.tail or "") + element.tail
+        else:
+            parent.text = (parent.text or "") + element.tail
+    parent.remove(element)
+
+
+class StripStylesheets(Transform):
+    """Removes linked stylesheets and ``<style>`` elements."""
+
+    name = "strip-stylesheets"
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        if element.tag == f"{XHTML}style":
+            return False
+        if is_stylesheet_link(element):
+            return False
+        return None
+
+
+class AttachStylesheets(Transform):
+    """
+    Keeps publisher styles, attaching linked stylesheets by reference.
+
+    Linked stylesheets are pointed at the URL returned by ``attach`` for
+    their archive path, so a stylesheet shared by many chapters is
+    processed once and loaded from the same URL each time. ``<style>``
+    elements and ``style`` attributes are passed through :attr:`styles`.
+    This pass replaces :class:`StripStylesheets` and
+    :class:`StripInlineStyles`.
+    """
+
+    name = "attach-stylesheets"
+
+    def __init__(
+        self, styles: StylesheetCache, attach: Callable[[str], Optional[str]]
+    ) -> None:
+        """
+        Initializes the pass.
+
+        :param styles: Processes embedded CSS.
+        :type styles: StylesheetCache
+        :param attach: Returns the URL a stylesheet is loaded from, given
+            its archive path, or None to drop the link.
+        :type attach: Callable[[str], Optional[str]]
+        """
+        self.styles = styles
+        self.attach = attach
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        if is_stylesheet_link(element):
+            target = resolve_reference(context.chapter_href, element.get("href", ""))
+            url = self.attach(target[0]) if target else None
+            if url is None:
+                return False
+            element.set("href", url)
+        elif element.tag == f"{XHTML}style" and element.text:
+            element.text = self.styles.process(element.text, context.chapter_href)
+        if "style" in element.attrib:
+            element.set("style", self.styles.filter(element.attrib["style"]))
+        return None
+
+
+class StripInlineStyles(Transform):
+    """Removes ``style`` attributes."""
+
+    name = "strip-inline-styles"
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        if "style" in element.attrib:
+            del element.attrib["style"]
+        return None
+
+
+class StripScripts(Transform):
+    """Removes ``<script>`` elements and inline event handler attributes."""
+
+    name = "strip-scripts"
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        if local_name(element.tag) == "script":
+            return False
+        for attribute in [name for name in element.attrib if name.startswith("on")]:
+            del element.attrib[attribute]
+        return None
+
+
+NAVIGATION_ATTRIBUTE = "data-imposition-href"
+NAVIGATION_MESSAGE = "imposition:navigate"
+
+# Forwards clicks on rewritten links to the parent page, which owns the
+# rendition. postMessage works even though data: documents are cross-origin.
+NAVIGATION_SCRIPT = Template(
+    "document.addEventListener('click', function (event) {"
+    " var link = event.target.closest && event.target.closest('[$attribute]');"
+    " if (!link) { return; }"
+    " event.preventDefault();"
+    " window.parent.postMessage("
+    "{type: '$message', href: link.getAttribute('$attribute')}, '*');"
+    " });"
+).substitute(attribute=NAVIGATION_ATTRIBUTE, message=NAVIGATION_MESSAGE)
+
+
+class ResolveLinks(Transform):
+    """
+    Turns links to other spine items into lightweight navigation hooks.
+
+    A link such as ``<a href="chapter5.xhtml#sec2">`` is rewritten to carry
+    the resolved archive path in a ``data-imposition-href`` attribute, and a
+    small script reports clicks on such links to the parent page. Links
+    into the current chapter become plain fragment links.
+    """
+
+    name = "resolve-links"
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        if local_name(element.tag) not in ("a", "area"):
+            return None
+        href = element.get("href")
+        if not href:
+            return None
+        target = resolve_reference(context.chapter_href, href)
+        if target is None:
+            return None
+        path, fragment = target
+        if path == context.chapter_href:
+            element.set("href", f"#{fragment}")
+        elif path in context.book.spine_index:
+            element.set(
+                NAVIGATION_ATTRIBUTE, f"{path}#{fragment}" if fragment else path
+            )
+            element.set("href", f"#{fragment}")
+            context.state[self.name] = True
+        return None
+
+    def finish(self, root: ET.Element, context: TransformContext) -> None:
+        if context.head is None or not context.state.get(self.name):
+            return
+        script_element: ET.Element = ET.Element("script")
+        script_element.text = NAVIGATION_SCRIPT
+        context.head.append(script_element)
+
+
+class EmbedAssets(Transform):
+    """
+    Replaces references to archive members with data URIs.
+
+    Linked stylesheets are left alone; they are handled by
+    :class:`StripStylesheets` or :class:`AttachStylesheets`.
+    """
+
+    name = "embed-assets"
+
+    def __init__(self, embed: Callable[[ET.Element, str, str], None]) -> None:
+        """
+        Initializes the pass.
+
+        :param embed: A callable that embeds the asset referenced by an
+            attribute of an element, given the element, the attribute name
+            and the path of the chapter.
+        :type embed: Callable[[ET.Element, str, str], None]
+        """
+        self.embed = embed
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        if "src" in element.attrib:
+            self.embed(element, "src", context.chapter_href)
+        if (
+            "href" in element.attrib
+            and not element.get("href", "").endswith(".css")
+            and not is_stylesheet_link(element)
+        ):
+            self.embed(element, "href", context.chapter_href)
+        return None
+
+
+LAZY_SOURCE_ATTRIBUTE = "data-imposition-src"
+
+
+class DeferImages(Transform):
+    """
+    Lets a callable defer loading each ``<img>`` element, e.g. by replacing
+    its source with a placeholder. Runs before :class:`ScaleImages` and
+    :class:`EmbedAssets`, so deferred images are not read while the chapter
+    is transformed.
+    """
+
+    name = "defer-images"
+
+    def __init__(self, defer: Callable[[ET.Element, str], None]) -> None:
+        """
+        Initializes the pass.
+
+        :param defer: A callable that rewrites an image element, given the
+            element and the path of the chapter.
+        :type defer: Callable[[ET.Element, str], None]
+        """
+        self.defer = defer
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        if local_name(element.tag) == "img" and element.get("src"):
+            self.defer(element, context.chapter_href)
+        return None
+
+
+class ScaleImages(Transform):
+    """
+    Lets a callable pick the rendition of each ``<img>`` element, e.g. a
+    downscaled variant. Runs before :class:`EmbedAssets`, which leaves the
+    rewritten sources alone.
+    """
+
+    name = "scale-images"
+
+    def __init__(self, scale: Callable[[ET.Element, str], None]) -> None:
+        """
+        Initializes the pass.
+
+        :param scale: A callable that rewrites an image element, given the
+            element and the path of the chapter.
+        :type scale: Callable[[ET.Element, str], None]
+        """
+        self.scale = scale
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        if local_name(element.tag) == "img" and element.get("src"):
+            self.scale(element, context.chapter_href)
+        return None
+
+
+class HighlightAnnotations(Transform):
+    """
+    Wraps the annotated ranges of the chapter in ``<mark>`` elements.
+
+    Highlights are applied in :meth:`start`, before other passes remove
+    elements, so that annotation offsets match the text of the original
+    chapter. The rules coloring them are added to the head in
+    :meth:`finish`, after passes that strip styles have run.
+    """
+
+    name = "highlight-annotations"
+
+    def __init__(self, annotations: Callable[[str], List[Annotation]]) -> None:
+        """
+        Initializes the pass.
+
+        :param annotations: A callable returning the annotations of a
+            chapter, given its path.
+        :type annotations: Callable[[str], List[Annotation]]
+        """
+        self.annotations = annotations
+
+    def start(self, root: ET.Element, context: TransformContext) -> None:
+        annotations = self.annotations(context.chapter_href)
+        apply_highlights(root, annotations)
+        context.state[self.name] = highlight_css(annotations)
+
+    def finish(self, root: ET.Element, context: TransformContext) -> None:
+        css = context.state.pop(self.name, "")
+        if css and context.head is not None:
+            style_element: ET.Element = ET.Element("style")
+            style_element.text = css
+            context.head.append(style_element)
+
+
+class RenderMath(Transform):
+    """
+    Replaces MathML formulas with their pre-rendered SVG or HTML.
+
+    Formulas are collected during the walk and replaced in :meth:`finish`,
+    so that passes such as :class:`StripInlineStyles` never see the
+    rendered markup. Formulas that are not rendered are kept as MathML
+    without namespace prefixes, which HTML parsers would not recognize.
+    """
+
+    name = "render-math"
+
+    def __init__(self, cache: MathCache) -> None:
+        """
+        Initializes the pass.
+
+        :param cache: The cache used to render formulas.
+        :type cache: MathCache
+        """
+        self.cache = cache
+
+    def start(self, root: ET.Element, context: TransformContext) -> None:
+        context.state[self.name] = []
+
+    def visit(self, element: ET.Element, context: TransformContext) -> Optional[bool]:
+        if is_math(element):
+            context.state[self.name].append(element)
+        return None
+
+    def finish(self, root: ET.Element, context: TransformContext) -> None:
+        for element in context.state.pop(self.name):
+            if not render_math(element, self.cache):
+                unqualify_foreign(element)
+
+
+class InjectStyle(Transform):
+    """Appends a ``<style>`` element to the chapter head."""
+
+    name = "inject-style"
+
+    def __init__(self, css: Callable[[], str]) -> None:
+        """
+        Initializes the pass.
+
+        :param css: A callable returning the CSS text to inject. It is
+            called once per chapter.
+        :type css: Callable[[], str]
+        """
+        self.css = css
+
+    def finish(self, root: ET.Element, context: TransformContext) -> None:
+        if context.head is None:
+            return
+        style_element: ET.Element = ET.Element("style")
+        style_element.text = self.css()
+        context.head.append(style_element)
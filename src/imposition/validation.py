@@ -0,0 +1,347 @@
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from .book import NCX_NAMESPACES, OPF_NAMESPACES, Book, parse_manifest, parse_ncx
+from .container import open_epub, read_opf, resolve_reference
+from .exceptions import ImpositionError, InvalidEpubError
+
+ERROR = "error"
+WARNING = "warning"
+
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+REFERENCE_ATTRIBUTES: Tuple[str, ...] = ("src", "href", "poster", "data", XLINK_HREF)
+
+
+@dataclass(frozen=True)
+class ValidationIssue:
+    """
+    A single problem found while validating an EPUB file.
+
+    :ivar severity: Either ``"error"`` or ``"warning"``.
+    :ivar code: A short machine-readable identifier of the kind of problem,
+        e.g. ``"missing-asset"``.
+    :ivar message: A human-readable description.
+    :ivar path: The archive path of the file the problem was found in, if
+        any.
+    """
+
+    severity: str
+    code: str
+    message: str
+    path: Optional[str] = None
+
+
+@dataclass
+class ValidationReport:
+    """
+    The result of validating an EPUB file.
+
+    :ivar issues: All problems found, in the order they were detected.
+    """
+
+    issues: List[ValidationIssue] = field(default_factory=list)
+
+    @property
+    def errors(self) -> List[ValidationIssue]:
+        """The issues with ``"error"`` severity."""
+        return [issue for issue in self.issues if issue.severity == ERROR]
+
+    @property
+    def warnings(self) -> List[ValidationIssue]:
+        """The issues with ``"warning"`` severity."""
+        return [issue for issue in self.issues if issue.severity == WARNING]
+
+    @property
+    def is_valid(self) -> bool:
+        """Whether no errors were found. Warnings do not count."""
+        return not self.errors
+
+    def raise_for_errors(self) -> None:
+        """
+        Raises the first error of the report, if any.
+
+        :raises InvalidEpubError: If the report contains an error.
+        """
+        if self.errors:
+            raise InvalidEpubError(self.errors[0].message)
+
+    def add(
+        self, severity: str, code: str, message: str, path: Optional[str] = None
+    ) -> None:
+        """Records a new issue."""
+        self.issues.append(ValidationIssue(severity, code, message, path))
+
+
+def validate_epub(epub_bytes: bytes) -> ValidationReport:
+    """
+    Validates an EPUB file and reports every problem found.
+
+    Unlike the :class:`Book` constructor, which raises on the first problem,
+    validation continues past recoverable problems. Only a broken ZIP,
+    mimetype, container.xml or OPF file stops it early, since nothing else
+    can be checked without them.
+
+    :param epub_bytes: The binary content of the EPUB file.
+    :type epub_bytes: bytes
+    :return: The validation report.
+    :rtype: ValidationReport
+    """
+    report = ValidationReport()
+    try:
+        zip_file = open_epub(epub_bytes)
+        opf_path, opf_root = read_opf(zip_file)
+    except ImpositionError as e:
+        report.add(ERROR, "invalid-container", str(e))
+        return report
+    _Validator(zip_file, opf_path, opf_root, report).run()
+    return report
+
+
+def validate_book(book: Book) -> ValidationReport:
+    """
+    Validates the contents of an opened book.
+
+    :param book: The book to validate.
+    :type book: Book
+    :return: The validation report.
+    :rtype: ValidationReport
+    """
+    report = ValidationReport()
+    _Validator(book.zip_file, book.opf_path, book.opf_root, report).run()
+    return report
+
+
+class _Validator:
+    """
+    Cross-checks the manifest, spine, TOC and chapter references of an EPUB.
+
+    The ZIP central directory is read once to learn which members exist.
+    Only the OPF file, the NCX document and the spine documents are
+    decompressed; referenced assets are checked against the central
+    directory without being read.
+    """
+
+    def __init__(
+        self,
+        zip_file: zipfile.ZipFile,
+        opf_path: str,
+        opf_root: ET.Element,
+        report: ValidationReport,
+    ) -> None:
+        self.zip_file = zip_file
+        self.opf_path = opf_path
+        self.opf_dir = posixpath.dirname(opf_path)
+        self.opf_root = opf_root
+        self.report = report
+        self.members: Set[str] = set()
+        self.manifest: Dict[str, Dict[str, str]] = {}
+        self.manifest_paths: Set[str] = set()
+        # Element ids of every parsed document, for fragment checks
+        self.document_ids: Dict[str, Set[str]] = {}
+
+    def run(self) -> None:
+        self._check_central_directory()
+        if not self._check_manifest():
+            return
+        spine = self._check_spine()
+        references = self._scan_documents(spine)
+        self._check_references(references)
+        self._check_toc()
+
+    def _check_central_directory(self) -> None:
+        infos = self.zip_file.infolist()
+        self.members = {info.filename for info in infos}
+        if infos[0].filename != "mimetype":
+            self.report.add(
+                WARNING, "mimetype-not-first",
+                "The mimetype file is not the first entry of the archive.", "mimetype",
+            )
+        elif infos[0].compress_type != zipfile.ZIP_STORED:
+            self.report.add(
+                WARNING, "mimetype-compressed",
+                "The mimetype file is compressed.", "mimetype",
+            )
+
+    def _check_manifest(self) -> bool:
+        try:
+            self.manifest = parse_manifest(self.opf_root, self.opf_dir)
+        except InvalidEpubError as e:
+            self.report.add(ERROR, "missing-manifest", str(e), self.opf_path)
+            return False
+
+        seen_ids: Set[str] = set()
+        for item in self.opf_root.findall("opf:manifest/opf:item", OPF_NAMESPACES):
+            item_id = item.get("id")
+            if not item_id or not item.get("href"):
+                self.report.add(
+                    ERROR, "incomplete-manifest-item",
+                    "Manifest item is missing its id or href attribute.", self.opf_path,
+                )
+                continue
+            if item_id in seen_ids:
+                self.report.add(
+                    ERROR, "duplicate-manifest-id",
+                    f"Duplicate manifest item id: {item_id}", self.opf_path,
+                )
+            seen_ids.add(item_id)
+
+        for item_id, entry in self.manifest.items():
+            self.manifest_paths.add(entry['url'])
+            if entry['url'] not in self.members:
+                self.report.add(
+                    ERROR, "missing-manifest-file",
+                    f"Manifest item '{item_id}' refers to a missing file: "
+                    f"{entry['url']}",
+                    entry['url'],
+                )
+        return True
+
+    def _check_spine(self) -> List[str]:
+        spine_element = self.opf_root.find("opf:spine", OPF_NAMESPACES)
+        if spine_element is None:
+            self.report.add(
+                ERROR, "missing-spine",
+                "Could not find spine element in OPF file.", self.opf_path,
+            )
+            return []
+
+        spine: List[str] = []
+        for itemref in spine_element.findall("opf:itemref", OPF_NAMESPACES):
+            idref = itemref.get("idref")
+            if not idref:
+                continue
+            if idref not in self.manifest:
+                self.report.add(
+                    ERROR, "unknown-spine-idref",
+                    f"Item in spine not found in manifest: {idref}", self.opf_path,
+                )
+            elif self.manifest[idref]['url'] in self.members:
+                spine.append(self.manifest[idref]['url'])
+        if not spine_element.findall("opf:itemref", OPF_NAMESPACES):
+            self.report.add(ERROR, "empty-spine", "The spine is empty.", self.opf_path)
+        return spine
+
+    def _read(self, path: str) -> Optional[bytes]:
+        """
+        Decompresses an archive member, reporting it if its data is
+        corrupt.
+        """
+        try:
+            return self.zip_file.read(path)
+        except (zipfile.BadZipFile, zlib.error, OSError) as e:
+            self.report.add(
+                ERROR, "corrupt-member", f"Could not read {path}: {e}", path
+            )
+            return None
+
+    def _scan_documents(self, spine: List[str]) -> List[Tuple[str, str, str]]:
+        """
+        Parses each spine document once, recording its element ids and the
+        ``(document, element tag, reference)`` triples it contains.
+        """
+        references: List[Tuple[str, str, str]] = []
+        for document_path in dict.fromkeys(spine):
+            content = self._read(document_path)
+            if content is None:
+                continue
+            try:
+                root = ET.fromstring(content)
+            except ET.ParseError as e:
+                self.report.add(
+                    ERROR, "malformed-document",
+                    f"Could not parse chapter: {e}", document_path,
+                )
+                continue
+            ids: Set[str] = set()
+            for element in root.iter():
+                element_id = element.get("id")
+                if element_id:
+                    ids.add(element_id)
+                for attribute in REFERENCE_ATTRIBUTES:
+                    value = element.get(attribute)
+                    if value:
+                        references.append(
+                            (document_path, _local_name(element.tag), value)
+                        )
+            self.document_ids[document_path] = ids
+        return references
+
+    def _check_references(self, references: List[Tuple[str, str, str]]) -> None:
+        for document_path, tag, reference in references:
+            target = resolve_reference(document_path, reference)
+            if target is None:
+                continue
+            target_path, fragment = target
+            if target_path not in self.members:
+                code = "broken-link" if tag in ("a", "area") else "missing-asset"
+                self.report.add(
+                    ERROR, code,
+                    f"Referenced file not found: {target_path}", document_path,
+                )
+                continue
+            if target_path not in self.manifest_paths:
+                self.report.add(
+                    WARNING, "unmanifested-file",
+                    f"Referenced file is not declared in the manifest: {target_path}",
+                    document_path,
+                )
+            self._check_fragment(document_path, target_path, fragment, "broken-link")
+
+    def _check_toc(self) -> None:
+        spine_element = self.opf_root.find("opf:spine", OPF_NAMESPACES)
+        toc_id = spine_element.get("toc") if spine_element is not None else None
+        if not toc_id:
+            return
+        if toc_id not in self.manifest:
+            self.report.add(
+                ERROR, "missing-toc",
+                f"TOC item with id '{toc_id}' not found in manifest.", self.opf_path,
+            )
+            return
+        toc_path = self.manifest[toc_id]['url']
+        if toc_path not in self.members:
+            return  # Already reported as a missing manifest file
+        content = self._read(toc_path)
+        if content is None:
+            return
+        try:
+            toc_root = ET.fromstring(content)
+        except ET.ParseError as e:
+            self.report.add(
+                ERROR, "malformed-toc", f"Could not parse TOC file: {e}", toc_path
+            )
+            return
+
+        if toc_root.find("ncx:navMap", NCX_NAMESPACES) is None:
+            self.report.add(WARNING, "empty-toc", "The TOC has no navMap.", toc_path)
+        for entry in parse_ncx(toc_root, toc_path):
+            target_path, _, fragment = entry['url'].partition('#')
+            if target_path not in self.members:
+                self.report.add(
+                    ERROR, "missing-toc-target",
+                    f"TOC entry '{entry['title']}' points to a missing file: "
+                    f"{target_path}",
+                    toc_path,
+                )
+                continue
+            self._check_fragment(toc_path, target_path, fragment, "missing-toc-target")
+
+    def _check_fragment(
+        self, source_path: str, target_path: str, fragment: str, code: str
+    ) -> None:
+        ids = self.document_ids.get(target_path)
+        # Fragments are only checked in documents that were parsed anyway.
+        if fragment and ids is not None and fragment not in ids:
+            self.report.add(
+                ERROR, code,
+                f"Anchor '{fragment}' not found in {target_path}", source_path,
+            )
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
@@ -1,7 +1,8 @@
 import sys
 from unittest.mock import MagicMock
 
-# Mock browser-specific modules before any other imports
+# run_imposition.py imports the browser modules directly; the imposition
+# package itself imports without them.
 sys.modules["js"] = MagicMock()
 sys.modules["pyodide"] = MagicMock()
 sys.modules["pyodide.ffi"] = MagicMock()
@@ -61,7 +61,7 @@ async def test_main_application_flow(mock_js_object):
          patch('run_imposition.Rendition', autospec=True) as mock_rendition_class:
 
         # Get the mock instances that will be created by the script
-        mock_book_instance = mock_book_class.return_value
+        mock_book_instance = mock_book_class.open.return_value
         mock_dom_adapter_instance = mock_dom_adapter_class.return_value
         # Give the mock book a spine so the script can access it
         mock_book_instance.spine = ["chapter1.xhtml"]
@@ -78,17 +78,19 @@ async def test_main_application_flow(mock_js_object):
         # 2. Verify that the Book object was instantiated with the EPUB content
         # The mock_js_object is configured to return the bytes from the epub_bytes fixture
         epub_content = mock_js_object.pyfetch.return_value.bytes.return_value.to_py()
-        mock_book_class.assert_called_once_with(epub_content)
+        mock_book_class.open.assert_awaited_once_with(epub_content)
 
         # 3. Verify that the PyodideDOMAdapter was instantiated
         mock_dom_adapter_class.assert_called_once_with()
 
         # 4. Verify that the Rendition object was instantiated with the book and viewer ID
-        mock_rendition_class.assert_called_once_with(mock_book_instance, mock_dom_adapter_instance, "viewer")
+        mock_rendition_class.assert_called_once_with(
+            mock_book_instance, mock_dom_adapter_instance, "viewer", served=False
+        )
 
         # 5. Verify that the rendition instance was attached to the mock window
         assert mock_js_object.window.rendition is mock_rendition_instance
 
         # 6. Verify that the TOC and the first chapter were displayed
-        mock_rendition_instance.display_toc.assert_called_once_with()
-        mock_rendition_instance.display.assert_called_once_with("chapter1.xhtml")
+        mock_rendition_instance.display_toc_async.assert_awaited_once_with()
+        mock_rendition_instance.display_async.assert_awaited_once_with("chapter1.xhtml")
@@ -1,6 +1,42 @@
-from typing import Any, Callable, Dict, List, Optional
+import io
+import struct
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from unittest.mock import Mock, MagicMock
 
+# A container.xml pointing at OEBPS/content.opf, shared by the in-memory
+# EPUB files built by the tests
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+
+def create_epub_bytes(files: Dict[str, Union[str, bytes]]) -> bytes:
+    """Creates an in-memory EPUB file (zip archive) from a dictionary of files."""
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
+        for path, content in files.items():
+            zip_file.writestr(path, content)
+    return zip_buffer.getvalue()
+
+
+def corrupt_member(path: Path, member: str) -> None:
+    """Flips a byte in the middle of the stored data of an archive member."""
+    with zipfile.ZipFile(path) as zip_file:
+        info = zip_file.getinfo(member)
+    data = bytearray(path.read_bytes())
+    header = info.header_offset
+    name_length, extra_length = struct.unpack("<HH", data[header + 26:header + 30])
+    position = header + 30 + name_length + extra_length + info.compress_size // 2
+    data[position] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+
 class MockDOMElement:
     """A mock DOM element for testing."""
     def __init__(self, tag_name: str) -> None:
@@ -8,15 +44,33 @@ class MockDOMElement:
         self.children: List[MockDOMElement] = []
         self.attributes: Dict[str, str] = {}
         self.style = MagicMock()
-        self.innerHTML: str = ""
+        self._inner_html: str = ""
         self.textContent: str = ""
         self.href: str = "#"
         self.onclick: Optional[Callable[[Any], None]] = None
-        self.onload: str = ""
+        self.onload: Union[str, Callable[..., Any]] = ""
         self.src: str = ""
+        self.srcdoc: str = ""
         self.disabled: bool = False
         self.className: str = ""
         self.preventDefault: Mock = Mock()
+        # Layout state used by the paginated mode
+        self.clientWidth: int = 800
+        self.clientHeight: int = 600
+        self.scrollWidth: int = 800
+        self.scroll_position: Tuple[int, int] = (0, 0)
+        self.anchor_offsets: Dict[str, int] = {}
+        self.scrolled_to_anchor: Optional[str] = None
+
+    @property
+    def innerHTML(self) -> str:
+        return self._inner_html
+
+    @innerHTML.setter
+    def innerHTML(self, value: str) -> None:
+        # Replacing the markup drops the existing children, as in a browser
+        self._inner_html = value
+        self.children = []
 
     def appendChild(self, child: "MockDOMElement") -> None:
         self.children.append(child)
@@ -28,6 +82,16 @@ class MockDOMAdapter:
     """A mock DOM adapter for testing."""
     def __init__(self) -> None:
         self.elements: Dict[str, MockDOMElement] = {}
+        self.message_listeners: List[Tuple[MockDOMElement, Callable[[Any], None]]] = []
+        self.resource_handlers: Dict[str, Callable[[str, Optional[str]], Any]] = {}
+        self.object_urls: Dict[str, Tuple[bytes, str]] = {}
+        self.lazy_image_observers: List[
+            Tuple[MockDOMElement, str, Callable[[str], Optional[str]]]
+        ] = []
+        # Proxies created and not destroyed yet
+        self.proxies: List[Callable[..., Any]] = []
+        self.revoked_urls: List[str] = []
+        self.device_pixel_ratio: float = 1.0
 
     def get_element_by_id(self, element_id: str) -> MockDOMElement:
         if element_id not in self.elements:
@@ -38,4 +102,68 @@ class MockDOMAdapter:
         return MockDOMElement(tag_name)
 
     def create_proxy(self, handler: Callable[..., Any]) -> Callable[..., Any]:
+        self.proxies.append(handler)
         return handler
+
+    def destroy_proxy(self, proxy: Callable[..., Any]) -> None:
+        self.proxies = [live for live in self.proxies if live is not proxy]
+
+    def get_element_size(self, element: MockDOMElement) -> Tuple[int, int]:
+        return element.clientWidth, element.clientHeight
+
+    def get_device_pixel_ratio(self) -> float:
+        return self.device_pixel_ratio
+
+    def get_scroll_width(self, frame: MockDOMElement) -> int:
+        return frame.scrollWidth
+
+    def get_anchor_offset(self, frame: MockDOMElement, anchor: str) -> Optional[int]:
+        return frame.anchor_offsets.get(anchor)
+
+    def scroll_frame(self, frame: MockDOMElement, left: int, top: int) -> None:
+        frame.scroll_position = (left, top)
+
+    def scroll_to_anchor(self, frame: MockDOMElement, anchor: str) -> None:
+        frame.scrolled_to_anchor = anchor
+
+    def add_message_listener(
+        self, frame: MockDOMElement, handler: Callable[[Any], None]
+    ) -> Callable[[], None]:
+        registration = (frame, handler)
+        self.message_listeners.append(registration)
+        return lambda: self.message_listeners.remove(registration)
+
+    def serve_resources(
+        self, prefix: str, handler: Callable[[str, Optional[str]], Any]
+    ) -> Callable[[], None]:
+        self.resource_handlers[prefix] = handler
+
+        def dispose() -> None:
+            del self.resource_handlers[prefix]
+
+        return dispose
+
+    def create_object_url(self, data: bytes, mime_type: str) -> str:
+        url = f"blob:mock/{len(self.object_urls) + len(self.revoked_urls)}"
+        self.object_urls[url] = (data, mime_type)
+        return url
+
+    def revoke_object_url(self, url: str) -> None:
+        del self.object_urls[url]
+        self.revoked_urls.append(url)
+
+    def observe_lazy_images(
+        self,
+        frame: MockDOMElement,
+        attribute: str,
+        resolve: Callable[[str], Optional[str]],
+    ) -> Callable[[], None]:
+        registration = (frame, attribute, resolve)
+        self.lazy_image_observers.append(registration)
+        return lambda: self.lazy_image_observers.remove(registration)
+
+    def post_message(self, frame: MockDOMElement, data: Any) -> None:
+        """Simulates the document in ``frame`` posting a message to the page."""
+        for listener_frame, handler in self.message_listeners:
+            if listener_frame is frame:
+                handler(data)
@@ -0,0 +1,86 @@
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+from imposition.analysis import Corpus
+from imposition.book import Book
+from imposition.exceptions import ImpositionError
+from imposition.text import iter_spine_text, tokenize
+
+np = pytest.importorskip("numpy")
+
+
+def mock_book(chapters):
+    book = MagicMock(spec=Book)
+    book.iter_text.side_effect = lambda: iter(chapters)
+    return book
+
+
+@pytest.fixture
+def shelf():
+    return Corpus.from_books([
+        mock_book([
+            ("one.xhtml", "Marley was dead: to begin with."),
+            ("empty.xhtml", ""),
+            ("two.xhtml", "Scrooge knew he was dead? Of course he did."),
+        ]),
+        mock_book([("three.xhtml", "The dead man was Marley, Scrooge's partner.")]),
+    ])
+
+
+def test_tokens_and_boundaries(shelf):
+    words = [shelf.vocabulary[i] for i in shelf.tokens[:6]]
+    assert words == tokenize("Marley was dead: to begin with.")
+    assert shelf.chapter_starts.tolist() == [0, 6, 6, 15, 22]
+    assert shelf.book_starts.tolist() == [0, 3, 4]
+    assert shelf.offsets[:3].tolist() == [0, 7, 11]
+    assert len(shelf) == 22
+
+
+def test_frequencies_and_counts(shelf):
+    assert shelf.frequencies()[shelf.term_id("DEAD")] == 3
+    assert shelf.most_common(2) == [("was", 3), ("dead", 3)]
+    assert shelf.term_counts("marley").tolist() == [1, 0, 0, 1]
+    assert shelf.term_counts("dead", by="book").tolist() == [2, 1]
+    assert shelf.term_counts("unknown").tolist() == [0, 0, 0, 0]
+    with pytest.raises(ValueError, match="Unknown grouping"):
+        shelf.term_counts("dead", by="paragraph")
+
+
+def test_chapter_statistics(shelf):
+    statistics = shelf.chapter_statistics()
+    assert statistics.tokens.tolist() == [6, 0, 9, 7]
+    # "he" occurs twice in the second chapter
+    assert statistics.types.tolist() == [6, 0, 8, 7]
+    mean_length = len("Marleywasdeadtobeginwith") / 6
+    assert statistics.mean_word_length[0] == pytest.approx(mean_length)
+    assert statistics.mean_word_length[1] == 0
+
+
+def test_concordance_stays_within_chapters(shelf):
+    lines = shelf.concordance("Dead", width=2)
+    assert [(line.book, line.href, line.position) for line in lines] == [
+        (0, "one.xhtml", 2), (0, "two.xhtml", 4), (1, "three.xhtml", 1),
+    ]
+    assert lines[0].left == ("marley", "was") and lines[0].right == ("to", "begin")
+    assert lines[1].right == ("of", "course")
+    assert lines[2].left == ("the",) and lines[2].keyword == "dead"
+    assert "Scrooge knew he was dead"[lines[1].offset:].startswith("dead")
+    assert shelf.concordance("unknown") == []
+
+
+def test_book_corpus_matches_spine_text():
+    with open('test_book.epub', 'rb') as f:
+        book = Book(f.read())
+    corpus = book.corpus()
+    tokens = [token for _, text in iter_spine_text(book) for token in tokenize(text)]
+    assert len(corpus) == len(tokens)
+    assert corpus.frequencies()[corpus.term_id("scrooge")] == tokens.count("scrooge")
+    assert len(corpus.chapters) == len(book.spine)
+
+
+def test_missing_numpy_raises(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    with pytest.raises(ImpositionError, match="requires NumPy"):
+        Corpus.from_books([])
@@ -0,0 +1,183 @@
+import base64
+import random
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from imposition.annotations import (
+    ANNOTATION_COLOR_ATTRIBUTE,
+    ANNOTATION_IDS_ATTRIBUTE,
+    Annotation,
+    AnnotationStore,
+    IntervalIndex,
+    apply_highlights,
+)
+from imposition.book import Book
+from imposition.rendition import Rendition
+from imposition.text import XHTML_NAMESPACE, element_text
+from tests.mocks import CONTAINER_XML, MockDOMAdapter, create_epub_bytes
+
+CHAPTER = (
+    '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Ignored</title></head>'
+    '<body>\n  <p>The  quick <em>brown</em>\n fox</p>\n'
+    '<!-- note --><p>jumps over</p>\n</body></html>'
+)
+
+OPF = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+  <metadata/>
+  <manifest>
+    <item id="chapter1" href="chapter1.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="chapter1"/>
+  </spine>
+</package>
+"""
+
+
+def annotate(text, phrase, id, href="OEBPS/chapter1.xhtml", **kwargs):
+    start = text.index(phrase)
+    return Annotation(id, href, start, start + len(phrase), **kwargs)
+
+
+def marks(root):
+    return [
+        (mark.text, mark.get(ANNOTATION_IDS_ATTRIBUTE))
+        for mark in root.iter(f"{{{XHTML_NAMESPACE}}}mark")
+    ]
+
+
+def test_interval_index_matches_linear_scan():
+    generator = random.Random(7)
+    intervals = []
+    for i in range(300):
+        start = generator.randrange(1000)
+        end = start + generator.randrange(1, 80)
+        intervals.append((start, end, Annotation(str(i), "a", 0, 0)))
+    index = IntervalIndex(intervals)
+    for _ in range(200):
+        start = generator.randrange(1100)
+        end = start + generator.randrange(1, 50)
+        expected = {item.id for s, e, item in intervals if s < end and start < e}
+        assert {item.id for item in index.overlapping(start, end)} == expected
+    assert IntervalIndex([]).overlapping(0, 10) == []
+
+
+def test_store_queries_per_chapter():
+    store = AnnotationStore([
+        Annotation("a", "one.xhtml", 0, 10),
+        Annotation("b", "one.xhtml", 20, 30),
+        Annotation("c", "two.xhtml", 0, 100),
+    ])
+    assert [a.id for a in store.overlapping("one.xhtml", 5, 25)] == ["a", "b"]
+    assert [a.id for a in store.for_chapter("two.xhtml")] == ["c"]
+    assert store.for_chapter("three.xhtml") == []
+
+    store.add(Annotation("a", "one.xhtml", 40, 50))
+    assert [a.id for a in store.overlapping("one.xhtml", 5, 25)] == ["b"]
+    assert store.remove("b").id == "b"
+    assert store.remove("b") is None
+    assert [a.id for a in store.for_chapter("one.xhtml")] == ["a"]
+    assert len(store) == 2 and "c" in store
+
+
+def test_import_export_round_trip():
+    store = AnnotationStore([
+        Annotation("a", "one.xhtml", 1, 4, note="Note", color="#fc0"),
+    ])
+    copy = AnnotationStore()
+    assert copy.import_records(store.export_records()) == 1
+    assert copy.get("a") == store.get("a")
+    with pytest.raises(ValueError, match="missing"):
+        copy.import_records([{"id": "b", "href": "one.xhtml", "start": 0}])
+    with pytest.raises(ValueError, match="Invalid annotation range"):
+        Annotation("c", "one.xhtml", 5, 2)
+
+
+def test_apply_highlights_uses_normalized_offsets():
+    root = ET.fromstring(CHAPTER)
+    text = element_text(root)
+    assert text == "The quick brown fox jumps over"
+    apply_highlights(root, [
+        annotate(text, "quick brown fox", "a"),
+        annotate(text, "brown fox jumps", "b", color="yellow"),
+    ])
+    # Overlaps are split, never nested, and the text is unchanged
+    assert marks(root) == [
+        ("quick ", "a"),
+        ("brown", "a b"),
+        ("\n fox", "a b"),
+        ("jumps", "b"),
+    ]
+    assert element_text(root) == text
+    colors = [
+        m.get(ANNOTATION_COLOR_ATTRIBUTE)
+        for m in root.iter(f"{{{XHTML_NAMESPACE}}}mark")
+    ]
+    assert colors == [None, "yellow", "yellow", "yellow"]
+
+
+def test_apply_highlights_clamps_out_of_range_offsets():
+    root = ET.fromstring(CHAPTER)
+    apply_highlights(root, [
+        Annotation("a", "x", 26, 500),
+        Annotation("b", "x", 600, 700),
+    ])
+    assert marks(root) == [("over", "a")]
+
+
+def test_apply_highlights_across_adjacent_blocks():
+    root = ET.fromstring(
+        '<html xmlns="http://www.w3.org/1999/xhtml">'
+        '<body><p>one two</p><p>three</p></body></html>'
+    )
+    text = element_text(root)
+    assert text == "one two three"
+    apply_highlights(root, [annotate(text, "two three", "a")])
+    assert marks(root) == [("two", "a"), ("three", "a")]
+    assert element_text(root) == text
+
+
+def test_rendition_highlights_annotations():
+    book = Book(create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': OPF,
+        'OEBPS/chapter1.xhtml': CHAPTER,
+    }))
+    store = AnnotationStore([annotate("The quick brown fox jumps over", "jumps", "a")])
+    rendition = Rendition(book, MockDOMAdapter(), "viewer", annotations=store)
+    assert rendition.pipeline.transforms[0].name == "highlight-annotations"
+    rendition.display()
+    html = base64.b64decode(rendition.iframe.src.split(',', 1)[1]).decode()
+    assert (
+        '<mark class="imposition-highlight" data-annotation-ids="a">jumps</mark> over'
+    ) in html
+
+
+def test_highlight_colors_survive_default_style_stripping():
+    book = Book(create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': OPF,
+        'OEBPS/chapter1.xhtml': CHAPTER,
+    }))
+    store = AnnotationStore([
+        annotate("The quick brown fox jumps over", "quick", "a", color="#fc0"),
+        annotate("The quick brown fox jumps over", "over", "b", color="red;}body{x:y"),
+    ])
+    rendition = Rendition(book, MockDOMAdapter(), "viewer", annotations=store)
+    assert rendition.pipeline.get("strip-inline-styles") is not None
+    rendition.display()
+    html = base64.b64decode(rendition.iframe.src.split(',', 1)[1]).decode()
+    assert (
+        '<mark class="imposition-highlight" data-annotation-ids="a" '
+        'data-annotation-color="#fc0">'
+    ) in html
+    assert (
+        'mark.imposition-highlight[data-annotation-color="#fc0"] '
+        '{ background-color: #fc0; }'
+    ) in html
+    # Values that are not plain colors never reach the style rules
+    assert "body{x:y" not in html.split("<body", 1)[0]
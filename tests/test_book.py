@@ -1,8 +1,8 @@
+import asyncio
 import pytest
 from imposition.book import Book
 from imposition.exceptions import InvalidEpubError, MissingContainerError
-import io
-import zipfile
+from tests.mocks import create_epub_bytes
 
 @pytest.fixture
 def book():
@@ -22,14 +22,6 @@ def test_parse_spine(book):
     assert len(book.spine) > 0
     assert all(isinstance(item, str) for item in book.spine)
 
-def create_epub_bytes(files):
-    """Creates an in-memory EPUB file (zip archive) from a dictionary of files."""
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-        for path, content in files.items():
-            zip_file.writestr(path, content)
-    return zip_buffer.getvalue()
-
 def test_invalid_zip_file():
     with pytest.raises(InvalidEpubError, match="not a valid ZIP archive"):
         Book(b"this is not a zip file")
@@ -129,3 +121,26 @@ def test_invalid_mimetype_content():
     epub_bytes = create_epub_bytes({'mimetype': 'text/plain'})
     with pytest.raises(InvalidEpubError, match="Invalid mimetype: text/plain"):
         Book(epub_bytes)
+
+def test_open_async():
+    with open('test_book.epub', 'rb') as f:
+        epub_bytes = f.read()
+    book = asyncio.run(Book.open(epub_bytes))
+    expected = Book(epub_bytes)
+    assert book.spine == expected.spine
+    assert book.toc == expected.toc
+    assert book.metadata == expected.metadata
+
+def test_open_async_raises():
+    with pytest.raises(InvalidEpubError, match="not a valid ZIP archive"):
+        asyncio.run(Book.open(b"this is not a zip file"))
+
+def test_close():
+    with open('test_book.epub', 'rb') as f:
+        epub_bytes = f.read()
+    with Book(epub_bytes) as book:
+        chapter = book.zip_file.read(book.spine[0])
+    assert chapter
+    with pytest.raises(ValueError):
+        book.zip_file.read(book.spine[0])
+    book.close()
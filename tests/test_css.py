@@ -0,0 +1,198 @@
+import base64
+import re
+from unittest.mock import patch
+
+import pytest
+
+from imposition.book import Book
+from imposition.css import filter_declarations, parse_stylesheet, process_css
+from imposition.exceptions import InvalidEpubError
+from imposition.rendition import Rendition
+from tests.mocks import CONTAINER_XML, MockDOMAdapter, create_epub_bytes
+
+OPF = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+  <metadata/>
+  <manifest>
+    <item id="chapter1" href="text/chapter1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="chapter2" href="text/chapter2.xhtml" media-type="application/xhtml+xml"/>
+    <item id="style" href="styles/book.css" media-type="text/css"/>
+    <item id="poetry" href="styles/poetry.css" media-type="text/css"/>
+    <item id="font" href="fonts/serif.woff" media-type="font/woff"/>
+  </manifest>
+  <spine>
+    <itemref idref="chapter1"/>
+    <itemref idref="chapter2"/>
+  </spine>
+</package>
+"""
+
+CHAPTER = """<html xmlns="http://www.w3.org/1999/xhtml"><head>
+<link rel="stylesheet" type="text/css" href="../styles/book.css"/>
+<style>p.verse { background: url(../fonts/serif.woff); }</style>
+</head><body>
+<p class="verse" style="color: red; margin-left: 2em">Line</p>
+</body></html>
+"""
+
+BOOK_CSS = """@charset "utf-8";
+/* Shared styles */
+@import url("poetry.css") print;
+@font-face { font-family: "Serif"; src: url(../fonts/serif.woff) format("woff"); }
+body { margin: 0 5%; font-family: "Serif"; }
+table td { border: 1px solid; color: black; }
+@media (min-width: 40em) { p { font-family: serif; text-indent: 1em; } }
+"""
+
+POETRY_CSS = """@import "book.css";
+.verse { margin-left: 2em; }
+"""
+
+
+@pytest.fixture
+def book():
+    return Book(create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': OPF,
+        'OEBPS/text/chapter1.xhtml': CHAPTER,
+        'OEBPS/text/chapter2.xhtml': CHAPTER,
+        'OEBPS/styles/book.css': BOOK_CSS,
+        'OEBPS/styles/poetry.css': POETRY_CSS,
+        'OEBPS/fonts/serif.woff': b'wOFF',
+    }))
+
+
+def test_parse_stylesheet_resolves_references():
+    stylesheet = parse_stylesheet(
+        "OEBPS/styles/a.css",
+        "/* note */ h1 { background: url('../img/a.png'); } "
+        "p { background: url(data:image/png;base64,AAAA); } "
+        "li { background: url(https://example.com/b.png); }",
+    )
+    assert "note" not in stylesheet.text
+    assert 'url("OEBPS/img/a.png")' in stylesheet.text
+    assert "url(data:image/png;base64,AAAA)" in stylesheet.text
+    assert "url(https://example.com/b.png)" in stylesheet.text
+    assert stylesheet.references == {"OEBPS/img/a.png"}
+
+
+def test_imported_references_resolve_against_imported_sheet():
+    imported = parse_stylesheet(
+        "OEBPS/styles/x.css",
+        '@font-face { font-family: "A"; src: url(../fonts/a.ttf); }',
+    )
+    stylesheet = parse_stylesheet(
+        "OEBPS/css/main.css",
+        '@import "../styles/x.css"; p { background: url(../img/p.png); }',
+        lambda path: imported if path == "OEBPS/styles/x.css" else None,
+    )
+    assert 'url("OEBPS/fonts/a.ttf")' in stylesheet.text
+    assert 'url("OEBPS/img/p.png")' in stylesheet.text
+    assert stylesheet.references == {"OEBPS/fonts/a.ttf", "OEBPS/img/p.png"}
+
+
+def test_book_parses_each_stylesheet_once(book):
+    original_read = book.zip_file.read
+    with patch.object(book.zip_file, 'read', side_effect=original_read) as read:
+        first = book.stylesheet("OEBPS/styles/book.css")
+        assert book.stylesheet("OEBPS/styles/book.css") is first
+    read_paths = [call.args[0] for call in read.call_args_list]
+    assert read_paths == ["OEBPS/styles/book.css", "OEBPS/styles/poetry.css"]
+
+    # The import is inlined, and the import cycle back to book.css dropped
+    assert "@charset" not in first.text
+    assert "@media print {" in first.text
+    assert ".verse { margin-left: 2em; }" in first.text
+    assert first.references == {"OEBPS/fonts/serif.woff"}
+
+
+def test_missing_stylesheet(book):
+    with pytest.raises(InvalidEpubError, match="Stylesheet not found"):
+        book.stylesheet("OEBPS/styles/missing.css")
+
+
+def test_process_css_scopes_and_filters():
+    css = (
+        'html, body.tei { margin: 0; }\n'
+        'td, :is(th, td) em { color: black; border: 0; }\n'
+        '@media print { p { color: gray; } }\n'
+        '@font-face { font-family: "Serif"; src: url("a.woff"); }\n'
+    )
+    processed = process_css(css, scope=".chapter", exclude=["COLOR"])
+    assert ".chapter, .chapter.tei { margin: 0 }" in processed
+    assert ".chapter td, .chapter :is(th, td) em { border: 0 }" in processed
+    assert "@media print {\n.chapter p {}\n}" in processed
+    assert '@font-face { font-family: "Serif"; src: url("a.woff"); }' in processed
+    assert process_css(css) == css
+
+
+def test_filter_declarations():
+    declarations = "background: url(data:image/png;base64,AAAA); color: red"
+    assert filter_declarations(declarations, ["color"]) == (
+        "background: url(data:image/png;base64,AAAA)"
+    )
+
+
+def chapter_html(rendition):
+    return base64.b64decode(rendition.iframe.src.split(',', 1)[1]).decode()
+
+
+def test_publisher_styles_are_stripped_by_default(book):
+    rendition = Rendition(book, MockDOMAdapter(), "viewer")
+    rendition.display()
+    html = chapter_html(rendition)
+    assert 'rel="stylesheet"' not in html
+    assert 'color: red' not in html
+
+
+def test_publisher_styles_attached_by_reference(book):
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(
+        book, dom_adapter, "viewer", paginated=True, publisher_styles=True
+    )
+    rendition.configure_stylesheets(exclude=("font-family",))
+    stylesheets = rendition.stylesheets
+    with patch.object(stylesheets, 'text', wraps=stylesheets.text) as text:
+        rendition.display("OEBPS/text/chapter1.xhtml")
+        first = rendition.iframe.srcdoc
+        rendition.display("OEBPS/text/chapter2.xhtml")
+    assert text.call_count == 1
+
+    assert list(dom_adapter.object_urls) == ["blob:mock/0"]
+    assert 'href="blob:mock/0"' in first
+    assert 'href="blob:mock/0"' in rendition.iframe.srcdoc
+    css, mime_type = dom_adapter.object_urls["blob:mock/0"]
+    assert mime_type == "text/css"
+    css = css.decode()
+    assert re.search(r'src: url\("data:(font/woff|application/font-woff);base64,', css)
+    assert 'font-family: serif' not in css
+    assert 'border: 1px solid' in css
+
+    # Embedded styles are kept, with their references resolved
+    assert 'color: red; margin-left: 2em' in first
+    assert 'url("data:' in first
+
+
+def test_publisher_styles_in_served_mode(book):
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(
+        book, dom_adapter, "viewer", served=True, publisher_styles=True
+    )
+    server = rendition.resource_server
+    handler = dom_adapter.resource_handlers[server.prefix]
+
+    chapter = handler(server.url_for("OEBPS/text/chapter1.xhtml"), None).body.decode()
+    stylesheet_url = server.url_for("OEBPS/styles/book.css")
+    assert f'href="{stylesheet_url}"' in chapter
+
+    resource = handler(stylesheet_url, None)
+    assert resource.headers["Content-Type"] == "text/css; charset=utf-8"
+    font_url = server.url_for("OEBPS/fonts/serif.woff")
+    assert f'url("{font_url}")' in resource.body.decode()
+
+
+def test_configure_without_publisher_styles(book):
+    rendition = Rendition(book, MockDOMAdapter(), "viewer")
+    with pytest.raises(ValueError, match="not enabled"):
+        rendition.configure_stylesheets(scope=".chapter")
@@ -1,5 +1,6 @@
 from playwright.sync_api import Page, expect
 import os
+import re
 import pytest
 
 SCREENSHOT_DIR = "tests/screenshots"
@@ -93,3 +94,31 @@ def test_toc_navigation(page: Page, http_server):
     # Verify buttons state
     expect(page.locator("#prev")).to_be_enabled()
     expect(page.locator("#next")).to_be_enabled()
+
+def test_served_mode_renders_first_chapter(page: Page, http_server):
+    page.goto(f"{http_server}?served")
+
+    frame_locator = page.frame_locator("#viewer iframe")
+    # The cover is fetched through the Service Worker rather than inlined
+    cover = frame_locator.locator("img.x-ebookmaker-cover")
+    expect(cover).to_be_visible(timeout=15000)
+    expect(cover).not_to_have_attribute("src", re.compile(r"^data:"))
+
+# Budgets, in milliseconds, for the startup stages that depend on this
+# package rather than on downloading Pyodide itself.
+IMPORT_BUDGET_MS = 1000
+FIRST_CHAPTER_BUDGET_MS = 5000
+
+def test_cold_start(page: Page, http_server):
+    page.goto(http_server)
+    page.wait_for_function(
+        "window.impositionStartup && 'firstChapter' in window.impositionStartup",
+        timeout=60000,
+    )
+    startup = page.evaluate("window.impositionStartup")
+
+    # The browser bindings and the renderer are not loaded by the core import
+    assert "imposition.dom" not in startup["coreModules"]
+    assert "imposition.rendition" not in startup["coreModules"]
+    assert startup["importCore"] < IMPORT_BUDGET_MS
+    assert startup["importReader"] + startup["firstChapter"] < FIRST_CHAPTER_BUDGET_MS
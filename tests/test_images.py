@@ -0,0 +1,268 @@
+import base64
+import io
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from imposition.book import Book
+from imposition.images import ImageCache, bucket_for, parse_image_size, placeholder_uri
+from imposition.rendition import Rendition
+from imposition.transforms import LAZY_SOURCE_ATTRIBUTE
+from tests.mocks import CONTAINER_XML, MockDOMAdapter, create_epub_bytes
+
+Image = pytest.importorskip("PIL.Image")
+
+OPF = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+  <metadata/>
+  <manifest>
+    <item id="chapter1" href="chapter1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="scan" href="images/scan.jpg" media-type="image/jpeg"/>
+    <item id="icon" href="images/icon.png" media-type="image/png"/>
+  </manifest>
+  <spine>
+    <itemref idref="chapter1"/>
+  </spine>
+</package>
+"""
+
+CHAPTER = """<html xmlns="http://www.w3.org/1999/xhtml"><head></head><body>
+<img src="images/scan.jpg"/><img src="images/icon.png"/>
+</body></html>
+"""
+
+
+def encode_image(size, mode="RGB", format="JPEG"):
+    output = io.BytesIO()
+    Image.new(mode, size, "white").save(output, format=format)
+    return output.getvalue()
+
+
+@pytest.fixture
+def book():
+    return Book(create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': OPF,
+        'OEBPS/chapter1.xhtml': CHAPTER,
+        'OEBPS/images/scan.jpg': encode_image((4000, 3000)),
+        'OEBPS/images/icon.png': encode_image((64, 64), "RGBA", "PNG"),
+    }))
+
+
+def test_bucket_for():
+    assert bucket_for(1) == 320
+    assert bucket_for(640) == 640
+    assert bucket_for(641) == 960
+    assert bucket_for(10000) == 2560
+
+
+def test_variants_are_cached_per_bucket(book):
+    images = ImageCache(book)
+    with patch.object(Image, 'open', wraps=Image.open) as image_open:
+        variant = images.variant("OEBPS/images/scan.jpg", 600)
+        assert images.variant("OEBPS/images/scan.jpg", 500) is variant
+        larger = images.variant("OEBPS/images/scan.jpg", 1000)
+    # The source is decoded once for both buckets
+    assert image_open.call_count == 1
+
+    assert (variant.width, variant.height) == (640, 480)
+    assert variant.media_type == "image/jpeg"
+    assert Image.open(io.BytesIO(variant.data)).size == (640, 480)
+    assert larger.width == 1280
+
+
+def test_small_and_non_raster_images_are_kept(book):
+    images = ImageCache(book)
+    assert images.variant("OEBPS/images/icon.png", 320) is None
+    assert images.variant("OEBPS/chapter1.xhtml", 320) is None
+    assert images.variant("OEBPS/images/missing.png", 320) is None
+    assert images.size("OEBPS/images/icon.png") == (64, 64)
+
+
+def test_sizes_are_read_from_headers(book):
+    images = ImageCache(book)
+    with patch.object(book.zip_file, 'read') as read:
+        with patch.object(Image, 'open') as image_open:
+            assert images.size("OEBPS/images/scan.jpg") == (4000, 3000)
+    read.assert_not_called()
+    image_open.assert_not_called()
+
+
+def test_book_shares_one_cache(book):
+    assert book.images is book.images
+
+
+def test_rendition_embeds_viewport_sized_variant(book):
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(book, dom_adapter, "viewer", downscale_images=True)
+    rendition.display()
+
+    html = base64.b64decode(rendition.iframe.src.split(',', 1)[1]).decode()
+    sources = [part.split('"', 1)[0] for part in html.split('src="')[1:]]
+    scan = Image.open(io.BytesIO(base64.b64decode(sources[0].split(',', 1)[1])))
+    # The mock viewport is 800 pixels wide
+    assert scan.size == (960, 720)
+    assert sources[1].startswith("data:image/png;base64,")
+
+
+def test_variants_account_for_device_pixel_ratio(book):
+    dom_adapter = MockDOMAdapter()
+    dom_adapter.device_pixel_ratio = 2
+    rendition = Rendition(book, dom_adapter, "viewer", downscale_images=True)
+    rendition.display()
+
+    html = base64.b64decode(rendition.iframe.src.split(',', 1)[1]).decode()
+    source = html.split('src="', 1)[1].split('"', 1)[0]
+    scan = Image.open(io.BytesIO(base64.b64decode(source.split(',', 1)[1])))
+    # 800 CSS pixels are 1600 device pixels
+    assert scan.size == (1920, 1440)
+
+
+def test_images_are_not_scaled_for_unknown_viewport(book):
+    dom_adapter = MockDOMAdapter()
+    dom_adapter.get_element_by_id("viewer").clientWidth = 0
+    rendition = Rendition(book, dom_adapter, "viewer", downscale_images=True)
+    with patch.object(book.images, 'variant') as variant:
+        rendition.display()
+    variant.assert_not_called()
+
+    html = base64.b64decode(rendition.iframe.src.split(',', 1)[1]).decode()
+    source = html.split('src="', 1)[1].split('"', 1)[0]
+    scan = Image.open(io.BytesIO(base64.b64decode(source.split(',', 1)[1])))
+    assert scan.size == (4000, 3000)
+
+
+def test_served_rendition_offers_srcset(book):
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(
+        book, dom_adapter, "viewer", served=True, downscale_images=True
+    )
+    server = rendition.resource_server
+    handler = dom_adapter.resource_handlers[server.prefix]
+    rendition.display()
+
+    html = handler(server.url_for("OEBPS/chapter1.xhtml"), None).body.decode()
+    url = server.url_for("OEBPS/images/scan.jpg")
+    assert f'src="{url}?w=960"' in html
+    assert f'{url}?w=320 320w' in html
+    assert f'{url} 4000w' in html
+
+    resource = handler(f"{url}?w=960", None)
+    assert resource.headers["Content-Type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(resource.body)).size == (960, 720)
+    assert handler(f"{url}?w=960", resource.headers["ETag"]).status == 304
+
+
+SERVICE_WORKER = Path(__file__).resolve().parent.parent / "imposition-sw.js"
+
+# Loads imposition-sw.js with a stubbed worker scope, registers a prefix,
+# fetches a URL and prints the message forwarded to the serving page.
+SERVICE_WORKER_HARNESS = """
+const [script, prefix, url] = process.argv.slice(1);
+const listeners = {};
+const client = {
+  postMessage(message, [port]) {
+    console.log(JSON.stringify(message));
+    port.postMessage({status: 200, headers: {}, body: ""});
+  },
+};
+globalThis.self = {
+  location: new URL(url),
+  addEventListener: (type, listener) => { listeners[type] = listener; },
+  skipWaiting() {},
+  clients: {claim: async () => {}, get: async () => client},
+};
+eval(require("fs").readFileSync(script, "utf8"));
+listeners.message({data: {type: "imposition:register", prefix}, source: {id: "page"}});
+listeners.fetch({
+  request: new Request(url),
+  respondWith: (response) => response.then(() => process.exit(0)),
+});
+"""
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="Node.js is not installed")
+def test_service_worker_forwards_width_query(book):
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(
+        book, dom_adapter, "viewer", served=True, downscale_images=True
+    )
+    server = rendition.resource_server
+    url = f"http://reader.test{server.url_for('OEBPS/images/scan.jpg')}?w=320"
+    result = subprocess.run(
+        ["node", "-e", SERVICE_WORKER_HARNESS, str(SERVICE_WORKER), server.prefix, url],
+        capture_output=True, text=True, check=True, timeout=30,
+    )
+    forwarded = json.loads(result.stdout)["url"]
+    assert forwarded.endswith("?w=320")
+
+    resource = dom_adapter.resource_handlers[server.prefix](forwarded, None)
+    assert Image.open(io.BytesIO(resource.body)).size == (320, 240)
+
+
+@pytest.mark.parametrize("format", ["PNG", "GIF", "JPEG", "WEBP", "BMP"])
+def test_parse_image_size(format):
+    assert parse_image_size(encode_image((123, 45), format=format)) == (123, 45)
+    assert parse_image_size(b"not an image") is None
+
+
+def test_lazy_images_are_not_read_on_display(book):
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(
+        book, dom_adapter, "viewer", lazy_images=True, downscale_images=True
+    )
+    with patch.object(book.zip_file, 'read', wraps=book.zip_file.read) as read:
+        rendition.display()
+    assert [call.args[0] for call in read.call_args_list] == ["OEBPS/chapter1.xhtml"]
+
+    # Same-origin document, so that the images can be observed
+    html = rendition.iframe.srcdoc
+    assert f'{LAZY_SOURCE_ATTRIBUTE}="OEBPS/images/scan.jpg"' in html
+    assert placeholder_uri((4000, 3000)) in html
+    assert placeholder_uri((64, 64)) in html
+
+    [(frame, attribute, resolve)] = dom_adapter.lazy_image_observers
+    assert frame is rendition.iframe
+    assert attribute == LAZY_SOURCE_ATTRIBUTE
+    scan_uri = resolve("OEBPS/images/scan.jpg")
+    scan = Image.open(io.BytesIO(base64.b64decode(scan_uri.split(',', 1)[1])))
+    assert scan.size == (960, 720)
+    assert resolve("OEBPS/images/icon.png").startswith("data:image/png;base64,")
+
+
+def test_lazy_images_in_served_mode(book):
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(book, dom_adapter, "viewer", served=True, lazy_images=True)
+    server = rendition.resource_server
+    html = dom_adapter.resource_handlers[server.prefix](
+        server.url_for("OEBPS/chapter1.xhtml"), None
+    ).body.decode()
+    assert 'loading="lazy"' in html
+    assert LAZY_SOURCE_ATTRIBUTE not in html
+    assert dom_adapter.lazy_image_observers == []
+
+
+def test_lazy_images_strip_book_scripts():
+    book = Book(create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': OPF,
+        'OEBPS/chapter1.xhtml': CHAPTER.replace(
+            '<head></head><body>',
+            '<head><script>window.parent.pyodide = null;</script></head>'
+            '<body onload="steal()">',
+        ),
+        'OEBPS/images/scan.jpg': encode_image((4000, 3000)),
+        'OEBPS/images/icon.png': encode_image((64, 64), "RGBA", "PNG"),
+    }))
+    rendition = Rendition(book, MockDOMAdapter(), "viewer", lazy_images=True)
+    rendition.display()
+    html = rendition.iframe.srcdoc
+    assert LAZY_SOURCE_ATTRIBUTE in html
+    assert "<script" not in html
+    assert "steal()" not in html
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = str(Path(__file__).resolve().parent.parent / "src")
+
+# Modules the parsing core must not pull in
+BROWSER_MODULES = ("js", "pyodide", "pyodide.ffi")
+DEFERRED_MODULES = (
+    "asyncio",
+    "concurrent.futures",
+    "http.server",
+    "imposition.dom",
+    "imposition.rendition",
+    "imposition.server",
+    "numpy",
+)
+
+# Generous budget for a cold import of the package, in microseconds; a
+# regression that imports a heavy dependency eagerly exceeds it.
+IMPORT_TIME_BUDGET_US = 400_000
+
+
+def run_python(code, *options):
+    environment = dict(os.environ, PYTHONPATH=SRC)
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True, text=True, check=True, env=environment,
+    )
+
+
+def test_core_imports_without_browser_bindings():
+    result = run_python(
+        "import json, sys\n"
+        "from imposition import Book, ImpositionError\n"
+        "from imposition.transforms import Pipeline\n"
+        f"modules = {BROWSER_MODULES + DEFERRED_MODULES!r}\n"
+        "print(json.dumps([m for m in modules if m in sys.modules]))\n"
+    )
+    assert json.loads(result.stdout) == []
+
+
+def test_rendition_imports_without_browser_bindings():
+    result = run_python(
+        "import json, sys\n"
+        "from imposition import Rendition\n"
+        "from imposition.dom import PyodideDOMAdapter\n"
+        f"print(json.dumps([m for m in {BROWSER_MODULES!r} if m in sys.modules]))\n"
+    )
+    assert json.loads(result.stdout) == []
+
+
+def test_import_time():
+    # -X importtime reports "self [us] | cumulative | module" lines on stderr.
+    result = run_python("import imposition", "-X", "importtime")
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        _, total, name = line.removeprefix("import time:").split("|")
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total)
+    assert cumulative["imposition"] < IMPORT_TIME_BUDGET_US
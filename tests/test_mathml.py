@@ -0,0 +1,175 @@
+import base64
+import xml.etree.ElementTree as ET
+
+from imposition.book import Book
+from imposition.mathml import (
+    MATH_CLASS,
+    MathCache,
+    canonical_mathml,
+    is_math,
+    render_math,
+    unqualify_foreign,
+)
+from imposition.rendition import Rendition
+from imposition.text import XHTML_NAMESPACE
+from tests.mocks import CONTAINER_XML, MockDOMAdapter, create_epub_bytes
+
+CHAPTER1 = (
+    '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:m="http://www.w3.org/1998/Math/MathML">'
+    '<head><title>One</title></head><body>'
+    '<p>Let <m:math id="f1" alttext="x squared">'
+    '<m:msup><m:mi>x</m:mi><m:mn>2</m:mn></m:msup></m:math> hold.</p>'
+    '<math xmlns="http://www.w3.org/1998/Math/MathML" display="block"><mi>y</mi></math>'
+    '</body></html>'
+)
+
+CHAPTER2 = (
+    '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Two</title></head><body>'
+    '<p>Again <math><msup>\n  <mi> x </mi>\n  <mn>2</mn>\n</msup></math>.</p>'
+    '</body></html>'
+)
+
+OPF = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+  <metadata/>
+  <manifest>
+    <item id="chapter1" href="chapter1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="chapter2" href="chapter2.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="chapter1"/>
+    <itemref idref="chapter2"/>
+  </spine>
+</package>
+"""
+
+
+class CountingRenderer:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, source, display):
+        self.calls.append((source, display))
+        if self.fail:
+            return None
+        return f'<svg xmlns="http://www.w3.org/2000/svg" width="{len(self.calls)}"/>'
+
+
+def create_book():
+    return Book(create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': OPF,
+        'OEBPS/chapter1.xhtml': CHAPTER1,
+        'OEBPS/chapter2.xhtml': CHAPTER2,
+    }))
+
+
+def formulas(html):
+    root = ET.fromstring(html)
+    return [element for element in root.iter() if is_math(element)]
+
+
+def test_canonical_mathml_ignores_prefixes_ids_and_whitespace():
+    prefixed, block = formulas(CHAPTER1)
+    (unprefixed,) = formulas(CHAPTER2)
+    assert canonical_mathml(prefixed) == canonical_mathml(unprefixed) == (
+        '<math xmlns="http://www.w3.org/1998/Math/MathML"><msup><mi>x</mi><mn>2</mn></msup></math>'
+    )
+    assert canonical_mathml(block) == (
+        '<math xmlns="http://www.w3.org/1998/Math/MathML" display="block">'
+        '<mi>y</mi></math>'
+    )
+
+
+def test_cache_renders_each_formula_once(tmp_path):
+    renderer = CountingRenderer()
+    cache = MathCache(renderer, directory=str(tmp_path))
+    assert cache.render("<math/>") == cache.render("<math/>")
+    assert cache.render("<math/>", display=True) is not None
+    assert len(renderer.calls) == 2
+
+    # A new session finds the stored renderings
+    restarted = CountingRenderer()
+    reopened = MathCache(restarted, directory=str(tmp_path))
+    assert reopened.render("<math/>") == cache.render("<math/>")
+    assert restarted.calls == []
+    # Renderings of another renderer version are not reused
+    assert MathCache(restarted, directory=str(tmp_path), version="2").render("<math/>")
+    assert len(restarted.calls) == 1
+
+
+def test_cache_evicts_least_recently_used():
+    renderer = CountingRenderer()
+    cache = MathCache(renderer, maxsize=1)
+    cache.render("<math>a</math>")
+    cache.render("<math>b</math>")
+    cache.render("<math>a</math>")
+    assert len(renderer.calls) == 3
+
+
+def test_render_math_replaces_formula_in_place():
+    root = ET.fromstring(CHAPTER1)
+    element = next(e for e in root.iter() if is_math(e))
+    assert render_math(element, MathCache(CountingRenderer()))
+    assert element.tag == f"{{{XHTML_NAMESPACE}}}span"
+    assert element.get("class") == MATH_CLASS
+    assert element.get("id") == "f1"
+    assert element.get("aria-label") == "x squared"
+    assert element.tail == " hold."
+    assert element[0].tag == "svg"
+    assert element[0].get("xmlns") == "http://www.w3.org/2000/svg"
+
+
+def test_unrendered_formulas_are_kept():
+    root = ET.fromstring(CHAPTER2)
+    element = next(e for e in root.iter() if is_math(e))
+    assert not render_math(element, MathCache(CountingRenderer(fail=True)))
+    assert not render_math(element, MathCache(lambda source, display: "<unclosed>"))
+    assert is_math(element) and len(element) == 1
+
+
+def test_rendition_reuses_formulas_across_chapters():
+    renderer = CountingRenderer()
+    cache = MathCache(renderer)
+    rendition = Rendition(create_book(), MockDOMAdapter(), "viewer", math_cache=cache)
+    rendition.display()
+    html = base64.b64decode(rendition.iframe.src.split(',', 1)[1]).decode()
+    assert f'<div class="{MATH_CLASS}" role="math">' in html
+    assert '<svg xmlns="http://www.w3.org/2000/svg" width="2"></svg>' in html
+    assert "ns1:" not in html
+    assert "MathML" not in html
+
+    rendition.next_chapter()
+    assert len(renderer.calls) == 2
+    assert [display for _, display in renderer.calls] == [False, True]
+
+    # Another book sharing the cache renders nothing new
+    other = Rendition(create_book(), MockDOMAdapter(), "viewer", math_cache=cache)
+    other.display()
+    assert len(renderer.calls) == 2
+
+
+def test_unrendered_formulas_are_written_without_prefixes():
+    cache = MathCache(CountingRenderer(fail=True))
+    rendition = Rendition(create_book(), MockDOMAdapter(), "viewer", math_cache=cache)
+    rendition.display()
+    html = base64.b64decode(rendition.iframe.src.split(',', 1)[1]).decode()
+    assert (
+        '<math xmlns="http://www.w3.org/1998/Math/MathML" id="f1" '
+        'alttext="x squared"><msup><mi>x</mi>'
+    ) in html
+    assert "ns1:" not in html
+
+
+def test_unqualify_foreign_keeps_xlink_prefix():
+    root = ET.fromstring(
+        f'<p xmlns="{XHTML_NAMESPACE}" xmlns:s="http://www.w3.org/2000/svg"'
+        ' xmlns:xl="http://www.w3.org/1999/xlink">'
+        '<s:svg><s:use xl:href="#a"/></s:svg></p>'
+    )
+    unqualify_foreign(root)
+    svg = root[0]
+    assert svg.tag == "svg" and svg.get("xmlns") == "http://www.w3.org/2000/svg"
+    assert svg[0].tag == "use" and svg[0].attrib == {"xlink:href": "#a"}
@@ -0,0 +1,151 @@
+import io
+import zipfile
+from unittest.mock import patch
+
+import pytest
+
+from imposition.book import Book
+from imposition.exceptions import MissingContainerError
+from imposition.metadata import MetadataCache
+from tests.mocks import CONTAINER_XML, create_epub_bytes
+
+EPUB3_OPF = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="uid" version="3.0">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier id="isbn">978-0000000000</dc:identifier>
+    <dc:identifier id="uid">urn:uuid:1234</dc:identifier>
+    <dc:title>Sample Book</dc:title>
+    <dc:creator>Jane Doe</dc:creator>
+    <dc:creator>John Roe</dc:creator>
+    <dc:language>fr</dc:language>
+  </metadata>
+  <manifest>
+    <item id="img" href="images/front.png" media-type="image/png"
+          properties="cover-image"/>
+    <item id="chapter1" href="chapter1.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="chapter1"/>
+  </spine>
+</package>
+"""
+
+
+def create_png(size):
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new("RGB", size, "red").save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.fixture
+def epub_bytes():
+    with open('test_book.epub', 'rb') as f:
+        return f.read()
+
+
+def test_epub2_metadata(epub_bytes):
+    metadata = MetadataCache().metadata(epub_bytes)
+    assert metadata.title == (
+        "A Christmas Carol in Prose; Being a Ghost Story of Christmas"
+    )
+    assert metadata.author == "Charles Dickens"
+    assert metadata.language == "en"
+    assert metadata.identifier == "http://www.gutenberg.org/46"
+    assert metadata.cover_path == "OEBPS/8661774071916088455_cover.jpg"
+    assert metadata.cover_media_type == "image/jpeg"
+
+
+def test_epub3_metadata():
+    epub_bytes = create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': EPUB3_OPF,
+    })
+    metadata = MetadataCache().metadata(epub_bytes)
+    assert metadata.title == "Sample Book"
+    assert metadata.creators == ("Jane Doe", "John Roe")
+    assert metadata.language == "fr"
+    assert metadata.identifier == "urn:uuid:1234"
+    assert metadata.cover_path == "OEBPS/images/front.png"
+
+
+def test_metadata_does_not_read_chapters(epub_bytes):
+    """The metadata path must not touch the spine, TOC or chapter files."""
+    read_paths = []
+    original_read = zipfile.ZipFile.read
+
+    def tracking_read(self, name, *args, **kwargs):
+        read_paths.append(name)
+        return original_read(self, name, *args, **kwargs)
+
+    with patch.object(zipfile.ZipFile, 'read', tracking_read):
+        MetadataCache().metadata(epub_bytes)
+    assert read_paths == ['mimetype', 'META-INF/container.xml', 'OEBPS/content.opf']
+
+
+def test_metadata_is_memoized_by_content(epub_bytes):
+    cache = MetadataCache()
+    first = cache.metadata(epub_bytes)
+    with patch('imposition.metadata.read_opf') as mock_read_opf:
+        assert cache.metadata(bytes(epub_bytes)) is first
+    mock_read_opf.assert_not_called()
+
+
+def test_cache_evicts_least_recently_used(epub_bytes):
+    other_bytes = create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': EPUB3_OPF,
+    })
+    cache = MetadataCache(maxsize=1)
+    cache.metadata(epub_bytes)
+    cache.metadata(other_bytes)
+    assert len(cache._metadata) == 1
+
+
+def test_invalid_epub_raises():
+    with pytest.raises(MissingContainerError):
+        epub_bytes = create_epub_bytes({'mimetype': 'application/epub+zip'})
+        MetadataCache().metadata(epub_bytes)
+
+
+def test_book_metadata(epub_bytes):
+    book = Book(epub_bytes)
+    assert book.metadata.author == "Charles Dickens"
+    assert book.metadata is book.metadata
+
+
+def test_thumbnail(epub_bytes):
+    Image = pytest.importorskip("PIL.Image")
+    thumbnail = MetadataCache().thumbnail(epub_bytes, (100, 150))
+    assert thumbnail is not None
+    image = Image.open(io.BytesIO(thumbnail))
+    assert image.format == "JPEG"
+    assert image.width <= 100 and image.height <= 150
+
+
+def test_thumbnail_is_memoized():
+    pytest.importorskip("PIL")
+    epub_bytes = create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': EPUB3_OPF,
+        'OEBPS/images/front.png': create_png((400, 600)),
+    })
+    cache = MetadataCache()
+    first = cache.thumbnail(epub_bytes)
+    with patch('imposition.metadata.make_thumbnail') as mock_make_thumbnail:
+        assert cache.thumbnail(epub_bytes) == first
+    mock_make_thumbnail.assert_not_called()
+
+
+def test_thumbnail_without_cover():
+    opf = EPUB3_OPF.replace(' properties="cover-image"', '')
+    epub_bytes = create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': opf,
+    })
+    assert MetadataCache().thumbnail(epub_bytes) is None
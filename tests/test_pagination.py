@@ -0,0 +1,211 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from imposition.book import Book
+from imposition.pagination import Paginator
+from imposition.rendition import Rendition
+from tests.mocks import MockDOMAdapter
+
+
+@pytest.fixture
+def mock_book():
+    """Fixture to create a mock Book object."""
+    book = MagicMock(spec=Book)
+    book.toc = [
+        {"title": "Chapter 1", "url": "OEBPS/chapter1.xhtml"},
+        {"title": "Chapter 2", "url": "OEBPS/chapter2.xhtml"},
+    ]
+    book.spine = ["OEBPS/chapter1.xhtml", "OEBPS/chapter2.xhtml"]
+    book.spine_index = {href: i for i, href in enumerate(book.spine)}
+    book.zip_file = MagicMock()
+    book.zip_file.read.return_value = (
+        b'<html xmlns="http://www.w3.org/1999/xhtml"><head></head>'
+        b'<body><p>Test</p></body></html>'
+    )
+    return book
+
+
+@pytest.fixture
+def mock_dom_adapter():
+    """Fixture to create a MockDOMAdapter instance."""
+    return MockDOMAdapter()
+
+
+@pytest.fixture
+def rendition(mock_book, mock_dom_adapter):
+    """Fixture to create a paginated Rendition whose chapters are 3 pages wide."""
+    rendition = Rendition(mock_book, mock_dom_adapter, "viewer", paginated=True)
+    rendition.iframe.scrollWidth = 2400
+    return rendition
+
+
+def test_page_breaks_are_cached():
+    """Test that page breaks are measured once per layout combination."""
+    paginator = Paginator()
+    measure = MagicMock(return_value=2000)
+
+    breaks = paginator.page_breaks("ch1.xhtml", 800, 600, 16, False, measure)
+    assert breaks == [0, 800, 1600]
+    paginator.page_breaks("ch1.xhtml", 800, 600, 16, False, measure)
+    assert measure.call_count == 1
+
+    paginator.page_breaks("ch1.xhtml", 800, 600, 20, False, measure)
+    assert measure.call_count == 2
+
+
+def test_page_for_offset():
+    """Test that offsets are mapped to the page containing them."""
+    breaks = [0, 800, 1600]
+    assert Paginator.page_for_offset(breaks, 0) == 0
+    assert Paginator.page_for_offset(breaks, 799) == 0
+    assert Paginator.page_for_offset(breaks, 800) == 1
+    assert Paginator.page_for_offset(breaks, 5000) == 2
+
+
+def test_layout_css_spread_halves_columns():
+    """Test that a spread lays out two columns per viewport."""
+    assert "column-width: 800px" in Paginator.layout_css(800, 600, 16, False)
+    assert "column-width: 400px" in Paginator.layout_css(800, 600, 16, True)
+
+
+def test_paginated_display_uses_srcdoc(rendition):
+    """Test that paginated chapters are loaded into a same-origin frame."""
+    rendition.display()
+    assert rendition.iframe.src == ""
+    assert "column-width: 800px" in rendition.iframe.srcdoc
+    assert "font-size: 16px" in rendition.iframe.srcdoc
+
+
+def test_frame_load_computes_page_breaks(rendition):
+    """Test that loading a chapter measures it and shows its first page."""
+    rendition.display()
+    rendition.iframe.onload()
+    assert rendition.page_breaks == [0, 800, 1600]
+    assert rendition.current_page == 0
+    assert rendition.iframe.scroll_position == (0, 0)
+
+
+def test_frame_load_measures_loaded_chapter(rendition):
+    """Test that a load during a pending navigation measures the loaded chapter."""
+    rendition.display()
+    navigation = rendition.display_async("OEBPS/chapter2.xhtml")
+    navigation.send(None)  # Suspended before the new chapter is shown
+    assert rendition.current_chapter_index == 1
+    rendition.iframe.onload()
+    navigation.close()
+    assert [key[0] for key in rendition.paginator._cache] == ["OEBPS/chapter1.xhtml"]
+
+    rendition.loaded_chapter = None
+    rendition.page_breaks = []
+    rendition.iframe.onload()
+    assert rendition.page_breaks == []
+
+
+def test_page_turns_do_not_redisplay(rendition, mock_dom_adapter):
+    """Test that turning pages within a chapter only scrolls the frame."""
+    rendition.display()
+    rendition.iframe.onload()
+    with patch.object(rendition, 'display') as mock_display:
+        rendition.next_page()
+        rendition.next_page()
+        assert rendition.current_page == 2
+        assert rendition.iframe.scroll_position == (1600, 0)
+        rendition.previous_page()
+        assert rendition.current_page == 1
+        mock_display.assert_not_called()
+
+
+def test_next_page_at_chapter_end_moves_to_next_chapter(rendition, mock_book):
+    """Test that turning past the last page opens the next chapter."""
+    rendition.display()
+    rendition.iframe.onload()
+    rendition.show_page(2)
+    rendition.next_page()
+    assert rendition.current_chapter_index == 1
+    rendition.iframe.onload()
+    assert rendition.current_page == 0
+
+
+def test_previous_page_at_chapter_start_shows_last_page(rendition):
+    """Test that turning back from a chapter start shows the previous
+    chapter's last page."""
+    rendition.display("OEBPS/chapter2.xhtml")
+    rendition.iframe.onload()
+    rendition.previous_page()
+    assert rendition.current_chapter_index == 0
+    rendition.iframe.onload()
+    assert rendition.current_page == 2
+
+
+def test_anchor_opens_page_containing_it(rendition):
+    """Test that an anchor is resolved to the page that contains it."""
+    rendition.iframe.anchor_offsets["section2"] = 1700
+    rendition.display("OEBPS/chapter1.xhtml#section2")
+    rendition.iframe.onload()
+    assert rendition.current_page == 2
+
+
+def test_anchor_in_loaded_chapter_turns_page(rendition, mock_book):
+    """Test that an anchor in the loaded chapter is reached without reloading it."""
+    rendition.iframe.anchor_offsets["section2"] = 900
+    rendition.display("OEBPS/chapter1.xhtml")
+    rendition.iframe.onload()
+    srcdoc = rendition.iframe.srcdoc
+
+    rendition.display("OEBPS/chapter1.xhtml#section2")
+
+    assert mock_book.zip_file.read.call_count == 1
+    assert rendition.iframe.srcdoc == srcdoc
+    assert rendition.current_page == 1
+    assert rendition.iframe.scroll_position == (800, 0)
+
+
+def test_revisiting_a_chapter_reuses_page_breaks(rendition):
+    """Test that a chapter is only measured once for the same layout."""
+    rendition.display()
+    rendition.iframe.onload()
+    rendition.iframe.scrollWidth = 4000
+    rendition.display("OEBPS/chapter2.xhtml")
+    rendition.iframe.onload()
+    rendition.display("OEBPS/chapter1.xhtml")
+    rendition.iframe.onload()
+    assert rendition.page_breaks == [0, 800, 1600]
+
+
+def test_set_font_size_keeps_relative_position(rendition):
+    """Test that changing the font size re-lays out at the same position."""
+    rendition.display()
+    rendition.iframe.onload()
+    rendition.show_page(1)
+    rendition.iframe.scrollWidth = 4800
+    rendition.set_font_size(32)
+    assert "font-size: 32px" in rendition.iframe.srcdoc
+    rendition.iframe.onload()
+    assert len(rendition.page_breaks) == 6
+    assert rendition.current_page == 2
+
+
+def test_paginated_controls(rendition, mock_dom_adapter):
+    """Test that controls account for pages within the chapter."""
+    rendition.setup_controls("prev", "next")
+    rendition.display("OEBPS/chapter2.xhtml")
+    rendition.iframe.onload()
+    next_button = mock_dom_adapter.get_element_by_id("next")
+    assert next_button.disabled is False
+    rendition.show_page(2)
+    assert next_button.disabled is True
+
+
+def test_paginated_display_strips_scripts(rendition, mock_book):
+    """Test that book scripts never run in the same-origin frame."""
+    mock_book.zip_file.read.return_value = (
+        b'<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+        b'<script>window.parent.pyodide = null;</script></head>'
+        b'<body onload="steal()"><p onclick="steal()">Test</p></body></html>'
+    )
+    rendition.display()
+    html = rendition.iframe.srcdoc
+    assert "<script" not in html
+    assert "steal()" not in html
+    assert "<p>Test</p>" in html
@@ -1,8 +1,14 @@
+import gc
+import tracemalloc
+import asyncio
+import base64
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 import xml.etree.ElementTree as ET
 
 import pytest
 
+from imposition.dom import PyodideDOMAdapter
 from imposition.rendition import Rendition
 from imposition.book import Book
 from tests.mocks import MockDOMAdapter
@@ -17,6 +23,7 @@ def mock_book():
         {"title": "Chapter 2", "url": "OEBPS/chapter2.xhtml"},
     ]
     book.spine = ["OEBPS/chapter1.xhtml", "OEBPS/chapter2.xhtml"]
+    book.spine_index = {href: i for i, href in enumerate(book.spine)}
     book.zip_file = MagicMock()
     # Mock the read method to return some basic HTML content
     book.zip_file.read.return_value = b'<html><head></head><body><p>Test</p></body></html>'
@@ -90,6 +97,38 @@ def test_display_with_anchor(mock_book, mock_dom_adapter):
     assert rendition.iframe.onload == "this.contentWindow.location.hash = '#section1'"
 
 
+def test_display_anchor_in_loaded_chapter(mock_book, mock_dom_adapter):
+    """Test that moving to an anchor of the loaded chapter only scrolls the frame."""
+    rendition = Rendition(mock_book, mock_dom_adapter, "viewer")
+    rendition.display("OEBPS/chapter1.xhtml#section1")
+    src = rendition.iframe.src
+
+    rendition.display("OEBPS/chapter1.xhtml#section3")
+
+    mock_book.zip_file.read.assert_called_once_with("OEBPS/chapter1.xhtml")
+    assert rendition.iframe.src == src
+    assert rendition.iframe.scrolled_to_anchor == "section3"
+
+    rendition.display("OEBPS/chapter2.xhtml#section1")
+    assert mock_book.zip_file.read.call_count == 2
+    assert rendition.current_chapter_index == 1
+
+
+def test_pyodide_scroll_to_missing_anchor():
+    """Test that only frames loaded from a URL fall back to the fragment."""
+    adapter = PyodideDOMAdapter()
+    data_frame = SimpleNamespace(contentDocument=None, src="data:text/html,x#a")
+    adapter.scroll_to_anchor(data_frame, "b")
+    assert data_frame.src == "data:text/html,x#b"
+
+    # getElementById finds nothing in the srcdoc document
+    document = MagicMock()
+    document.getElementById.return_value = None
+    srcdoc_frame = SimpleNamespace(contentDocument=document, src="")
+    adapter.scroll_to_anchor(srcdoc_frame, "b")
+    assert srcdoc_frame.src == ""
+
+
 def test_next_chapter(mock_book, mock_dom_adapter):
     """Test navigating to the next chapter."""
     rendition = Rendition(mock_book, mock_dom_adapter, "viewer")
@@ -158,3 +197,160 @@ def test_update_controls_highlighting(mock_book, mock_dom_adapter):
 
     assert rendition.toc_links[0][0].className == ''
     assert rendition.toc_links[1][0].className == 'active'
+
+
+def chapter_content(href):
+    return f'<html><head></head><body><p>{href}</p><p>More</p></body></html>'.encode()
+
+
+def test_display_async_matches_display(mock_book, mock_dom_adapter):
+    """Test that the asynchronous display produces the same document."""
+    rendition = Rendition(mock_book, mock_dom_adapter, "viewer")
+    rendition.display("OEBPS/chapter2.xhtml")
+    src = rendition.iframe.src
+
+    rendition.display("OEBPS/chapter1.xhtml")
+    displayed = rendition.display_async("OEBPS/chapter2.xhtml", chunk_size=1)
+    assert asyncio.run(displayed) is True
+    assert rendition.iframe.src == src
+    assert rendition.loaded_chapter == "OEBPS/chapter2.xhtml"
+
+
+def test_display_async_superseded(mock_book, mock_dom_adapter):
+    """Test that a newer navigation cancels one still in progress."""
+    mock_book.zip_file.read.side_effect = chapter_content
+    rendition = Rendition(mock_book, mock_dom_adapter, "viewer")
+
+    async def navigate():
+        slow = asyncio.ensure_future(
+            rendition.display_async("OEBPS/chapter1.xhtml", chunk_size=1)
+        )
+        await asyncio.sleep(0)
+        fast = rendition.display_async("OEBPS/chapter2.xhtml")
+        return await asyncio.gather(slow, fast)
+
+    assert asyncio.run(navigate()) == [False, True]
+    assert rendition.loaded_chapter == "OEBPS/chapter2.xhtml"
+    assert rendition.current_chapter_index == 1
+
+    async def navigate_synchronously():
+        slow = asyncio.ensure_future(
+            rendition.display_async("OEBPS/chapter2.xhtml", chunk_size=1)
+        )
+        await asyncio.sleep(0)
+        rendition.display("OEBPS/chapter1.xhtml")
+        return await slow
+
+    assert asyncio.run(navigate_synchronously()) is False
+    assert rendition.loaded_chapter == "OEBPS/chapter1.xhtml"
+    html = base64.b64decode(rendition.iframe.src.split(',', 1)[1])
+    assert b"OEBPS/chapter1.xhtml" in html
+
+
+def test_display_toc_async(mock_book, mock_dom_adapter):
+    """Test that the TOC is only attached once it is complete."""
+    rendition = Rendition(mock_book, mock_dom_adapter, "viewer")
+    toc_container = mock_dom_adapter.get_element_by_id("toc")
+
+    async def build():
+        first = asyncio.ensure_future(rendition.display_toc_async(chunk_size=1))
+        await asyncio.sleep(0)
+        assert toc_container.children == []
+        return await asyncio.gather(first, rendition.display_toc_async())
+
+    assert asyncio.run(build()) == [False, True]
+    assert len(toc_container.children) == 2
+    assert len(toc_container.children[1].children) == len(mock_book.toc)
+    assert len(rendition.toc_links) == len(mock_book.toc)
+
+
+def test_toc_and_controls_release_replaced_proxies(mock_book, mock_dom_adapter):
+    """Test that rebuilding the TOC or controls does not accumulate proxies."""
+    rendition = Rendition(mock_book, mock_dom_adapter, "viewer")
+    rendition.display_toc()
+    rendition.setup_controls("prev", "next")
+    live = list(mock_dom_adapter.proxies)
+    assert len(live) == len(mock_book.toc) + 2
+
+    rendition.display_toc()
+    rendition.setup_controls("prev", "next")
+    assert len(mock_dom_adapter.proxies) == len(live)
+    assert not any(
+        any(proxy is old for old in live) for proxy in mock_dom_adapter.proxies
+    )
+
+    # A superseded asynchronous build destroys its own handlers
+    async def build():
+        first = asyncio.ensure_future(rendition.display_toc_async(chunk_size=1))
+        await asyncio.sleep(0)
+        return await asyncio.gather(first, rendition.display_toc_async())
+
+    asyncio.run(build())
+    assert len(mock_dom_adapter.proxies) == len(live)
+
+
+def test_close(mock_book, mock_dom_adapter):
+    """Test that closing releases everything registered with the adapter."""
+    mock_book.zip_file.read.side_effect = None
+    with Rendition(
+        mock_book, mock_dom_adapter, "viewer", paginated=True, lazy_images=True
+    ) as rendition:
+        stylesheet_url = mock_dom_adapter.create_object_url(b"p {}", "text/css")
+        rendition._object_urls.append(stylesheet_url)
+        rendition.display_toc()
+        rendition.setup_controls("prev", "next")
+        rendition.display()
+        assert mock_dom_adapter.proxies
+        assert mock_dom_adapter.message_listeners
+    assert mock_dom_adapter.proxies == []
+    assert mock_dom_adapter.message_listeners == []
+    assert mock_dom_adapter.lazy_image_observers == []
+    assert mock_dom_adapter.object_urls == {}
+    assert rendition.iframe.srcdoc == ''
+    assert rendition.target_element.innerHTML == ''
+    assert rendition.loaded_chapter is None
+    rendition.close()
+
+
+def test_served_rendition_close_stops_serving():
+    """Test that a closed served rendition no longer answers requests."""
+    with open('test_book.epub', 'rb') as f:
+        book = Book(f.read())
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(book, dom_adapter, "viewer", served=True)
+    assert list(dom_adapter.resource_handlers) == [rendition.resource_server.prefix]
+    rendition.close()
+    assert dom_adapter.resource_handlers == {}
+
+
+def test_memory_is_steady_across_sessions():
+    """Test that repeatedly opening, displaying and closing books does not leak."""
+    with open('test_book.epub', 'rb') as f:
+        epub_bytes = f.read()
+    # One adapter for the whole page, as in the browser
+    dom_adapter = MockDOMAdapter()
+
+    def session():
+        with Book(epub_bytes) as book:
+            with Rendition(book, dom_adapter, "viewer") as rendition:
+                rendition.display_toc()
+                rendition.setup_controls("prev", "next")
+                for href in book.spine[:3]:
+                    rendition.display(href)
+
+    for _ in range(3):
+        session()  # Warm up caches of the standard library
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.take_snapshot()
+        for _ in range(20):
+            session()
+        gc.collect()
+        statistics = tracemalloc.take_snapshot().compare_to(baseline, 'filename')
+        growth = sum(stat.size_diff for stat in statistics)
+    finally:
+        tracemalloc.stop()
+    assert dom_adapter.proxies == []
+    assert dom_adapter.message_listeners == []
+    assert growth < 64 * 1024
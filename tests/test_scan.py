@@ -0,0 +1,88 @@
+import shutil
+
+import pytest
+
+from imposition.exceptions import (
+    ImpositionError,
+    InvalidEpubError,
+    MissingContainerError,
+)
+from imposition.scan import scan_file, scan_library
+from tests.mocks import corrupt_member, create_epub_bytes
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Fixture to create a directory with valid and invalid EPUB files."""
+    shutil.copy('test_book.epub', tmp_path / 'carol.epub')
+    shutil.copy('test_book.epub', tmp_path / 'carol-copy.epub')
+    (tmp_path / 'not-a-zip.epub').write_bytes(b'this is not a zip file')
+    (tmp_path / 'no-container.epub').write_bytes(
+        create_epub_bytes({'mimetype': 'application/epub+zip'})
+    )
+    return tmp_path
+
+
+def test_scan_file(library):
+    result = scan_file(library / 'carol.epub')
+    assert result.ok
+    assert result.path == str(library / 'carol.epub')
+    assert result.metadata.author == "Charles Dickens"
+    assert len(result.spine) == 6
+    assert len(result.toc) == 24
+    assert result.index['scrooge'] == [1, 2, 3, 4]
+
+
+def test_scan_file_without_index(library):
+    result = scan_file(library / 'carol.epub', build_index=False)
+    assert result.ok
+    assert result.index == {}
+
+
+def test_scan_file_reports_errors(library):
+    result = scan_file(library / 'no-container.epub')
+    assert not result.ok
+    assert isinstance(result.error, MissingContainerError)
+
+    result = scan_file(library / 'not-a-zip.epub')
+    assert isinstance(result.error, InvalidEpubError)
+
+
+def test_scan_file_reports_unreadable_path(library):
+    result = scan_file(library / 'missing.epub')
+    assert not result.ok
+    assert "Could not read file" in str(result.error)
+
+
+@pytest.mark.parametrize("max_workers", [0, 2])
+def test_scan_library(library, max_workers):
+    paths = sorted(library.iterdir())
+    results = {
+        result.path: result
+        for result in scan_library(iter(paths), max_workers=max_workers)
+    }
+
+    assert set(results) == {str(path) for path in paths}
+    assert results[str(library / 'carol.epub')].ok
+    assert results[str(library / 'carol-copy.epub')].metadata.language == "en"
+    assert isinstance(results[str(library / 'not-a-zip.epub')].error, InvalidEpubError)
+    assert isinstance(
+        results[str(library / 'no-container.epub')].error, MissingContainerError
+    )
+
+
+def test_scan_library_reports_corrupt_members_sequentially(library):
+    corrupt = library / 'corrupt.epub'
+    shutil.copy('test_book.epub', corrupt)
+    corrupt_member(corrupt, 'OEBPS/816934448499000088_46-h-1.htm.html')
+
+    results = {
+        result.path: result
+        for result in scan_library(sorted(library.iterdir()), max_workers=0)
+    }
+    assert len(results) == 5
+    error = results[str(corrupt)].error
+    assert type(error) is ImpositionError
+    assert "Unexpected error scanning file" in str(error)
+    assert error.__cause__ is not None
+    assert results[str(library / 'carol.epub')].ok
@@ -0,0 +1,130 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from imposition.book import Book
+from imposition.rendition import Rendition
+from imposition.server import (
+    IMMUTABLE_CACHE_CONTROL,
+    RESOURCE_PREFIX,
+    ResourceServer,
+    book_key,
+    serve_http,
+)
+from tests.mocks import CONTAINER_XML, MockDOMAdapter, create_epub_bytes
+
+COVER = "OEBPS/8661774071916088455_cover.jpg"
+
+
+@pytest.fixture
+def book():
+    with open('test_book.epub', 'rb') as f:
+        return Book(f.read())
+
+
+@pytest.fixture
+def server(book):
+    return ResourceServer(book)
+
+
+def test_prefix_is_unique_to_the_book(book, server):
+    assert server.prefix == f"{RESOURCE_PREFIX}{book_key(book)}/"
+    other = ResourceServer(book, prefix="/books/1/")
+    assert other.url_for("OEBPS/a b.css") == "/books/1/OEBPS/a%20b.css"
+
+
+def test_resolve(server, book):
+    resource = server.resolve(server.url_for(COVER) + "?v=1")
+    assert resource.status == 200
+    assert resource.body == book.zip_file.read(COVER)
+    assert resource.headers["Content-Type"] == "image/jpeg"
+    assert resource.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+    revalidated = server.resolve(server.url_for(COVER), resource.headers["ETag"])
+    assert revalidated.status == 304
+    assert revalidated.body == b""
+
+
+def test_resolve_missing(server):
+    assert server.resolve(server.url_for("OEBPS/missing.png")).status == 404
+    assert server.resolve("/elsewhere/OEBPS/0.css").status == 404
+
+
+def test_serve_http(server, book):
+    httpd = serve_http(server)
+    try:
+        base = f"http://127.0.0.1:{httpd.server_address[1]}"
+        with urllib.request.urlopen(base + server.url_for("OEBPS/0.css")) as response:
+            assert response.headers["Content-Type"] == "text/css"
+            assert response.read() == book.zip_file.read("OEBPS/0.css")
+            etag = response.headers["ETag"]
+
+        request = urllib.request.Request(
+            base + server.url_for("OEBPS/0.css"), headers={"If-None-Match": etag}
+        )
+        with pytest.raises(urllib.error.HTTPError) as not_modified:
+            urllib.request.urlopen(request)
+        with not_modified.value:
+            assert not_modified.value.code == 304
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_served_rendition(book):
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(book, dom_adapter, "viewer", served=True)
+    server = rendition.resource_server
+    assert server is not None
+    assert server.prefix in dom_adapter.resource_handlers
+    assert rendition.pipeline.get('embed-assets') is None
+
+    chapter = book.spine[0]
+    rendition.display(f"{chapter}#start")
+    assert rendition.iframe.src == server.url_for(chapter) + "#start"
+
+    handler = dom_adapter.resource_handlers[server.prefix]
+    resource = handler(server.url_for(chapter), None)
+    assert resource.status == 200
+    assert resource.headers["Content-Type"] == "text/html; charset=utf-8"
+    html = resource.body.decode()
+    # Media keeps its original relative reference and is fetched separately
+    assert 'src="8661774071916088455_cover.jpg"' in html
+    assert 'data:image' not in html
+
+
+SCRIPTED_OPF = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+  <metadata/>
+  <manifest>
+    <item id="chapter1" href="chapter1.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine>
+    <itemref idref="chapter1"/>
+  </spine>
+</package>
+"""
+
+SCRIPTED_CHAPTER = (
+    '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+    '<script>window.parent.pyodide = null;</script></head>'
+    '<body><p onclick="steal()">Text</p></body></html>'
+)
+
+
+def test_served_chapters_have_no_book_scripts():
+    book = Book(create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': SCRIPTED_OPF,
+        'OEBPS/chapter1.xhtml': SCRIPTED_CHAPTER,
+    }))
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(book, dom_adapter, "viewer", served=True)
+    server = rendition.resource_server
+    handler = dom_adapter.resource_handlers[server.prefix]
+    html = handler(server.url_for("OEBPS/chapter1.xhtml"), None).body.decode()
+    assert "<script" not in html
+    assert "steal()" not in html
+    assert "<p>Text</p>" in html
@@ -0,0 +1,128 @@
+import io
+import xml.etree.ElementTree as ET
+from unittest.mock import MagicMock
+
+import pytest
+
+from imposition.book import Book
+from imposition.exceptions import InvalidEpubError
+from imposition.speech import SpeechIndex, iter_utterances, split_sentences
+from imposition.text import element_text
+
+CHAPTER = (
+    b'<?xml version="1.0" encoding="utf-8"?>\n'
+    b'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Stave One</title>'
+    b'<style>p { margin: 0 }</style></head>\n<body>\n'
+    b'<h1 id="stave">STAVE ONE.</h1>\n'
+    b'<div id="text"><p>Marley was dead:  to begin with. There is no doubt\n'
+    b'whatever about <em>that</em>. Mr. Scrooge signed it!</p>\n'
+    b'<p>Old Marley was as dead as a door-nail.<br/>'
+    b'Mind! I don\xe2\x80\x99t mean to say.</p>'
+    b'<script>var x = 1;</script><p>"Bah," said Scrooge. "Humbug!"</p></div>'
+    b'</body></html>'
+)
+
+
+class CountingReader(io.BytesIO):
+    """A chapter stream that records how many bytes were read."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+@pytest.fixture
+def mock_book():
+    chapters = {
+        "OEBPS/chapter1.xhtml": CHAPTER,
+        "OEBPS/broken.xhtml": b'<html><body><p>One.</p><p>Two',
+    }
+    book = MagicMock(spec=Book)
+    book.spine = ["OEBPS/chapter1.xhtml"]
+    book.zip_file = MagicMock()
+    book.readers = []
+
+    def open_member(path):
+        book.readers.append(CountingReader(chapters[path]))
+        return book.readers[-1]
+
+    book.zip_file.open.side_effect = open_member
+    return book
+
+
+def test_split_sentences():
+    text = 'Mr. J. Smith arrived, i.e. late. "Go!" he said. Then... silence? Yes'
+    assert [text[start:end] for start, end in split_sentences(text)] == [
+        'Mr. J. Smith arrived, i.e. late.',
+        '"Go!" he said.',
+        'Then... silence?',
+        'Yes',
+    ]
+    assert split_sentences("") == []
+
+
+def test_utterances_match_chapter_text(mock_book):
+    utterances = list(iter_utterances(mock_book, "OEBPS/chapter1.xhtml", chunk_size=64))
+    text = element_text(ET.fromstring(CHAPTER))
+    assert [u.text for u in utterances] == [
+        "STAVE ONE.",
+        "Marley was dead: to begin with.",
+        "There is no doubt whatever about that.",
+        "Mr. Scrooge signed it!",
+        "Old Marley was as dead as a door-nail.",
+        "Mind!",
+        "I don’t mean to say.",
+        '"Bah," said Scrooge.',
+        '"Humbug!"',
+    ]
+    for position, utterance in enumerate(utterances):
+        assert utterance.index == position
+        assert text[utterance.start:utterance.end] == utterance.text
+
+    assert (utterances[0].path, utterances[0].anchor) == ((0,), "stave")
+    assert (utterances[1].path, utterances[1].anchor) == ((1, 0), "text")
+    assert utterances[-1].path == (1, 3)
+
+
+def test_first_utterance_before_chapter_is_read(mock_book):
+    utterances = iter_utterances(mock_book, "OEBPS/chapter1.xhtml", chunk_size=64)
+    assert next(utterances).text == "STAVE ONE."
+    assert mock_book.readers[0].bytes_read < len(CHAPTER) / 2
+
+
+def test_utterance_errors(mock_book):
+    utterances = iter_utterances(mock_book, "OEBPS/broken.xhtml")
+    with pytest.raises(InvalidEpubError, match="Could not parse chapter"):
+        list(utterances)
+    mock_book.zip_file.open.side_effect = KeyError("missing")
+    with pytest.raises(InvalidEpubError, match="Chapter file not found"):
+        next(iter_utterances(mock_book, "OEBPS/missing.xhtml"))
+
+
+def test_speech_index_resumes_without_reparsing(mock_book):
+    index = SpeechIndex(mock_book, chunk_size=64)
+    text = element_text(ET.fromstring(CHAPTER))
+
+    first = next(index.utterances("OEBPS/chapter1.xhtml"))
+    assert first.text == "STAVE ONE."
+
+    offset = text.index("whatever")
+    resumed = index.utterance_at("OEBPS/chapter1.xhtml", offset)
+    assert resumed.text == "There is no doubt whatever about that."
+    assert [u.text for u in index.resume("OEBPS/chapter1.xhtml", offset)][:2] == [
+        "There is no doubt whatever about that.",
+        "Mr. Scrooge signed it!",
+    ]
+    assert index.utterance_at("OEBPS/chapter1.xhtml", 10**6).text == '"Humbug!"'
+    assert index.utterance_at("OEBPS/chapter1.xhtml", 0) is first
+    assert len(list(index.utterances("OEBPS/chapter1.xhtml", start=7))) == 2
+    assert mock_book.zip_file.open.call_count == 1
+
+    index.clear()
+    next(index.utterances("OEBPS/chapter1.xhtml"))
+    assert mock_book.zip_file.open.call_count == 2
@@ -0,0 +1,67 @@
+import xml.etree.ElementTree as ET
+from unittest.mock import MagicMock
+
+import pytest
+
+from imposition.book import Book
+from imposition.exceptions import InvalidEpubError
+from imposition.text import (
+    build_term_index,
+    chapter_text,
+    element_text,
+    tokenize,
+)
+
+
+@pytest.fixture
+def mock_book():
+    """Fixture to create a mock Book object with two small chapters."""
+    chapters = {
+        "OEBPS/chapter1.xhtml": (
+            b'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Ignored</title></head>'
+            b'<body><h1>One</h1>\n<p>Marley was  dead.</p></body></html>'
+        ),
+        "OEBPS/chapter2.xhtml": (
+            b'<html xmlns="http://www.w3.org/1999/xhtml"><body>'
+            b"<p>Scrooge's partner, Marley.</p></body></html>"
+        ),
+        "OEBPS/broken.xhtml": b'<html><body>',
+    }
+    book = MagicMock(spec=Book)
+    book.spine = ["OEBPS/chapter1.xhtml", "OEBPS/chapter2.xhtml"]
+    book.zip_file = MagicMock()
+    book.zip_file.read.side_effect = lambda path: chapters[path]
+    return book
+
+
+def test_chapter_text(mock_book):
+    assert chapter_text(mock_book, "OEBPS/chapter1.xhtml") == "One Marley was dead."
+
+
+def test_chapter_text_errors(mock_book):
+    with pytest.raises(InvalidEpubError, match="Could not parse chapter"):
+        chapter_text(mock_book, "OEBPS/broken.xhtml")
+    with pytest.raises(InvalidEpubError, match="Chapter file not found"):
+        chapter_text(mock_book, "OEBPS/missing.xhtml")
+
+
+def test_element_text_separates_adjacent_blocks():
+    root = ET.fromstring(
+        '<html xmlns="http://www.w3.org/1999/xhtml"><body>'
+        '<h1>Title</h1><p>foo</p><p>ba<em>r</em><br/>baz</p>'
+        '<ul><li>a</li><li>b</li></ul>'
+        '</body></html>'
+    )
+    assert element_text(root) == "Title foo bar baz a b"
+    assert tokenize(element_text(root)) == ["title", "foo", "bar", "baz", "a", "b"]
+
+
+def test_tokenize():
+    assert tokenize("Scrooge's partner, MARLEY.") == ["scrooge's", "partner", "marley"]
+
+
+def test_build_term_index(mock_book):
+    index = build_term_index(mock_book)
+    assert index["marley"] == [0, 1]
+    assert index["dead"] == [0]
+    assert "ignored" not in index
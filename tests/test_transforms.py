@@ -0,0 +1,203 @@
+import base64
+from unittest.mock import MagicMock, patch
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from imposition.book import Book
+from imposition.rendition import Rendition
+from imposition.transforms import (
+    NAVIGATION_ATTRIBUTE,
+    NAVIGATION_MESSAGE,
+    XHTML_NAMESPACE,
+    InjectStyle,
+    Pipeline,
+    ResolveLinks,
+    StripInlineStyles,
+    StripScripts,
+    StripStylesheets,
+    Transform,
+    TransformContext,
+)
+from tests.mocks import MockDOMAdapter
+
+CHAPTER = (
+    '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+    '<link rel="stylesheet" href="style.css"/><style>p { color: red; }</style>'
+    '</head><body style="margin: 2em">'
+    '<p style="color: blue">One<script>alert(1)</script> tail</p>'
+    '<p onclick="go()">Two</p>'
+    '</body></html>'
+)
+
+
+class CountingTransform(Transform):
+    """A pass that records the elements it visits."""
+
+    name = "counting"
+
+    def __init__(self):
+        self.visited = []
+
+    def visit(self, element, context):
+        self.visited.append(element.tag.rsplit('}', 1)[-1])
+        return None
+
+
+@pytest.fixture
+def root():
+    return ET.fromstring(CHAPTER)
+
+
+@pytest.fixture
+def context():
+    return TransformContext(MagicMock(spec=Book), "OEBPS/chapter1.xhtml")
+
+
+def serialize(root):
+    return ET.tostring(root, encoding='unicode')
+
+
+def test_passes_share_one_traversal(root, context):
+    first, second = CountingTransform(), CountingTransform()
+    second.name = "counting-2"
+    Pipeline([first, StripStylesheets(), second]).run(root, context)
+    assert first.visited == [
+        'html', 'head', 'link', 'style', 'body', 'p', 'script', 'p'
+    ]
+    # Elements removed by an earlier pass are not seen by later ones
+    assert second.visited == ['html', 'head', 'body', 'p', 'script', 'p']
+
+
+def test_default_passes(root, context):
+    Pipeline([
+        StripStylesheets(),
+        StripInlineStyles(),
+        InjectStyle(lambda: 'body { margin: 0; }'),
+    ]).run(root, context)
+    html = serialize(root)
+    assert 'style.css' not in html
+    assert 'color' not in html
+    assert html.count('body { margin: 0; }') == 1
+
+
+def test_strip_scripts_keeps_tail_text(root, context):
+    Pipeline([StripScripts()]).run(root, context)
+    html = serialize(root)
+    assert 'script' not in html
+    assert 'onclick' not in html
+    assert 'One tail' in html
+
+
+def test_timings(root, context):
+    pipeline = Pipeline([StripStylesheets(), StripInlineStyles()])
+    pipeline.run(root, context)
+    assert set(pipeline.timings) == {'strip-stylesheets', 'strip-inline-styles'}
+    assert all(seconds >= 0 for seconds in pipeline.timings.values())
+
+
+def test_iter_run_pauses_between_chunks(root, context):
+    counting = CountingTransform()
+    pipeline = Pipeline([counting])
+    steps = pipeline.iter_run(root, context, chunk_size=3)
+    next(steps)  # After the start hooks
+    assert counting.visited == []
+    next(steps)
+    assert counting.visited == ['html', 'head', 'link']
+    # 8 elements: pauses after 3 and 6, then before the finish hooks
+    assert len(list(steps)) == 2
+    assert len(counting.visited) == 8
+    assert pipeline.timings == context.timings
+
+
+def test_add_before_and_remove():
+    pipeline = Pipeline([StripStylesheets(), StripInlineStyles()])
+    pipeline.add(StripScripts(), before='strip-inline-styles')
+    assert [t.name for t in pipeline.transforms] == [
+        'strip-stylesheets', 'strip-scripts', 'strip-inline-styles'
+    ]
+    assert isinstance(pipeline.remove('strip-scripts'), StripScripts)
+    assert pipeline.get('strip-scripts') is None
+
+
+def test_duplicate_and_unknown_names():
+    pipeline = Pipeline([StripStylesheets()])
+    with pytest.raises(ValueError, match="already registered"):
+        pipeline.add(StripStylesheets())
+    with pytest.raises(ValueError, match="No transform named"):
+        pipeline.add(StripScripts(), before='missing')
+
+
+def test_rendition_runs_registered_passes():
+    book = MagicMock(spec=Book)
+    book.toc = []
+    book.spine = ["OEBPS/chapter1.xhtml"]
+    book.spine_index = {href: i for i, href in enumerate(book.spine)}
+    book.zip_file = MagicMock()
+    book.zip_file.read.return_value = CHAPTER.encode()
+    rendition = Rendition(book, MockDOMAdapter(), "viewer")
+    counting = CountingTransform()
+    rendition.pipeline.add(StripScripts(), before='embed-assets')
+    rendition.pipeline.add(counting)
+
+    rendition.display()
+
+    assert 'script' not in counting.visited
+    assert 'counting' in rendition.pipeline.timings
+
+
+LINKED_CHAPTER = (
+    '<html xmlns="http://www.w3.org/1999/xhtml"><head></head><body>'
+    '<a id="top" href="chapter2.xhtml#sec2">Next</a>'
+    '<a href="chapter1.xhtml#top">Self</a>'
+    '<a href="https://example.com/">External</a>'
+    '<img src="images/figure.png"/>'
+    '</body></html>'
+)
+
+
+@pytest.fixture
+def linked_book():
+    book = MagicMock(spec=Book)
+    book.toc = []
+    book.spine = ["OEBPS/chapter1.xhtml", "OEBPS/chapter2.xhtml"]
+    book.spine_index = {href: i for i, href in enumerate(book.spine)}
+    book.zip_file = MagicMock()
+    book.zip_file.read.side_effect = lambda path: (
+        b'PNG' if path.endswith('.png') else LINKED_CHAPTER.encode()
+    )
+    return book
+
+
+def test_resolve_links(linked_book):
+    root = ET.fromstring(LINKED_CHAPTER)
+    context = TransformContext(linked_book, "OEBPS/chapter1.xhtml")
+    Pipeline([ResolveLinks()]).run(root, context)
+    links = root.findall(f'.//{{{XHTML_NAMESPACE}}}a')
+    assert links[0].get('href') == '#sec2'
+    assert links[0].get(NAVIGATION_ATTRIBUTE) == 'OEBPS/chapter2.xhtml#sec2'
+    assert links[1].get('href') == '#top'
+    assert NAVIGATION_ATTRIBUTE not in links[1].attrib
+    assert links[2].get('href') == 'https://example.com/'
+    assert NAVIGATION_MESSAGE in serialize(root)
+
+
+def test_rendition_links_chapters_instead_of_inlining(linked_book):
+    dom_adapter = MockDOMAdapter()
+    rendition = Rendition(linked_book, dom_adapter, "viewer")
+    rendition.display()
+
+    html = base64.b64decode(rendition.iframe.src.split(',', 1)[1]).decode()
+    assert 'data:application/xhtml+xml' not in html
+    assert 'data:image/png;base64,' in html
+    read_paths = [call.args[0] for call in linked_book.zip_file.read.call_args_list]
+    assert read_paths == ["OEBPS/chapter1.xhtml", "OEBPS/images/figure.png"]
+
+    with patch.object(rendition, 'display') as mock_display:
+        dom_adapter.post_message(rendition.iframe, {'type': 'other', 'href': 'x'})
+        mock_display.assert_not_called()
+        dom_adapter.post_message(
+            rendition.iframe,
+            {'type': NAVIGATION_MESSAGE, 'href': 'OEBPS/chapter2.xhtml#sec2'},
+        )
+        mock_display.assert_called_once_with('OEBPS/chapter2.xhtml#sec2')
@@ -0,0 +1,170 @@
+import shutil
+import zipfile
+from unittest.mock import patch
+
+import pytest
+
+from imposition.book import Book
+from imposition.exceptions import InvalidEpubError
+from imposition.validation import validate_epub
+from tests.mocks import CONTAINER_XML, corrupt_member, create_epub_bytes
+
+OPF = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="pub-id" version="2.0">
+  <metadata/>
+  <manifest>
+    <item id="chapter1" href="chapter1.xhtml" media-type="application/xhtml+xml"/>
+    <item id="chapter2" href="chapter2.xhtml" media-type="application/xhtml+xml"/>
+    <item id="cover" href="images/cover.jpg" media-type="image/jpeg"/>
+    <item id="lost" href="images/lost.png" media-type="image/png"/>
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+  </manifest>
+  <spine toc="ncx">
+    <itemref idref="chapter1"/>
+    <itemref idref="ghost1"/>
+    <itemref idref="chapter2"/>
+    <itemref idref="ghost2"/>
+  </spine>
+</package>
+"""
+
+CHAPTER1 = """<html xmlns="http://www.w3.org/1999/xhtml"><head><title>One</title></head>
+<body>
+  <h1 id="start">One</h1>
+  <img src="images/cover.jpg"/>
+  <img src="images/missing.jpg"/>
+  <img src="images/extra.png"/>
+  <img src="data:image/png;base64,AAAA"/>
+  <a href="https://example.com/">External</a>
+  <a href="chapter2.xhtml#middle">Next</a>
+  <a href="chapter2.xhtml#nowhere">Broken anchor</a>
+  <a href="#start">Top</a>
+</body></html>
+"""
+
+CHAPTER2 = """<html xmlns="http://www.w3.org/1999/xhtml"><body>
+  <p id="middle">Two</p>
+</body></html>
+"""
+
+NCX = """<?xml version="1.0" encoding="UTF-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+  <navMap>
+    <navPoint id="np-1" playOrder="1">
+      <navLabel><text>One</text></navLabel>
+      <content src="chapter1.xhtml#start"/>
+    </navPoint>
+    <navPoint id="np-2" playOrder="2">
+      <navLabel><text>Two</text></navLabel>
+      <content src="chapter2.xhtml#missing-anchor"/>
+    </navPoint>
+    <navPoint id="np-3" playOrder="3">
+      <navLabel><text>Three</text></navLabel>
+      <content src="chapter3.xhtml"/>
+    </navPoint>
+  </navMap>
+</ncx>
+"""
+
+
+@pytest.fixture
+def broken_epub():
+    return create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': OPF,
+        'OEBPS/chapter1.xhtml': CHAPTER1,
+        'OEBPS/chapter2.xhtml': CHAPTER2,
+        'OEBPS/images/cover.jpg': b'fake image data',
+        'OEBPS/images/extra.png': b'fake image data',
+        'OEBPS/toc.ncx': NCX,
+    })
+
+
+def issue_codes(report):
+    return sorted((issue.code, issue.severity) for issue in report.issues)
+
+
+def test_valid_book():
+    with open('test_book.epub', 'rb') as f:
+        report = validate_epub(f.read())
+    assert report.is_valid
+    assert report.issues == []
+
+
+def test_corrupt_members_are_reported(tmp_path):
+    path = tmp_path / 'corrupt.epub'
+    shutil.copy('test_book.epub', path)
+    chapter = 'OEBPS/816934448499000088_46-h-1.htm.html'
+    corrupt_member(path, chapter)
+    corrupt_member(path, 'OEBPS/toc.ncx')
+    report = validate_epub(path.read_bytes())
+    corrupt = [issue for issue in report.issues if issue.code == 'corrupt-member']
+    assert sorted(issue.path for issue in corrupt) == [chapter, 'OEBPS/toc.ncx']
+    assert all(issue.severity == 'error' for issue in corrupt)
+
+
+def test_reports_all_problems(broken_epub):
+    report = validate_epub(broken_epub)
+    assert not report.is_valid
+    assert issue_codes(report) == [
+        ('broken-link', 'error'),
+        ('missing-asset', 'error'),
+        ('missing-manifest-file', 'error'),
+        ('missing-toc-target', 'error'),
+        ('missing-toc-target', 'error'),
+        ('unknown-spine-idref', 'error'),
+        ('unknown-spine-idref', 'error'),
+        ('unmanifested-file', 'warning'),
+    ]
+    missing_asset = next(
+        issue for issue in report.issues if issue.code == 'missing-asset'
+    )
+    assert missing_asset.path == 'OEBPS/chapter1.xhtml'
+    assert 'OEBPS/images/missing.jpg' in missing_asset.message
+
+
+def test_assets_are_not_decompressed(broken_epub):
+    opened = []
+    original_open = zipfile.ZipFile.open
+
+    def tracking_open(self, name, *args, **kwargs):
+        opened.append(getattr(name, 'filename', name))
+        return original_open(self, name, *args, **kwargs)
+
+    with patch.object(zipfile.ZipFile, 'open', tracking_open):
+        validate_epub(broken_epub)
+    assert not any(path.startswith('OEBPS/images/') for path in opened)
+
+
+def test_structural_errors_stop_validation():
+    report = validate_epub(create_epub_bytes({'mimetype': 'application/epub+zip'}))
+    assert issue_codes(report) == [('invalid-container', 'error')]
+    with pytest.raises(InvalidEpubError, match="META-INF/container.xml not found"):
+        report.raise_for_errors()
+
+
+def test_mimetype_warnings():
+    with open('test_book.epub', 'rb') as f:
+        source = zipfile.ZipFile(f)
+        files = {info.filename: source.read(info) for info in source.infolist()}
+    files = {'META-INF/container.xml': files.pop('META-INF/container.xml'), **files}
+    report = validate_epub(create_epub_bytes(files))
+    assert report.is_valid
+    assert issue_codes(report) == [('mimetype-not-first', 'warning')]
+
+
+def test_book_validate():
+    opf = OPF.replace('<itemref idref="ghost1"/>', '')
+    opf = opf.replace('<itemref idref="ghost2"/>', '')
+    book = Book(create_epub_bytes({
+        'mimetype': 'application/epub+zip',
+        'META-INF/container.xml': CONTAINER_XML,
+        'OEBPS/content.opf': opf,
+        'OEBPS/chapter1.xhtml': CHAPTER1,
+        'OEBPS/chapter2.xhtml': CHAPTER2,
+        'OEBPS/toc.ncx': NCX,
+    }))
+    report = book.validate()
+    assert ('missing-asset', 'error') in issue_codes(report)
+    assert ('unknown-spine-idref', 'error') not in issue_codes(report)